@@ -0,0 +1,97 @@
+"""Benchmark: memoria al listar correos con adjuntos grandes y al descargarlos.
+
+Uso:
+    python -m benchmarks.attachment_benchmark --messages 5 --attachment-mb 20
+
+Compara el pico de memoria (tracemalloc) de cargar los correos no leídos
+descargando el mensaje completo, como se hacía antes, con la carga basada en
+BODYSTRUCTURE, y mide la descarga por trozos de un adjunto a disco.
+"""
+
+import argparse
+import logging
+import multiprocessing
+import os
+import tempfile
+import time
+import tracemalloc
+from benchmarks.fake_imap_server import FakeIMAPServer, build_message
+from src.tasks.email_manager import EmailManager
+
+
+def measure(label: str, operation):
+    tracemalloc.start()
+    start = time.perf_counter()
+    operation()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:>28}: pico {peak / 2**20:8.1f} MiB  tiempo {elapsed:6.2f} s")
+
+
+def serve(messages: int, attachment_size: int, ports, stop):
+    """Servidor en otro proceso para que su memoria no cuente en las mediciones."""
+    server = FakeIMAPServer().start()
+    for uid in range(1, messages + 1):
+        server.store.add_message(
+            "INBOX", build_message(uid, attachment_size=attachment_size)
+        )
+    ports.put(server.port)
+    stop.wait()
+    server.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=5)
+    parser.add_argument("--attachment-mb", type=float, default=20)
+    args = parser.parse_args()
+
+    logging.getLogger("AssistantLogger").setLevel(logging.WARNING)
+    ports = multiprocessing.Queue()
+    stop = multiprocessing.Event()
+    server = multiprocessing.Process(
+        target=serve,
+        args=(args.messages, int(args.attachment_mb * 2**20), ports, stop),
+    )
+    server.start()
+    port = ports.get()
+
+    workdir = tempfile.mkdtemp()
+    config = {
+        "email": "operaciones@example.com",
+        "password": "secreto",
+        "server": "127.0.0.1",
+        "port": port,
+        "use_ssl": False,
+        "smtp_server": "127.0.0.1",
+        "smtp_port": 25,
+        "attachments": {"download_dir": workdir},
+    }
+    uids = [str(uid) for uid in range(1, args.messages + 1)]
+    try:
+        config["cache_path"] = os.path.join(tempfile.mkdtemp(), "mail_cache.db")
+        manager = EmailManager(config)
+        manager.sync_folder()
+        measure(
+            "mensaje completo (antes)",
+            lambda: manager.pool.run(
+                "INBOX",
+                lambda mailbox: manager.sync._fetch_full_bodies(mailbox, "INBOX", uids),
+            ),
+        )
+        manager.disconnect()
+
+        config["cache_path"] = os.path.join(tempfile.mkdtemp(), "mail_cache.db")
+        manager = EmailManager(config)
+        manager.sync_folder()
+        measure("BODYSTRUCTURE (ahora)", lambda: manager.get_unread_emails(limit=None))
+        measure("descarga de 1 adjunto", lambda: manager.download_attachment("1"))
+        manager.disconnect()
+    finally:
+        stop.set()
+        server.join()
+
+
+if __name__ == "__main__":
+    main()
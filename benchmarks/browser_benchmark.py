@@ -0,0 +1,122 @@
+"""Benchmark: memoria y arranque en frío de Chrome con y sin las opciones optimizadas.
+
+Uso:
+    python -m benchmarks.browser_benchmark --repeat 3 [--headed]
+
+Para cada configuración se arranca Chrome con un perfil vacío mediante
+src/utils/browser.create_driver, se abre la copia estática de WhatsApp Web
+(benchmarks/whatsapp_fixture.py) y se mide el tiempo hasta que la lista de
+chats está en el DOM y la RSS sumada de chromedriver y todos los procesos de
+Chrome. --headed añade la configuración anterior (con interfaz y opciones
+por defecto), que necesita pantalla. La RSS usa psutil si está instalado y,
+si no, /proc (solo Linux). Requiere Chrome y su driver instalados.
+
+Resultados: pendientes. La RSS por driver y el arranque en frío con y sin
+las opciones optimizadas todavía no se han medido (el entorno donde se
+escribió no tenía Chrome), así que ese criterio de aceptación sigue abierto
+hasta ejecutar este benchmark en un servidor de terminales y anotar aquí
+las cifras.
+"""
+
+import argparse
+import os
+import statistics
+import tempfile
+import time
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import WebDriverWait
+from benchmarks.whatsapp_fixture import write_fixture
+from src.utils.browser import browser_settings, create_driver
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+
+def tree_rss(pid: int) -> int:
+    """RSS en bytes del proceso pid y todos sus descendientes."""
+    if psutil:
+        root = psutil.Process(pid)
+        processes = [root] + root.children(recursive=True)
+        return sum(process.memory_info().rss for process in processes)
+    children = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as stat:
+                # El nombre va entre paréntesis y puede contener espacios
+                parent = int(stat.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(parent, []).append(int(entry))
+    total, pending = 0, [pid]
+    while pending:
+        current = pending.pop()
+        pending.extend(children.get(current, []))
+        try:
+            with open(f"/proc/{current}/status") as status:
+                for line in status:
+                    if line.startswith("VmRSS:"):
+                        total += int(line.split()[1]) * 1024
+        except OSError:
+            continue
+    return total
+
+
+def measure(url: str, settings: dict):
+    start = time.perf_counter()
+    driver = create_driver(settings)
+    try:
+        driver.get(url)
+        WebDriverWait(driver, 30).until(
+            EC.presence_of_element_located(
+                (By.CSS_SELECTOR, 'div[data-testid="cell-frame-container"]')
+            )
+        )
+        cold_start = time.perf_counter() - start
+        # Dejar que terminen los procesos auxiliares antes de medir memoria
+        time.sleep(2)
+        rss = tree_rss(driver.service.process.pid)
+    finally:
+        driver.quit()
+    return cold_start, rss
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--messages", type=int, default=500)
+    parser.add_argument("--headed", action="store_true")
+    args = parser.parse_args()
+
+    url = write_fixture(
+        os.path.join(tempfile.mkdtemp(), "whatsapp.html"),
+        chats=20,
+        messages_per_chat=args.messages,
+    )
+    configurations = [
+        ("sin interfaz, por defecto", {"headless": True, "tuned": False}),
+        ("sin interfaz, optimizado", {"headless": True, "tuned": True}),
+    ]
+    if args.headed:
+        configurations.insert(
+            0, ("con interfaz, por defecto", {"headless": False, "tuned": False})
+        )
+    for label, overrides in configurations:
+        starts, memory = [], []
+        for _ in range(args.repeat):
+            settings = browser_settings(overrides, profile_dir=tempfile.mkdtemp())
+            cold_start, rss = measure(url, settings)
+            starts.append(cold_start)
+            memory.append(rss)
+        print(
+            f"{label:>26}: arranque {statistics.median(starts):5.2f} s  "
+            f"RSS {statistics.median(memory) / 2**20:7.1f} MiB"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,496 @@
+"""Servidor IMAP mínimo en memoria para pruebas y benchmarks locales.
+
+Implementa el subconjunto de IMAP4rev1 que usan imap_tools y el EmailManager
+(LOGIN, SELECT, NOOP, UID SEARCH/FETCH/STORE, STATUS, IDLE, LOGOUT), incluidos
+BODYSTRUCTURE y las secciones parciales BODY[n]<offset.len>, y permite
+simular la latencia de red por comando y el coste del handshake inicial.
+"""
+
+import email
+import re
+import socket
+import socketserver
+import threading
+import time
+from datetime import datetime, timezone
+from email.header import decode_header, make_header
+from email.utils import collapse_rfc2231_value, parsedate_to_datetime
+from typing import Dict, List, Optional, Tuple
+
+TOKEN_PATTERN = re.compile(rb'\(|\)|"(?:[^"\\]|\\.)*"|[^\s()]+')
+
+
+class FakeMessage:
+    def __init__(self, uid: int, raw: bytes, flags=()):
+        self.uid = uid
+        self.raw = raw
+        self.flags = set(flags)
+        self.parsed = email.message_from_bytes(raw)
+        try:
+            self.date = parsedate_to_datetime(self.parsed["Date"])
+        except Exception:
+            self.date = datetime.now(timezone.utc)
+
+    def header(self, name: str) -> str:
+        """Valor decodificado (RFC 2047) de una cabecera, como lo ve el servidor."""
+        value = self.parsed.get(name)
+        return str(make_header(decode_header(value))) if value else ""
+
+    @property
+    def header_bytes(self) -> bytes:
+        end = self.raw.find(b"\r\n\r\n")
+        return self.raw if end < 0 else self.raw[: end + 4]
+
+
+class FakeMailStore:
+    """Almacén de carpetas y mensajes compartido por todas las sesiones."""
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.folders: Dict[str, List[FakeMessage]] = {"INBOX": []}
+        self.uid_next: Dict[str, int] = {"INBOX": 1}
+        self.uid_validity: Dict[str, int] = {"INBOX": 1}
+        self.listeners: List["IMAPHandler"] = []
+
+    def add_message(self, folder: str, raw: bytes, flags=()) -> int:
+        with self.lock:
+            self.folders.setdefault(folder, [])
+            self.uid_next.setdefault(folder, 1)
+            self.uid_validity.setdefault(folder, 1)
+            uid = self.uid_next[folder]
+            self.uid_next[folder] += 1
+            self.folders[folder].append(FakeMessage(uid, raw, flags))
+            count = len(self.folders[folder])
+            listeners = list(self.listeners)
+        for handler in listeners:
+            handler.notify_exists(folder, count)
+        return uid
+
+
+def _tokenize(data: bytes) -> List[bytes]:
+    return TOKEN_PATTERN.findall(data)
+
+
+def _unquote(token: bytes) -> str:
+    if token.startswith(b'"') and token.endswith(b'"'):
+        token = token[1:-1].replace(b'\\"', b'"').replace(b"\\\\", b"\\")
+    return token.decode("utf-8", "replace")
+
+
+def _parse_set(spec: str, maximum: int) -> set:
+    result = set()
+    for part in spec.split(","):
+        if ":" in part:
+            start, end = part.split(":")
+            start = maximum if start == "*" else int(start)
+            end = maximum if end == "*" else int(end)
+            result.update(range(min(start, end), max(start, end) + 1))
+        else:
+            result.add(maximum if part == "*" else int(part))
+    return result
+
+
+def _parse_date(value: str):
+    return datetime.strptime(value, "%d-%b-%Y").date()
+
+
+def _quote(value: Optional[str]) -> str:
+    if value is None:
+        return "NIL"
+    return '"' + str(value).replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def _params(pairs) -> str:
+    if not pairs:
+        return "NIL"
+    return "(" + " ".join(f"{_quote(k.upper())} {_quote(v)}" for k, v in pairs) + ")"
+
+
+def _part_bytes(part) -> bytes:
+    """Contenido de una parte tal como viaja (sin decodificar la transferencia)."""
+    payload = part.get_payload()
+    try:
+        return payload.encode("ascii", "surrogateescape")
+    except UnicodeEncodeError:
+        # Partes 8bit: el parser ya las decodificó con su charset
+        return payload.encode(part.get_content_charset() or "utf-8")
+
+
+def _bodystructure(part) -> str:
+    """BODYSTRUCTURE (RFC 3501, 7.4.2) de un mensaje ya parseado."""
+    if part.is_multipart():
+        children = "".join(_bodystructure(child) for child in part.get_payload())
+        boundary = _params([("boundary", part.get_boundary())])
+        return f"({children} {_quote(part.get_content_subtype().upper())} {boundary} NIL NIL)"
+    maintype = part.get_content_maintype().upper()
+    subtype = part.get_content_subtype().upper()
+    params = _params((part.get_params() or [])[1:])
+    encoding = _quote((part.get("Content-Transfer-Encoding") or "7BIT").upper())
+    body = _part_bytes(part)
+    fields = f"{_quote(maintype)} {_quote(subtype)} {params} NIL NIL {encoding} {len(body)}"
+    if maintype == "TEXT":
+        fields += f" {len(body.splitlines())}"
+    disposition = "NIL"
+    if part.get("Content-Disposition"):
+        kind = part.get_content_disposition().upper()
+        filename = part.get_param("filename", header="content-disposition")
+        if filename:
+            filename = collapse_rfc2231_value(filename)
+        filename_params = [("filename", filename)] if filename else None
+        disposition = f"({_quote(kind)} {_params(filename_params)})"
+    return f"({fields} NIL {disposition} NIL)"
+
+
+class SearchEvaluator:
+    """Evaluador recursivo de criterios IMAP SEARCH."""
+
+    def __init__(self, tokens: List[bytes], messages: List[FakeMessage]):
+        self.tokens = tokens
+        self.pos = 0
+        self.messages = messages
+        self.max_uid = messages[-1].uid if messages else 0
+
+    def _next(self) -> bytes:
+        token = self.tokens[self.pos]
+        self.pos += 1
+        return token
+
+    def parse_all(self):
+        keys = []
+        while self.pos < len(self.tokens):
+            keys.append(self.parse_key())
+        return lambda seq, msg: all(key(seq, msg) for key in keys)
+
+    def parse_key(self):
+        token = self._next()
+        if token == b"(":
+            keys = []
+            while self.tokens[self.pos] != b")":
+                keys.append(self.parse_key())
+            self.pos += 1
+            return lambda seq, msg: all(key(seq, msg) for key in keys)
+        name = token.decode().upper()
+        if name == "ALL":
+            return lambda seq, msg: True
+        if name in ("SEEN", "ANSWERED", "FLAGGED", "DELETED", "DRAFT"):
+            flag = "\\" + name.capitalize()
+            return lambda seq, msg: flag in msg.flags
+        if name in ("UNSEEN", "UNANSWERED", "UNFLAGGED", "UNDELETED", "UNDRAFT"):
+            flag = "\\" + name[2:].capitalize()
+            return lambda seq, msg: flag not in msg.flags
+        if name == "NOT":
+            key = self.parse_key()
+            return lambda seq, msg: not key(seq, msg)
+        if name == "OR":
+            left, right = self.parse_key(), self.parse_key()
+            return lambda seq, msg: left(seq, msg) or right(seq, msg)
+        if name in ("FROM", "TO", "CC", "SUBJECT"):
+            value = _unquote(self._next()).lower()
+            header = name.capitalize() if name != "CC" else "Cc"
+            return lambda seq, msg: value in msg.header(header).lower()
+        if name in ("TEXT", "BODY"):
+            value = _unquote(self._next()).lower()
+            return lambda seq, msg: value in msg.raw.decode("utf-8", "replace").lower()
+        if name == "HEADER":
+            header, value = _unquote(self._next()), _unquote(self._next()).lower()
+            return lambda seq, msg: value in msg.header(header).lower()
+        if name in ("SINCE", "BEFORE", "ON", "SENTSINCE", "SENTBEFORE", "SENTON"):
+            day = _parse_date(_unquote(self._next()))
+            compare = {
+                "SINCE": lambda d: d >= day,
+                "BEFORE": lambda d: d < day,
+                "ON": lambda d: d == day,
+            }[name.replace("SENT", "")]
+            return lambda seq, msg: compare(msg.date.date())
+        if name in ("LARGER", "SMALLER"):
+            size = int(self._next())
+            if name == "LARGER":
+                return lambda seq, msg: len(msg.raw) > size
+            return lambda seq, msg: len(msg.raw) < size
+        if name == "UID":
+            uids = _parse_set(self._next().decode(), self.max_uid)
+            return lambda seq, msg: msg.uid in uids
+        if re.match(r"^[\d*:,]+$", name):
+            seqs = _parse_set(name, len(self.messages))
+            return lambda seq, msg: seq in seqs
+        raise ValueError(f"Criterio no soportado: {name}")
+
+
+class IMAPHandler(socketserver.StreamRequestHandler):
+    def setup(self):
+        self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        super().setup()
+        self.folder: Optional[str] = None
+        self.write_lock = threading.Lock()
+        self.idling = False
+
+    def send(self, data: bytes):
+        with self.write_lock:
+            self.wfile.write(data)
+            self.wfile.flush()
+
+    def notify_exists(self, folder: str, count: int):
+        if self.idling and self.folder == folder:
+            try:
+                self.send(f"* {count} EXISTS\r\n".encode())
+            except OSError:
+                pass
+
+    def handle(self):
+        time.sleep(self.server.connect_latency)
+        self.send(b"* OK [CAPABILITY IMAP4rev1 IDLE UIDPLUS] Fake IMAP listo\r\n")
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                break
+            line = line.rstrip(b"\r\n")
+            parts = line.split(b" ", 2)
+            if len(parts) < 2:
+                continue
+            tag = parts[0].decode()
+            command = parts[1].decode().upper()
+            args = parts[2] if len(parts) > 2 else b""
+            if self.server.latency:
+                time.sleep(self.server.latency)
+            try:
+                if not self.dispatch(tag, command, args):
+                    break
+            except Exception as e:
+                self.send(f"{tag} BAD {e}\r\n".encode())
+
+    def dispatch(self, tag: str, command: str, args: bytes) -> bool:
+        store = self.server.store
+        if command == "CAPABILITY":
+            self.send(b"* CAPABILITY IMAP4rev1 IDLE UIDPLUS\r\n")
+        elif command in ("LOGIN", "NOOP", "CHECK"):
+            pass
+        elif command == "LOGOUT":
+            self.send(b"* BYE Fake IMAP cerrando\r\n")
+            self.send(f"{tag} OK LOGOUT completado\r\n".encode())
+            return False
+        elif command in ("SELECT", "EXAMINE"):
+            folder = _unquote(_tokenize(args)[0])
+            with store.lock:
+                if folder not in store.folders:
+                    self.send(f"{tag} NO Carpeta inexistente\r\n".encode())
+                    return True
+                messages = store.folders[folder]
+                self.send(
+                    (
+                        f"* FLAGS (\\Seen \\Answered \\Flagged \\Deleted \\Draft)\r\n"
+                        f"* {len(messages)} EXISTS\r\n* 0 RECENT\r\n"
+                        f"* OK [UIDVALIDITY {store.uid_validity[folder]}] UIDs\r\n"
+                        f"* OK [UIDNEXT {store.uid_next[folder]}] UIDNEXT\r\n"
+                    ).encode()
+                )
+            self.folder = folder
+        elif command == "STATUS":
+            tokens = _tokenize(args)
+            folder = _unquote(tokens[0])
+            with store.lock:
+                messages = store.folders.get(folder, [])
+                unseen = sum(1 for m in messages if "\\Seen" not in m.flags)
+                self.send(
+                    (
+                        f'* STATUS "{folder}" (MESSAGES {len(messages)} RECENT 0 '
+                        f"UIDNEXT {store.uid_next.get(folder, 1)} "
+                        f"UIDVALIDITY {store.uid_validity.get(folder, 1)} "
+                        f"UNSEEN {unseen})\r\n"
+                    ).encode()
+                )
+        elif command == "UID":
+            sub, _, rest = args.partition(b" ")
+            sub = sub.decode().upper()
+            if sub == "SEARCH":
+                self.search(rest)
+            elif sub == "FETCH":
+                self.fetch(rest)
+            elif sub == "STORE":
+                self.store_flags(rest)
+            else:
+                raise ValueError(f"UID {sub} no soportado")
+        elif command == "IDLE":
+            self.idle()
+        else:
+            raise ValueError(f"Comando no soportado: {command}")
+        self.send(f"{tag} OK {command} completado\r\n".encode())
+        return True
+
+    def _messages(self) -> List[FakeMessage]:
+        return self.server.store.folders.get(self.folder, [])
+
+    def search(self, args: bytes):
+        tokens = _tokenize(args)
+        if tokens and tokens[0].upper() == b"CHARSET":
+            tokens = tokens[2:]
+        messages = self._messages()
+        matcher = SearchEvaluator(tokens, messages).parse_all()
+        uids = [
+            str(msg.uid)
+            for seq, msg in enumerate(messages, start=1)
+            if matcher(seq, msg)
+        ]
+        self.send(f"* SEARCH {' '.join(uids)}\r\n".encode())
+
+    def _selected(self, uid_spec: str) -> List[Tuple[int, FakeMessage]]:
+        messages = self._messages()
+        max_uid = messages[-1].uid if messages else 0
+        uids = _parse_set(uid_spec, max_uid)
+        return [(seq, m) for seq, m in enumerate(messages, start=1) if m.uid in uids]
+
+    def fetch(self, args: bytes):
+        uid_spec, _, items = args.partition(b" ")
+        items = items.decode().strip()
+        if items.startswith("(") and items.endswith(")"):
+            items = items[1:-1]
+        requested = re.findall(r"BODY(?:\.PEEK)?\[[^\]]*\](?:<[\d.]+>)?|\S+", items)
+        for seq, msg in self._selected(uid_spec.decode()):
+            parts: List[str] = [f"UID {msg.uid}"]
+            literals: List[Tuple[str, bytes]] = []
+            for item in requested:
+                name = item.upper()
+                if name == "UID":
+                    continue
+                if name == "FLAGS":
+                    parts.append(f"FLAGS ({' '.join(sorted(msg.flags))})")
+                elif name == "RFC822.SIZE":
+                    parts.append(f"RFC822.SIZE {len(msg.raw)}")
+                elif name == "INTERNALDATE":
+                    stamp = msg.date.strftime("%d-%b-%Y %H:%M:%S %z")
+                    parts.append(f'INTERNALDATE "{stamp}"')
+                elif name in ("BODYSTRUCTURE", "BODY"):
+                    parts.append(f"BODYSTRUCTURE {_bodystructure(msg.parsed)}")
+                elif name.startswith("BODY"):
+                    section = item[item.index("[") + 1 : item.index("]")]
+                    data = self._section(msg, section)
+                    label = f"BODY[{section}]"
+                    partial = re.search(r"<(\d+)\.(\d+)>$", item)
+                    if partial:
+                        offset, length = int(partial.group(1)), int(partial.group(2))
+                        data = data[offset : offset + length]
+                        label += f"<{offset}>"
+                    if not name.startswith("BODY.PEEK"):
+                        msg.flags.add("\\Seen")
+                    literals.append((label, data))
+            response = f"* {seq} FETCH ({' '.join(parts)}".encode()
+            for label, data in literals:
+                response += f" {label} {{{len(data)}}}\r\n".encode() + data
+            self.send(response + b")\r\n")
+
+    @staticmethod
+    def _section(msg: FakeMessage, section: str) -> bytes:
+        upper = section.upper()
+        if upper == "HEADER":
+            return msg.header_bytes
+        if upper.startswith("HEADER.FIELDS"):
+            wanted = set(upper[upper.index("(") + 1 : upper.rindex(")")].split())
+            lines = [
+                f"{key}: {value}\r\n".encode()
+                for key, value in msg.parsed.items()
+                if key.upper() in wanted
+            ]
+            return b"".join(lines) + b"\r\n"
+        if upper == "TEXT":
+            return msg.raw[len(msg.header_bytes) :]
+        if section and section[0].isdigit():
+            part = msg.parsed
+            for index in section.split("."):
+                if part.is_multipart():
+                    part = part.get_payload(int(index) - 1)
+                elif index != "1":
+                    raise ValueError(f"Sección inexistente: {section}")
+            return _part_bytes(part)
+        return msg.raw
+
+    def store_flags(self, args: bytes):
+        tokens = _tokenize(args)
+        uid_spec, mode = tokens[0].decode(), tokens[1].decode().upper()
+        flags = {t.decode() for t in tokens[2:] if t not in (b"(", b")")}
+        for seq, msg in self._selected(uid_spec):
+            if mode.startswith("+"):
+                msg.flags |= flags
+            elif mode.startswith("-"):
+                msg.flags -= flags
+            else:
+                msg.flags = set(flags)
+            if ".SILENT" not in mode:
+                self.send(
+                    f"* {seq} FETCH (UID {msg.uid} FLAGS ({' '.join(sorted(msg.flags))}))\r\n".encode()
+                )
+
+    def idle(self):
+        store = self.server.store
+        self.send(b"+ idling\r\n")
+        self.idling = True
+        with store.lock:
+            store.listeners.append(self)
+        try:
+            while True:
+                line = self.rfile.readline()
+                if not line or line.strip().upper() == b"DONE":
+                    break
+        finally:
+            self.idling = False
+            with store.lock:
+                store.listeners.remove(self)
+
+
+class FakeIMAPServer(socketserver.ThreadingTCPServer):
+    """Servidor IMAP local ejecutado en un hilo en segundo plano."""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency: float = 0.0,
+        connect_latency: float = 0.0,
+    ):
+        super().__init__((host, port), IMAPHandler)
+        self.store = FakeMailStore()
+        self.latency = latency
+        self.connect_latency = connect_latency
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def port(self) -> int:
+        return self.server_address[1]
+
+    def start(self) -> "FakeIMAPServer":
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+def build_message(
+    uid: int,
+    sender: str = "transportista@example.com",
+    subject: str = "Actualización de envío",
+    body: str = "El envío salió del almacén.",
+    attachment_size: int = 0,
+) -> bytes:
+    """Construir un mensaje RFC822 de ejemplo, opcionalmente con un adjunto."""
+    from email.message import EmailMessage
+    from email.utils import format_datetime
+
+    message = EmailMessage()
+    message["From"] = sender
+    message["To"] = "operaciones@example.com"
+    message["Subject"] = f"{subject} #{uid}"
+    message["Date"] = format_datetime(datetime.now(timezone.utc))
+    message["Message-ID"] = f"<msg-{uid}@example.com>"
+    message.set_content(body)
+    if attachment_size:
+        message.add_attachment(
+            b"\0" * attachment_size,
+            maintype="application",
+            subtype="pdf",
+            filename=f"carta_porte_{uid}.pdf",
+        )
+    return message.as_bytes().replace(b"\n", b"\r\n").replace(b"\r\r\n", b"\r\n")
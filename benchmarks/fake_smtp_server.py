@@ -0,0 +1,115 @@
+"""Servidor SMTP mínimo en memoria para pruebas y benchmarks locales.
+
+Acepta EHLO, AUTH PLAIN/LOGIN, MAIL, RCPT, DATA, RSET, NOOP y QUIT, guarda
+los mensajes recibidos y permite simular la latencia de red por comando, el
+coste del handshake inicial y el cierre con 421 tras N mensajes por sesión.
+"""
+
+import socket
+import socketserver
+import threading
+import time
+from typing import List, Optional
+
+
+class SMTPHandler(socketserver.StreamRequestHandler):
+    def setup(self):
+        self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        super().setup()
+        self.sent_in_session = 0
+
+    def reply(self, line: str):
+        self.wfile.write(f"{line}\r\n".encode())
+        self.wfile.flush()
+
+    def handle(self):
+        server = self.server
+        with server.lock:
+            server.sessions += 1
+        time.sleep(server.connect_latency)
+        self.reply("220 fake-smtp listo")
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                break
+            command = line.decode("utf-8", "replace").strip()
+            verb = command.split(" ", 1)[0].upper()
+            if server.latency:
+                time.sleep(server.latency)
+            if verb in ("EHLO", "HELO"):
+                self.wfile.write(
+                    b"250-fake-smtp\r\n250-AUTH PLAIN LOGIN\r\n250 8BITMIME\r\n"
+                )
+                self.wfile.flush()
+            elif verb == "AUTH":
+                parts = command.split()
+                if parts[1].upper() == "LOGIN":
+                    self.reply("334 VXNlcm5hbWU6")
+                    self.rfile.readline()
+                    self.reply("334 UGFzc3dvcmQ6")
+                    self.rfile.readline()
+                self.reply("235 Autenticado")
+            elif verb == "MAIL":
+                if (
+                    server.max_messages_per_session
+                    and self.sent_in_session >= server.max_messages_per_session
+                ):
+                    self.reply("421 Demasiados mensajes en esta sesión")
+                    break
+                self.reply("250 OK")
+            elif verb in ("RCPT", "RSET", "NOOP"):
+                self.reply("250 OK")
+            elif verb == "DATA":
+                self.reply("354 Terminar con <CRLF>.<CRLF>")
+                data = []
+                while True:
+                    chunk = self.rfile.readline()
+                    if not chunk or chunk == b".\r\n":
+                        break
+                    data.append(chunk[1:] if chunk.startswith(b"..") else chunk)
+                with server.lock:
+                    server.messages.append(b"".join(data))
+                self.sent_in_session += 1
+                self.reply("250 Mensaje aceptado")
+            elif verb == "QUIT":
+                self.reply("221 Adiós")
+                break
+            else:
+                self.reply("502 Comando no implementado")
+
+
+class FakeSMTPServer(socketserver.ThreadingTCPServer):
+    """Servidor SMTP local ejecutado en un hilo en segundo plano."""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency: float = 0.0,
+        connect_latency: float = 0.0,
+        max_messages_per_session: Optional[int] = None,
+    ):
+        super().__init__((host, port), SMTPHandler)
+        self.latency = latency
+        self.connect_latency = connect_latency
+        self.max_messages_per_session = max_messages_per_session
+        self.messages: List[bytes] = []
+        self.sessions = 0
+        self.lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def port(self) -> int:
+        return self.server_address[1]
+
+    def start(self) -> "FakeSMTPServer":
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
@@ -0,0 +1,140 @@
+"""TMS web mínimo en memoria para pruebas y benchmarks locales.
+
+Reproduce las páginas que recorre el TMSManager de src/tasks: login (#username,
+#password, #login-button), panel (#dashboard), alta de viaje en /trips/new
+(form#trip-form con un campo por dato y #submit-trip) y la confirmación
+.success-message. Cada navegador tiene su propia sesión por cookie. latency
+simula lo que tarda el servidor en guardar cada viaje y extra_fields añade
+campos al formulario para imitar los formularios largos. El campo driver se
+marca como autocompletado.
+"""
+
+import html
+import secrets
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qsl
+
+TRIP_FIELDS = ["origin", "destination", "date", "driver", "vehicle"]
+# El conductor se elige con un autocompletado, como en los TMS reales
+FIELD_ATTRIBUTES = {"driver": ' role="combobox" aria-autocomplete="list"'}
+
+PAGE = """<!DOCTYPE html>
+<html lang="es"><head><meta charset="utf-8"><title>TMS</title></head>
+<body>{body}</body></html>
+"""
+
+LOGIN_BODY = """<form method="post" action="/login">
+  <input id="username" name="username">
+  <input id="password" name="password" type="password">
+  <button id="login-button" type="submit">Ingresar</button>
+</form>"""
+
+
+class TMSHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, body: str, status: int = 200, headers: Optional[Dict[str, str]] = None):
+        content = PAGE.format(body=body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(content)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(content)
+
+    def _redirect(self, location: str, headers: Optional[Dict[str, str]] = None):
+        self.send_response(303)
+        self.send_header("Location", location)
+        self.send_header("Content-Length", "0")
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+
+    def _session(self) -> Optional[str]:
+        for part in self.headers.get("Cookie", "").split(";"):
+            name, _, value = part.strip().partition("=")
+            if name == "tms_session" and value in self.server.sessions:
+                return value
+        return None
+
+    def _form(self) -> Dict[str, str]:
+        length = int(self.headers.get("Content-Length", 0))
+        return dict(parse_qsl(self.rfile.read(length).decode("utf-8")))
+
+    def do_GET(self):
+        path = self.path.split("?", 1)[0].rstrip("/")
+        if not self._session():
+            self._send(LOGIN_BODY)
+        elif path == "/trips/new":
+            fields = "\n".join(
+                f'  <label>{name}<input name="{name}"{FIELD_ATTRIBUTES.get(name, "")}></label>'
+                for name in self.server.form_fields
+            )
+            self._send(
+                f'<form id="trip-form" method="post" action="/trips">\n{fields}\n'
+                '  <button id="submit-trip" type="submit">Guardar</button>\n</form>'
+            )
+        else:
+            self._send('<div id="dashboard">Panel de viajes</div>')
+
+    def do_POST(self):
+        path = self.path.split("?", 1)[0]
+        form = self._form()
+        if path == "/login":
+            session = secrets.token_hex(8)
+            with self.server.lock:
+                self.server.sessions.add(session)
+                self.server.logins += 1
+            self._redirect("/dashboard", {"Set-Cookie": f"tms_session={session}; Path=/"})
+        elif path == "/trips" and self._session():
+            time.sleep(self.server.latency)
+            with self.server.lock:
+                self.server.trips.append(form)
+                number = len(self.server.trips)
+            self._send(
+                f'<div class="success-message">Viaje {number} guardado:'
+                f" {html.escape(form.get('origin', ''))}</div>"
+            )
+        else:
+            self._redirect("/")
+
+
+class FakeTMSServer(ThreadingHTTPServer):
+    """Servidor del TMS de prueba ejecutado en un hilo en segundo plano."""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency: float = 0.0,
+        extra_fields: int = 0,
+    ):
+        super().__init__((host, port), TMSHandler)
+        self.latency = latency
+        self.form_fields = TRIP_FIELDS + [f"extra_{i}" for i in range(extra_fields)]
+        self.sessions = set()
+        self.trips: List[Dict[str, Any]] = []
+        self.logins = 0
+        self.lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.server_address[0]}:{self.server_address[1]}"
+
+    def start(self) -> "FakeTMSServer":
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
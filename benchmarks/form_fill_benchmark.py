@@ -0,0 +1,66 @@
+"""Benchmark: rellenar el formulario de viaje campo a campo o con un solo script.
+
+Uso:
+    python -m benchmarks.form_fill_benchmark --fields 30 --repeat 10
+
+Sobre el TMS de prueba de benchmarks/fake_tms_server.py (con --fields campos
+adicionales) se rellena el formulario de alta de viaje con
+src/utils/form_fill.fill_form, primero con send_keys por campo y después con
+la vía rápida de un solo execute_script (el autocompletado del conductor se
+sigue escribiendo con el teclado). Solo se mide el relleno, no la carga de la
+página ni el envío. Requiere Chrome y su driver instalados.
+"""
+
+import argparse
+import statistics
+import time
+from selenium import webdriver
+from selenium.webdriver.common.by import By
+from benchmarks.fake_tms_server import FakeTMSServer
+from src.utils.browser_waits import SmartWait
+from src.utils.form_fill import fill_form
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--fields", type=int, default=30)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    server = FakeTMSServer(extra_fields=args.fields).start()
+    options = webdriver.ChromeOptions()
+    options.add_argument("--headless=new")
+    driver = webdriver.Chrome(options=options)
+    try:
+        waits = SmartWait(driver)
+        driver.get(server.url)
+        waits.until_present("login", "#username").send_keys("operador")
+        driver.find_element(By.ID, "login-button").click()
+        waits.until_present("dashboard", "#dashboard")
+
+        values = {name: f"valor {name}" for name in server.form_fields}
+        timings = {}
+        for label, fast in (("send_keys por campo", False), ("un solo script", True)):
+            timings[label] = []
+            for _ in range(args.repeat):
+                driver.get(f"{server.url}/trips/new")
+                form = waits.until_present("formulario", "#trip-form")
+                start = time.perf_counter()
+                missing = fill_form(driver, form, values, fast=fast)
+                timings[label].append(time.perf_counter() - start)
+                if missing:
+                    raise RuntimeError(f"Campos sin rellenar: {missing}")
+        baseline = statistics.median(timings["send_keys por campo"])
+        for label, samples in timings.items():
+            median = statistics.median(samples)
+            print(
+                f"{label:>20}: {median * 1000:8.1f} ms por formulario "
+                f"({len(server.form_fields)} campos)  x{baseline / median:5.1f}"
+            )
+    finally:
+        driver.quit()
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
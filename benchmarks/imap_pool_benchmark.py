@@ -0,0 +1,74 @@
+"""Benchmark: latencia por comando de correo con y sin pool de conexiones IMAP.
+
+Uso:
+    python -m benchmarks.imap_pool_benchmark --commands 20 --latency 0.02 --connect-latency 0.15
+
+`--latency` simula el RTT de cada comando IMAP y `--connect-latency` el coste
+del handshake TLS al abrir la conexión.
+"""
+
+import argparse
+import logging
+import os
+import statistics
+import tempfile
+import time
+from benchmarks.fake_imap_server import FakeIMAPServer, build_message
+from src.tasks.email_manager import EmailManager
+
+
+def run_commands(manager: EmailManager, commands: int, pooled: bool) -> list:
+    timings = []
+    for i in range(commands):
+        start = time.perf_counter()
+        if i % 2:
+            manager.search_emails("from:transportista")
+        else:
+            manager.get_unread_emails()
+        timings.append(time.perf_counter() - start)
+        if not pooled:
+            # Comportamiento anterior: una sesión nueva por comando
+            manager.disconnect()
+    manager.disconnect()
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--commands", type=int, default=20)
+    parser.add_argument("--messages", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--connect-latency", type=float, default=0.15)
+    args = parser.parse_args()
+
+    logging.getLogger("AssistantLogger").setLevel(logging.WARNING)
+    server = FakeIMAPServer(
+        latency=args.latency, connect_latency=args.connect_latency
+    ).start()
+    for uid in range(1, args.messages + 1):
+        server.store.add_message("INBOX", build_message(uid))
+
+    config = {
+        "email": "operaciones@example.com",
+        "password": "secreto",
+        "server": "127.0.0.1",
+        "port": server.port,
+        "use_ssl": False,
+        "smtp_server": "127.0.0.1",
+        "smtp_port": 25,
+    }
+    try:
+        for label, pooled in (("sin pool", False), ("con pool", True)):
+            config["cache_path"] = os.path.join(tempfile.mkdtemp(), "mail_cache.db")
+            timings = run_commands(EmailManager(config), args.commands, pooled)
+            print(
+                f"{label:>9}: media {statistics.mean(timings) * 1000:7.1f} ms  "
+                f"mediana {statistics.median(timings) * 1000:7.1f} ms  "
+                f"total {sum(timings):6.2f} s"
+            )
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
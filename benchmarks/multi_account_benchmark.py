@@ -0,0 +1,85 @@
+"""Benchmark: no leídos de varias cuentas y carpetas, en serie y en paralelo.
+
+Uso:
+    python -m benchmarks.multi_account_benchmark --accounts 3 --folders 2 --latency 0.03
+
+Compara recorrer los pares cuenta/carpeta uno tras otro con un EmailManager por
+cuenta frente al reparto en paralelo de MultiAccountEmailManager.
+"""
+
+import argparse
+import logging
+import os
+import tempfile
+import time
+from benchmarks.fake_imap_server import FakeIMAPServer, build_message
+from src.tasks.email_accounts import MultiAccountEmailManager
+from src.tasks.email_manager import EmailManager
+from src.utils.mail_cache import MailCache
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--accounts", type=int, default=3)
+    parser.add_argument("--folders", type=int, default=2)
+    parser.add_argument("--messages", type=int, default=30)
+    parser.add_argument("--latency", type=float, default=0.03)
+    parser.add_argument("--connect-latency", type=float, default=0.15)
+    args = parser.parse_args()
+
+    logging.getLogger("AssistantLogger").setLevel(logging.WARNING)
+    server = FakeIMAPServer(
+        latency=args.latency, connect_latency=args.connect_latency
+    ).start()
+    folders = ["INBOX"] + [f"Carpeta{i}" for i in range(1, args.folders)]
+    for folder in folders:
+        for uid in range(1, args.messages + 1):
+            server.store.add_message(folder, build_message(uid))
+
+    config = {
+        "password": "secreto",
+        "server": "127.0.0.1",
+        "port": server.port,
+        "use_ssl": False,
+        "smtp_server": "127.0.0.1",
+        "smtp_port": 25,
+        "accounts": [
+            {"name": f"cuenta{i}", "email": f"cuenta{i}@example.com", "folders": folders}
+            for i in range(args.accounts)
+        ],
+    }
+    try:
+        config["cache_path"] = os.path.join(tempfile.mkdtemp(), "mail_cache.db")
+        cache = MailCache(config["cache_path"])
+        managers = [
+            EmailManager({**config, **account}, cache=cache)
+            for account in config["accounts"]
+        ]
+        start = time.perf_counter()
+        emails = [
+            msg
+            for manager in managers
+            for folder in folders
+            for msg in manager.get_unread_emails(folder, None, include_body=False)
+        ]
+        serial = time.perf_counter() - start
+        for manager in managers:
+            manager.disconnect()
+
+        config["cache_path"] = os.path.join(tempfile.mkdtemp(), "mail_cache.db")
+        multi = MultiAccountEmailManager(config)
+        start = time.perf_counter()
+        merged = multi.get_unread_emails(limit=None)
+        parallel = time.perf_counter() - start
+        multi.disconnect()
+
+        pairs = args.accounts * len(folders)
+        print(f"{pairs} pares cuenta/carpeta, {len(emails)} / {len(merged)} correos")
+        print(f"   en serie: {serial:6.2f} s")
+        print(f"en paralelo: {parallel:6.2f} s")
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
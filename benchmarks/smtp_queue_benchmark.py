@@ -0,0 +1,91 @@
+"""Benchmark: envío de notificaciones con una sesión SMTP por mensaje frente a la cola.
+
+Uso:
+    python -m benchmarks.smtp_queue_benchmark --messages 50 --latency 0.01 --connect-latency 0.15
+
+`--latency` simula el RTT de cada comando SMTP, `--connect-latency` el coste de
+conectar y negociar TLS, y `--server-limit` hace que el servidor responda 421
+tras N mensajes por sesión para ejercitar la reconexión.
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from benchmarks.fake_smtp_server import FakeSMTPServer
+from src.tasks.email_manager import EmailManager
+
+
+def build_config(port: int, max_messages: int) -> dict:
+    return {
+        "email": "operaciones@example.com",
+        "password": "secreto",
+        "server": "127.0.0.1",
+        "port": 993,
+        "smtp_server": "127.0.0.1",
+        "smtp_port": port,
+        "smtp_starttls": False,
+        "smtp_queue": {"max_messages_per_session": max_messages},
+        "cache_path": os.path.join(tempfile.mkdtemp(), "mail_cache.db"),
+    }
+
+
+def notifications(count: int):
+    return [
+        {
+            "to": f"chofer{i}@example.com",
+            "subject": f"Envío TRK{i:04d} en ruta",
+            "body": "Tu envío salió del almacén.",
+        }
+        for i in range(count)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.01)
+    parser.add_argument("--connect-latency", type=float, default=0.15)
+    parser.add_argument("--server-limit", type=int, default=None)
+    args = parser.parse_args()
+
+    server = FakeSMTPServer(
+        latency=args.latency,
+        connect_latency=args.connect_latency,
+        max_messages_per_session=args.server_limit,
+    ).start()
+    try:
+        # Comportamiento anterior: una conexión y un LOGIN por mensaje
+        manager = EmailManager(build_config(server.port, max_messages=1))
+        start = time.perf_counter()
+        for msg in notifications(args.messages):
+            manager.send_email(msg["to"], msg["subject"], msg["body"])
+        sequential = time.perf_counter() - start
+        manager.disconnect()
+        sessions_before = server.sessions
+
+        manager = EmailManager(build_config(server.port, max_messages=100))
+        start = time.perf_counter()
+        jobs = manager.send_many(notifications(args.messages))
+        enqueued = time.perf_counter() - start
+        manager.outbox.flush()
+        queued = time.perf_counter() - start
+        manager.disconnect()
+
+        sent = sum(job.succeeded for job in jobs)
+        print(
+            f"sesión por mensaje: {sequential:6.2f} s "
+            f"({args.messages / sequential:6.1f} msg/s, {sessions_before} sesiones)"
+        )
+        print(
+            f"cola persistente:   {queued:6.2f} s "
+            f"({args.messages / queued:6.1f} msg/s, "
+            f"{server.sessions - sessions_before} sesiones, {sent} enviados, "
+            f"encolado en {enqueued * 1000:.1f} ms)"
+        )
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
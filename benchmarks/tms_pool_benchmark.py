@@ -0,0 +1,66 @@
+"""Benchmark: carga de viajes en el TMS con 1..N navegadores en paralelo.
+
+Uso:
+    python -m benchmarks.tms_pool_benchmark --trips 60 --workers 1 2 4 --latency 0.3
+
+Levanta el TMS de prueba de benchmarks/fake_tms_server.py y carga --trips
+viajes con TMSWorkerPool (src/utils/tms_pool.py), cada trabajador con su
+propio TMSManager de src/tasks y su Chrome sin interfaz. --latency simula lo
+que tarda el servidor en guardar cada viaje. Se informa el rendimiento en
+viajes por minuto y la aceleración respecto de un solo trabajador.
+Requiere Chrome y su driver instalados.
+"""
+
+import argparse
+import os
+from benchmarks.fake_tms_server import FakeTMSServer
+from src.tasks.tms_manager import TMSManager
+from src.utils.tms_pool import TMSWorkerPool
+
+
+def trips(count: int):
+    for i in range(count):
+        yield {
+            "origin": f"Depósito {i % 7}",
+            "destination": f"Cliente {i}",
+            "date": "2024-03-15",
+            "driver": f"Chofer {i % 12}",
+            "vehicle": f"AB{i:03d}CD",
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--trips", type=int, default=60)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--latency", type=float, default=0.3)
+    parser.add_argument("--extra-fields", type=int, default=0)
+    args = parser.parse_args()
+
+    server = FakeTMSServer(latency=args.latency, extra_fields=args.extra_fields).start()
+    # TMSManager toma el TMS de las variables de entorno sin tms_config.json
+    os.environ.update(
+        {"TMS_URL": server.url, "TMS_USERNAME": "operador", "TMS_PASSWORD": "secreto"}
+    )
+    baseline = None
+    try:
+        for workers in args.workers:
+            pool = TMSWorkerPool(
+                lambda index: TMSManager(browser={"profile_dir": None, "headless": True}),
+                workers=workers,
+                max_workers=max(args.workers),
+            )
+            result = pool.run(trips(args.trips), total=args.trips)
+            rate = result["loaded"] / result["elapsed"] * 60
+            baseline = baseline or rate
+            print(
+                f"{workers:>2} trabajadores: {result['elapsed']:6.1f} s "
+                f"{rate:7.1f} viajes/min  x{rate / baseline:4.2f}  "
+                f"fallidos {len(result['failed'])}  reparto {result['per_worker']}"
+            )
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""Benchmark: leer la tabla de resultados del TMS fila a fila o con un solo script.
+
+Uso:
+    python -m benchmarks.tms_table_benchmark --rows 1000 --columns 8
+
+Genera una página con una tabla table.results de --rows filas, como la
+consulta del TMS, y la lee con el recorrido anterior (find_elements de tr y
+luego de td por fila) y con src/utils/tms_manager.read_table, que trae toda la
+tabla en un execute_script. Requiere Chrome y su driver instalados.
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from selenium import webdriver
+from selenium.webdriver.common.by import By
+from src.utils.tms_manager import read_table
+
+
+def write_table(path: str, rows: int, columns: int) -> str:
+    headers = "".join(f"<th>Columna {c}</th>" for c in range(columns))
+    body = "\n".join(
+        "<tr>" + "".join(f"<td>Viaje {r} dato {c}</td>" for c in range(columns)) + "</tr>"
+        for r in range(rows)
+    )
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(
+            '<!DOCTYPE html><html lang="es"><head><meta charset="utf-8"></head><body>'
+            f'<table class="results"><tr>{headers}</tr>\n{body}</table></body></html>'
+        )
+    return "file://" + os.path.abspath(path)
+
+
+def walk_rows(table):
+    """Lectura anterior de TMSManager.get_data: una llamada por fila y por celda."""
+    rows = table.find_elements(By.TAG_NAME, "tr")
+    headers = [th.text for th in rows[0].find_elements(By.TAG_NAME, "th")]
+    return [
+        {headers[i]: cell.text for i, cell in enumerate(row.find_elements(By.TAG_NAME, "td"))}
+        for row in rows[1:]
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--columns", type=int, default=8)
+    args = parser.parse_args()
+
+    url = write_table(
+        os.path.join(tempfile.mkdtemp(), "resultados.html"), args.rows, args.columns
+    )
+    options = webdriver.ChromeOptions()
+    options.add_argument("--headless=new")
+    driver = webdriver.Chrome(options=options)
+    try:
+        driver.get(url)
+        table = driver.find_element(By.CSS_SELECTOR, "table[class*='results']")
+        results = {}
+        for label, reader in (
+            ("fila a fila", walk_rows),
+            ("un solo script", lambda table: read_table(driver, table)),
+        ):
+            start = time.perf_counter()
+            results[label] = reader(table)
+            elapsed = time.perf_counter() - start
+            print(f"{label:>15}: {elapsed:8.3f} s  ({len(results[label])} filas)")
+        if results["fila a fila"] != results["un solo script"]:
+            raise RuntimeError("Las dos lecturas no coinciden")
+    finally:
+        driver.quit()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""Benchmark: retraso de detección de WebDriverWait frente a SmartWait.
+
+Uso:
+    python -m benchmarks.wait_benchmark --rounds 30 --max-delay 1500
+
+En la página estática de benchmarks/whatsapp_fixture.py se programa la
+llegada de un mensaje tras un retraso aleatorio y se mide cuánto tarda cada
+espera en verlo, descontando ese retraso: WebDriverWait sondea cada 0,5 s y
+SmartWait (src/utils/browser_waits.py) reacciona a la mutación del DOM. Al
+final se muestran los histogramas que recoge SmartWait. Requiere Chrome y su
+driver instalados.
+"""
+
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+from selenium import webdriver
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import WebDriverWait
+from benchmarks.whatsapp_fixture import write_fixture
+from src.utils.browser_waits import SmartWait
+
+SCHEDULE_JS = """
+const [text, delay] = arguments;
+setTimeout(() => window.fakeWhatsApp.receive(0, text), delay);
+return sequence;
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=30)
+    parser.add_argument("--max-delay", type=int, default=1500)
+    args = parser.parse_args()
+
+    url = write_fixture(
+        os.path.join(tempfile.mkdtemp(), "whatsapp.html"), chats=3, messages_per_chat=100
+    )
+    options = webdriver.ChromeOptions()
+    options.add_argument("--headless=new")
+    driver = webdriver.Chrome(options=options)
+    try:
+        driver.get(url)
+        smart = SmartWait(driver)
+        waits = {
+            "WebDriverWait": lambda selector: WebDriverWait(driver, 20).until(
+                EC.presence_of_element_located((By.CSS_SELECTOR, selector))
+            ),
+            "SmartWait": lambda selector: smart.until_present("mensaje", selector),
+        }
+        lag = {label: [] for label in waits}
+        for index in range(args.rounds):
+            delay = random.randint(20, args.max_delay)
+            for label, wait in waits.items():
+                sequence = driver.execute_script(SCHEDULE_JS, f"Aviso {index}", delay)
+                start = time.perf_counter()
+                wait(f"[data-id$='_LIVE{sequence}']")
+                lag[label].append((time.perf_counter() - start) * 1000 - delay)
+        for label, values in lag.items():
+            print(
+                f"{label:>14}: retraso mediano {statistics.median(values):7.1f} ms"
+                f"  máximo {max(values):7.1f} ms"
+            )
+        print(smart.report())
+    finally:
+        driver.quit()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""Benchmark: leer mensajes nuevos re-escaneando el chat o vaciando el MutationObserver.
+
+Uso:
+    python -m benchmarks.whatsapp_capture_benchmark --history 2000 --new 5 --rounds 10
+
+Sobre la página estática de benchmarks/whatsapp_fixture.py se simula la
+llegada de --new mensajes por ronda y se comparan dos lecturas: recorrer todo
+el historial con extract_messages() o traer solo el delta con
+MessageCapture.drain(). Requiere Chrome y su driver instalados.
+"""
+
+import argparse
+import os
+import statistics
+import tempfile
+import time
+from selenium import webdriver
+from benchmarks.whatsapp_fixture import write_fixture
+from src.utils.whatsapp_scripts import MessageCapture, extract_messages
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--history", type=int, default=2000)
+    parser.add_argument("--new", type=int, default=5)
+    parser.add_argument("--rounds", type=int, default=10)
+    args = parser.parse_args()
+
+    url = write_fixture(
+        os.path.join(tempfile.mkdtemp(), "whatsapp.html"),
+        chats=1,
+        messages_per_chat=args.history,
+    )
+    options = webdriver.ChromeOptions()
+    options.add_argument("--headless=new")
+    driver = webdriver.Chrome(options=options)
+    try:
+        driver.get(url)
+        capture = MessageCapture(driver)
+        capture.install()
+        rescan, delta = [], []
+        for round_index in range(args.rounds):
+            for index in range(args.new):
+                driver.execute_script(
+                    "window.fakeWhatsApp.receive(0, arguments[0])",
+                    f"Mensaje nuevo {round_index}-{index}",
+                )
+            start = time.perf_counter()
+            extract_messages(driver)
+            rescan.append(time.perf_counter() - start)
+            start = time.perf_counter()
+            captured = capture.drain()
+            delta.append(time.perf_counter() - start)
+            assert len(captured) == args.new, captured
+        print(f"historial de {args.history} mensajes, {args.new} nuevos por ronda")
+        for label, timings in (("re-escaneo completo", rescan), ("búfer del observer", delta)):
+            print(f"{label:>20}: mediana {statistics.median(timings) * 1000:7.1f} ms")
+    finally:
+        driver.quit()
+
+
+if __name__ == "__main__":
+    main()
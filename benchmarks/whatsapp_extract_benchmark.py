@@ -0,0 +1,76 @@
+"""Benchmark: extracción de mensajes de WhatsApp Web elemento a elemento o con un script.
+
+Uso:
+    python -m benchmarks.whatsapp_extract_benchmark --messages 200 --repeat 5
+
+Abre en Chrome sin interfaz una copia estática del DOM de WhatsApp Web
+(benchmarks/whatsapp_fixture.py) y compara el recorrido anterior, con dos
+find_element y dos .text por mensaje, con un único execute_script.
+Requiere Chrome y su driver instalados.
+"""
+
+import argparse
+import os
+import statistics
+import tempfile
+import time
+from selenium import webdriver
+from selenium.webdriver.common.by import By
+from benchmarks.whatsapp_fixture import write_fixture
+from src.utils.whatsapp_scripts import (
+    AUTHOR_SELECTOR,
+    MESSAGE_SELECTOR,
+    TEXT_SELECTOR,
+    extract_messages,
+)
+
+
+def extract_per_element(driver) -> list:
+    """Recorrido anterior: una petición al WebDriver por cada consulta."""
+    messages = []
+    for msg in driver.find_elements(By.CSS_SELECTOR, MESSAGE_SELECTOR):
+        try:
+            sender = msg.find_element(By.CSS_SELECTOR, AUTHOR_SELECTOR).text
+            text = msg.find_element(By.CSS_SELECTOR, TEXT_SELECTOR).text
+            messages.append({"sender": sender, "text": text})
+        except Exception:
+            continue
+    return messages
+
+
+def measure(label: str, operation, repeat: int):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = operation()
+        timings.append(time.perf_counter() - start)
+    print(
+        f"{label:>20}: {len(result)} mensajes  mediana "
+        f"{statistics.median(timings) * 1000:8.1f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    url = write_fixture(
+        os.path.join(tempfile.mkdtemp(), "whatsapp.html"),
+        chats=1,
+        messages_per_chat=args.messages,
+    )
+    options = webdriver.ChromeOptions()
+    options.add_argument("--headless=new")
+    driver = webdriver.Chrome(options=options)
+    try:
+        driver.get(url)
+        measure("elemento a elemento", lambda: extract_per_element(driver), args.repeat)
+        measure("execute_script", lambda: extract_messages(driver), args.repeat)
+    finally:
+        driver.quit()
+
+
+if __name__ == "__main__":
+    main()
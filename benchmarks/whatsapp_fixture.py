@@ -0,0 +1,217 @@
+"""Página estática que imita el DOM de WhatsApp Web para benchmarks locales.
+
+Reproduce los selectores que usan los WhatsAppManager (lista de chats con
+indicador de no leídos, contenedores de mensaje con autor, texto y
+data-pre-plain-text, buscador, caja de redacción y botón de enviar). Un
+pequeño script en la página pinta el chat elegido al hacer clic, filtra la
+lista con el buscador, abre el chat indicado en ?phone= y expone
+window.fakeWhatsApp.receive(chat, texto) para simular la llegada de mensajes.
+Con boot_delay la aplicación tarda ese tiempo en aparecer tras cada carga,
+como la sincronización inicial de WhatsApp Web.
+"""
+
+import json
+import os
+from datetime import datetime, timedelta
+from typing import Any, Dict
+
+PAGE_TEMPLATE = """<!DOCTYPE html>
+<html lang="es">
+<head>
+<meta charset="utf-8">
+<title>WhatsApp</title>
+</head>
+<body>
+<!-- El QR queda oculto: connect() de src/utils lo espera antes que el menú -->
+<canvas aria-label="Scan me!" hidden></canvas>
+<div id="root"></div>
+<template id="app-template">
+<div id="app">
+  <div id="side">
+    <div title="Menu" role="button">Menú</div>
+    <div data-testid="search" contenteditable="true" title="Buscar"></div>
+    <div data-testid="chat-list" aria-label="Lista de chats"></div>
+  </div>
+  <div id="main">
+    <header><span data-testid="conversation-info-header-chat-title"></span></header>
+    <div data-testid="conversation-panel-messages"></div>
+    <footer>
+      <div title="Type a message" data-testid="conversation-compose-box-input"
+           contenteditable="true" role="textbox"></div>
+      <button data-testid="compose-btn-send"><span data-icon="send"></span></button>
+    </footer>
+  </div>
+</div>
+</template>
+<script>
+const DATA = __DATA__;
+let current = null;
+let sequence = 0;
+let query = "";
+
+function messageRow(chat, message) {
+  const row = document.createElement("div");
+  row.setAttribute("role", "row");
+  const bubble = document.createElement("div");
+  bubble.className = message.incoming ? "message-in" : "message-out";
+  bubble.setAttribute("data-id", message.id);
+  const container = document.createElement("div");
+  container.setAttribute("data-testid", "msg-container");
+  const copyable = document.createElement("div");
+  copyable.className = "copyable-text";
+  copyable.setAttribute(
+    "data-pre-plain-text", "[" + message.time + "] " + message.sender + ": ");
+  if (message.incoming) {
+    const author = document.createElement("span");
+    author.setAttribute("data-testid", "author");
+    author.textContent = message.sender;
+    copyable.appendChild(author);
+  }
+  const info = document.createElement("span");
+  info.setAttribute("data-testid", "conversation-info");
+  const text = document.createElement("span");
+  text.className = "selectable-text copyable-text";
+  text.textContent = message.text;
+  info.appendChild(text);
+  copyable.appendChild(info);
+  container.appendChild(copyable);
+  bubble.appendChild(container);
+  row.appendChild(bubble);
+  return row;
+}
+
+function renderChatList() {
+  const list = document.querySelector('[data-testid="chat-list"]');
+  list.innerHTML = "";
+  DATA.chats.forEach((chat, index) => {
+    if (query && !chat.name.toLowerCase().includes(query) && !chat.phone.includes(query)) {
+      return;
+    }
+    const item = document.createElement("div");
+    item.setAttribute("role", "listitem");
+    item.setAttribute("data-testid", "cell-frame-container");
+    item.setAttribute("data-phone", chat.phone);
+    const title = document.createElement("span");
+    title.setAttribute("title", chat.name);
+    title.textContent = chat.name;
+    item.appendChild(title);
+    if (chat.unread) {
+      const badge = document.createElement("span");
+      badge.setAttribute("data-testid", "icon-unread");
+      badge.textContent = chat.unread;
+      item.appendChild(badge);
+    }
+    item.addEventListener("click", () => openChat(index));
+    list.appendChild(item);
+  });
+}
+
+function openChat(index) {
+  current = index;
+  const chat = DATA.chats[index];
+  chat.unread = 0;
+  document.querySelector('[data-testid="conversation-info-header-chat-title"]').textContent = chat.name;
+  const panel = document.querySelector('[data-testid="conversation-panel-messages"]');
+  panel.replaceChildren(...chat.messages.map((message) => messageRow(chat, message)));
+  renderChatList();
+}
+
+function addMessage(index, text, incoming) {
+  const chat = DATA.chats[index];
+  const now = new Date();
+  const message = {
+    id: (incoming ? "false_" : "true_") + chat.phone + "@c.us_LIVE" + (sequence++),
+    sender: incoming ? chat.name : "Yo",
+    text: text,
+    time: now.toTimeString().slice(0, 5) + ", " + now.toLocaleDateString("es-ES"),
+    incoming: incoming,
+  };
+  chat.messages.push(message);
+  if (index === current) {
+    document.querySelector('[data-testid="conversation-panel-messages"]')
+      .appendChild(messageRow(chat, message));
+  } else if (incoming) {
+    chat.unread += 1;
+    renderChatList();
+  }
+  return message.id;
+}
+
+function boot() {
+  document.getElementById("root").appendChild(
+    document.getElementById("app-template").content.cloneNode(true));
+  document.querySelector('[data-icon="send"]').parentElement.addEventListener("click", () => {
+    const box = document.querySelector('[data-testid="conversation-compose-box-input"]');
+    const text = box.innerText.trim();
+    if (current !== null && text) {
+      addMessage(current, text, false);
+    }
+    box.textContent = "";
+  });
+  document.querySelector('[data-testid="search"]').addEventListener("input", (event) => {
+    query = event.target.innerText.trim().toLowerCase();
+    renderChatList();
+  });
+  renderChatList();
+  const phone = new URLSearchParams(location.search).get("phone");
+  const start = DATA.chats.findIndex((chat) => chat.phone === phone);
+  openChat(start >= 0 ? start : 0);
+}
+
+window.fakeWhatsApp = {
+  receive: (index, text) => addMessage(index, text, true),
+  openChat: openChat,
+};
+
+if (DATA.bootDelay) {
+  setTimeout(boot, DATA.bootDelay);
+} else {
+  boot();
+}
+</script>
+</body>
+</html>
+"""
+
+
+def build_data(
+    chats: int, messages_per_chat: int, boot_delay: float = 0
+) -> Dict[str, Any]:
+    start = datetime(2026, 10, 18, 8, 0)
+    data: Dict[str, Any] = {"chats": [], "bootDelay": int(boot_delay * 1000)}
+    for chat_index in range(chats):
+        name = f"Operador {chat_index + 1}"
+        phone = f"52155{chat_index + 1:08d}"
+        messages = []
+        for index in range(messages_per_chat):
+            incoming = index % 3 != 2
+            stamp = start + timedelta(minutes=index)
+            messages.append(
+                {
+                    "id": f"{str(not incoming).lower()}_{phone}@c.us_{index:06d}",
+                    "sender": name if incoming else "Yo",
+                    "text": f"Unidad {chat_index + 1}: parada {index} completada",
+                    "time": stamp.strftime("%H:%M, %d/%m/%Y"),
+                    "incoming": incoming,
+                }
+            )
+        data["chats"].append(
+            {"name": name, "phone": phone, "unread": 3, "messages": messages}
+        )
+    return data
+
+
+def write_fixture(
+    path: str, chats: int = 3, messages_per_chat: int = 200, boot_delay: float = 0
+) -> str:
+    """Escribir la página y devolver su URL file://.
+
+    boot_delay son los segundos que tarda la aplicación en aparecer tras
+    cargar la página.
+    """
+    html = PAGE_TEMPLATE.replace(
+        "__DATA__", json.dumps(build_data(chats, messages_per_chat, boot_delay))
+    )
+    with open(path, "w", encoding="utf-8") as fixture:
+        fixture.write(html)
+    return "file://" + os.path.abspath(path)
@@ -0,0 +1,76 @@
+"""Benchmark: cambiar de chat recargando la URL o desde el buscador de la aplicación.
+
+Uso:
+    python -m benchmarks.whatsapp_navigation_benchmark --chats 5 --messages 20 --boot-delay 2
+
+Envía --messages mensajes repartidos entre --chats chats, cambiando de chat
+en cada uno, con WhatsAppManager sobre la página estática de
+benchmarks/whatsapp_fixture.py. Se compara la navegación a la URL del chat
+con la apertura desde el buscador. --boot-delay simula los segundos que
+tarda WhatsApp Web en arrancar y sincronizar tras cada recarga.
+Requiere Chrome y su driver instalados.
+
+Resultados: pendientes. El ahorro de latencia por mensaje al abrir los
+chats desde el buscador todavía no se ha medido (el entorno donde se
+escribió no tenía Chrome), así que no está verificado hasta ejecutar este
+benchmark y anotar aquí las cifras.
+"""
+
+import argparse
+import os
+import statistics
+import tempfile
+import time
+from selenium import webdriver
+from benchmarks.whatsapp_fixture import build_data, write_fixture
+from src.utils.whatsapp_manager import WhatsAppManager
+
+
+def run(driver, url: str, phones, messages: int, in_app: bool):
+    manager = WhatsAppManager(
+        {"url": url, "chat_url": url + "?phone={phone}", "in_app_navigation": in_app},
+        driver=driver,
+    )
+    if not manager.connect():
+        raise RuntimeError("No se pudo abrir la página de prueba")
+    timings = []
+    for index in range(messages):
+        phone = phones[index % len(phones)]
+        start = time.perf_counter()
+        manager.open_chat(phone)
+        manager.type_message(phone, f"Aviso {index}: recoger carga en andén 3")
+        timings.append(time.perf_counter() - start)
+    return timings, manager.navigation_counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chats", type=int, default=5)
+    parser.add_argument("--messages", type=int, default=20)
+    parser.add_argument("--boot-delay", type=float, default=2.0)
+    args = parser.parse_args()
+
+    url = write_fixture(
+        os.path.join(tempfile.mkdtemp(), "whatsapp.html"),
+        chats=args.chats,
+        messages_per_chat=100,
+        boot_delay=args.boot_delay,
+    )
+    phones = [chat["phone"] for chat in build_data(args.chats, 0)["chats"]]
+    for label, in_app in (("URL del chat", False), ("buscador", True)):
+        # Un navegador por modo: el manager cierra el driver al destruirse
+        options = webdriver.ChromeOptions()
+        options.add_argument("--headless=new")
+        driver = webdriver.Chrome(options=options)
+        try:
+            timings, counts = run(driver, url, phones, args.messages, in_app)
+        finally:
+            driver.quit()
+        print(
+            f"{label:>12}: mediana {statistics.median(timings) * 1000:8.1f} ms/mensaje"
+            f"  total {sum(timings):6.2f} s  aperturas {counts}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,15 @@
 import pyttsx3
 import keyboard
+import queue
+import threading
 import time
 from typing import Dict, Any
 from src.utils.auth_manager import AuthManager
 from src.tasks.email_manager import EmailManager
+from src.tasks.email_accounts import MultiAccountEmailManager
 from src.tasks.whatsapp_manager import WhatsAppManager
 from src.tasks.tms_manager import TMSManager
+from src.utils.browser_broker import BrowserBroker
 from src.utils.logger import Logger
 from src.learning.action_learner import ActionLearner
 
@@ -18,6 +22,11 @@ class Assistant:
         self.email_manager = None
         self.whatsapp_manager = None
         self.tms_manager = None
+        self._watch_thread = None
+        # Un solo Chrome para WhatsApp y el TMS, con una pestaña cada uno
+        self.browser = None
+        # Eventos en segundo plano (p. ej. correo nuevo) para mostrar en la GUI
+        self.notifications: "queue.Queue[Dict[str, Any]]" = queue.Queue()
         self.engine = pyttsx3.init()
         self.setup_voice()
         self.learning_system = (
@@ -45,33 +54,76 @@ class Assistant:
         try:
             # Configurar email
             if self.config["email"]:
-                self.email_manager = EmailManager(
-                    self.config["email"]["email"],
-                    self.config["email"]["password"],
-                    self.config["email"]["server"],
-                    self.config["email"]["port"],
+                if self.config["email"].get("accounts"):
+                    self.email_manager = MultiAccountEmailManager(
+                        self.config["email"], logger=self.logger
+                    )
+                else:
+                    self.email_manager = EmailManager(
+                        self.config["email"], logger=self.logger
+                    )
+                if self.config["email"].get("push_notifications", True):
+                    self.email_manager.add_event_listener(self.on_email_event)
+                    # La conexión IMAP no debe retrasar el arranque
+                    self._watch_thread = threading.Thread(
+                        target=self.email_manager.start_watching,
+                        name="mail-watch-start",
+                        daemon=True,
+                    )
+                    self._watch_thread.start()
+
+            if (self.config["whatsapp"] or self.config["tms"]) and not self.browser:
+                self.browser = BrowserBroker(
+                    self.config.get("browser"), logger=self.logger
                 )
 
             # Configurar WhatsApp
             if self.config["whatsapp"]:
                 self.whatsapp_manager = WhatsAppManager(
-                    self.config["whatsapp"]["phone"], self.config["whatsapp"]["api_key"]
+                    self.config["whatsapp"], broker=self.browser
                 )
 
-            # Configurar TMS
+            # Configurar TMS (su configuración está en config/tms_config.json)
             if self.config["tms"]:
-                self.tms_manager = TMSManager(
-                    self.config["tms"]["url"],
-                    self.config["tms"]["username"],
-                    self.config["tms"]["password"],
-                    self.config["tms"]["api_key"],
-                )
+                self.tms_manager = TMSManager(broker=self.browser)
 
             return True
         except Exception as e:
             self.logger.log(f"Error al inicializar servicios: {str(e)}", "ERROR")
             return False
 
+    def shutdown_services(self):
+        """Detener las escuchas y cerrar conexiones y navegador de los servicios."""
+        if self._watch_thread:
+            self._watch_thread.join(timeout=30)
+            self._watch_thread = None
+        services = (
+            ("correo", self.email_manager),
+            ("WhatsApp", self.whatsapp_manager),
+            ("TMS", self.tms_manager),
+        )
+        for name, manager in services:
+            if not manager:
+                continue
+            try:
+                manager.disconnect()
+            except Exception as e:
+                self.logger.error(f"Error al cerrar el servicio de {name}: {e}")
+        self.email_manager = None
+        self.whatsapp_manager = None
+        self.tms_manager = None
+        if self.browser:
+            self.browser.shutdown()
+            self.browser = None
+
+    def on_email_event(self, event: Dict[str, Any]):
+        """Recibir eventos de correo del hilo IMAP IDLE."""
+        if event["type"] == "new_mail":
+            self.logger.info(
+                f"Nuevo correo de {event['from']}: {event['subject']}"
+            )
+        self.notifications.put(event)
+
     def handle_command(self, command):
         """Manejar comandos de voz."""
         command = command.lower()
@@ -81,7 +133,9 @@ class Assistant:
                 if "enviar" in command:
                     self.email_manager.send_email()
                 elif "leer" in command:
-                    self.email_manager.read_emails()
+                    response = self.email_manager.handle_command(command)
+                    if response:
+                        self.speak(response)
             else:
                 self.speak("No se han configurado las credenciales de correo")
 
@@ -109,6 +163,8 @@ class Assistant:
             setup = InitialSetup()
             setup.run_setup()
             self.config = setup.get_config()
+            # Sin esto quedarían abiertos los hilos IDLE y las conexiones anteriores
+            self.shutdown_services()
             self.initialize_services()
             self.speak("Credenciales actualizadas correctamente")
 
@@ -152,3 +208,5 @@ class Assistant:
                 self.speak(
                     "Lo siento, ha ocurrido un error. ¿Podrías repetir tu solicitud?"
                 )
+
+        self.shutdown_services()
@@ -3,6 +3,7 @@ from tkinter import ttk, scrolledtext
 import pyautogui
 import keyboard
 import time
+import queue
 from PIL import Image, ImageTk
 import os
 
@@ -21,8 +22,12 @@ class AssistantGUI:
         style.configure("TButton", padding=6, relief="flat", background="#2196F3")
         style.configure("TLabel", padding=6)
 
+        # No leídos por (cuenta, carpeta) para mostrar el total de todos los buzones
+        self.unread_counts = {}
+
         self.create_widgets()
         self.setup_hotkeys()
+        self.root.after(1000, self.process_notifications)
 
     def create_widgets(self):
         # Frame principal
@@ -139,6 +144,26 @@ class AssistantGUI:
         """Actualizar barra de progreso."""
         self.progress["value"] = value
 
+    def process_notifications(self):
+        """Mostrar los eventos en segundo plano del asistente (correo nuevo)."""
+        try:
+            while True:
+                event = self.assistant.notifications.get_nowait()
+                if event["type"] == "new_mail":
+                    self.update_chat(
+                        f"Nuevo correo de {event['from']}: {event['subject']}"
+                    )
+                elif event["type"] == "unread_changed":
+                    key = (event.get("account"), event["folder"])
+                    self.unread_counts[key] = event["unread"]
+                    total = sum(self.unread_counts.values())
+                    self.status_label.config(
+                        text=f"Asistente en espera · {total} correos no leídos"
+                    )
+        except queue.Empty:
+            pass
+        self.root.after(1000, self.process_notifications)
+
     def run(self):
         """Ejecutar la interfaz."""
         self.root.mainloop()
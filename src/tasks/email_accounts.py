@@ -0,0 +1,237 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from src.tasks.email_manager import EmailManager, MailCommandsMixin
+from src.utils.logger import Logger
+from src.utils.mail_cache import MailCache
+
+
+def _relevance_key(msg: Dict[str, Any]) -> Tuple[bool, float, float]:
+    """Clave de orden de búsqueda: bm25 (menor es mejor); sin puntuación, al final
+    y por fecha (aciertos del servidor o búsquedas sin texto libre)."""
+    score = msg.get("score")
+    return (score is None, score or 0.0, -_date_key(msg))
+
+
+def _date_key(msg: Dict[str, Any]) -> float:
+    """Clave de orden por fecha; las fechas sin zona horaria se asumen UTC."""
+    date = msg.get("date")
+    if not isinstance(date, datetime):
+        return float("-inf")
+    if date.tzinfo is None:
+        date = date.replace(tzinfo=timezone.utc)
+    return date.timestamp()
+
+
+class MultiAccountEmailManager(MailCommandsMixin):
+    """Varias cuentas de correo, cada una con sus carpetas, consultadas en paralelo.
+
+    Configuración (bloque "email"): los valores comunes van en el nivel superior
+    y cada elemento de "accounts" los hereda y los puede sobrescribir:
+
+        {
+            "server": "imap.example.com", "port": 993, ...,
+            "max_workers": 8,
+            "accounts": [
+                {"name": "operaciones", "email": "...", "password": "...",
+                 "folders": ["INBOX", "Incidencias"], "max_concurrency": 2},
+                {"name": "facturacion", "email": "...", "password": "..."}
+            ]
+        }
+
+    Las consultas de cada par cuenta/carpeta se reparten en un ThreadPoolExecutor
+    compartido; un semáforo por cuenta limita cuántas se ejecutan a la vez contra
+    el mismo proveedor (por defecto, el tamaño de su pool IMAP). Todas las
+    cuentas comparten la misma caché local.
+    """
+
+    def __init__(self, config: Dict[str, Any], logger: Optional[Logger] = None):
+        self.config = config
+        self.logger = logger if logger else Logger()
+        self.cache = MailCache(
+            config.get("cache_path", os.path.join("data", "mail_cache.db")),
+            logger=self.logger,
+        )
+        defaults = {key: value for key, value in config.items() if key != "accounts"}
+
+        self.managers: Dict[str, EmailManager] = {}
+        self.folders: Dict[str, List[str]] = {}
+        self.concurrency: Dict[str, int] = {}
+        self._limits: Dict[str, threading.BoundedSemaphore] = {}
+        for account_config in config.get("accounts", []):
+            account_config = {**defaults, **account_config}
+            name = account_config.get("name") or account_config.get("email")
+            self.managers[name] = EmailManager(
+                account_config, logger=self.logger, cache=self.cache
+            )
+            self.folders[name] = account_config.get("folders") or ["INBOX"]
+            concurrency = account_config.get(
+                "max_concurrency",
+                account_config.get("imap_pool", {}).get("max_size", 2),
+            )
+            self.concurrency[name] = max(1, concurrency)
+            self._limits[name] = threading.BoundedSemaphore(self.concurrency[name])
+
+        self.default_account = config.get("default_account") or next(
+            iter(self.managers), None
+        )
+        max_workers = config.get("max_workers", sum(self.concurrency.values()) or 1)
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="mail-fanout"
+        )
+
+    def _pairs(
+        self, folder: Optional[str] = None, account: Optional[str] = None
+    ) -> List[Tuple[str, str]]:
+        accounts = [account] if account else list(self.managers)
+        return [
+            (name, folder_name)
+            for name in accounts
+            for folder_name in ([folder] if folder else self.folders[name])
+        ]
+
+    def _fan_out(
+        self,
+        pairs: List[Tuple[str, str]],
+        task: Callable[[EmailManager, str], Any],
+    ) -> List[Any]:
+        """Ejecutar task(manager, carpeta) para cada par en paralelo."""
+
+        def run(name: str, folder: str) -> Any:
+            with self._limits[name]:
+                result = task(self.managers[name], folder)
+            # La caché guarda la dirección; account= espera el nombre de la cuenta
+            if isinstance(result, list):
+                for item in result:
+                    item["account"] = name
+            return result
+
+        futures = {
+            (name, folder): self._executor.submit(run, name, folder)
+            for name, folder in pairs
+        }
+        results = []
+        for (name, folder), future in futures.items():
+            try:
+                results.append(future.result())
+            except Exception as e:
+                self.logger.error(f"Error consultando {folder} de {name}: {e}")
+        return results
+
+    @staticmethod
+    def _merge(
+        results: List[List[Any]],
+        limit: Optional[int],
+        key: Callable[[Dict[str, Any]], Any] = _date_key,
+        reverse: bool = True,
+    ) -> List[Any]:
+        merged = [msg for messages in results for msg in messages]
+        merged.sort(key=key, reverse=reverse)
+        return merged[:limit] if limit else merged
+
+    def get_unread_emails(
+        self,
+        folder: Optional[str] = None,
+        limit: Optional[int] = 10,
+        include_body: bool = False,
+        account: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        """Correos no leídos de todas las cuentas y carpetas, más recientes primero.
+
+        Cada resultado lleva las claves "account" (el nombre de la cuenta, el
+        mismo que acepta account=) y "folder" de su origen. Sin folder ni
+        account se consultan todas las carpetas configuradas.
+        """
+        results = self._fan_out(
+            self._pairs(folder, account),
+            lambda manager, folder_name: manager.get_unread_emails(
+                folder_name, limit, include_body
+            ),
+        )
+        return self._merge(results, limit)
+
+    def get_unread_threads(
+        self,
+        folder: Optional[str] = None,
+        limit: Optional[int] = None,
+        account: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        """Conversaciones con no leídos de todas las cuentas, la más reciente primero."""
+        results = self._fan_out(
+            self._pairs(folder, account),
+            lambda manager, folder_name: manager.get_unread_threads(folder_name, limit),
+        )
+        return self._merge(results, limit)
+
+    def count_unread_emails(
+        self, folder: Optional[str] = None, account: Optional[str] = None
+    ) -> int:
+        return sum(
+            self.managers[name].count_unread_emails(folder_name)
+            for name, folder_name in self._pairs(folder, account)
+        )
+
+    def search_emails(
+        self,
+        query: str,
+        folder: Optional[str] = None,
+        limit: Optional[int] = 20,
+        use_server: bool = False,
+        account: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        """Buscar en todas las cuentas y carpetas, el más relevante primero.
+
+        Los resultados del índice local se mezclan por su puntuación bm25; los
+        que no la tienen (búsqueda en el servidor) van detrás, por fecha.
+        """
+        results = self._fan_out(
+            self._pairs(folder, account),
+            lambda manager, folder_name: manager.search_emails(
+                query, folder_name, limit, use_server
+            ),
+        )
+        return self._merge(results, limit, key=_relevance_key, reverse=False)
+
+    def sync_all(self) -> bool:
+        """Sincronizar en paralelo todas las carpetas configuradas."""
+        results = self._fan_out(
+            self._pairs(), lambda manager, folder_name: manager.sync_folder(folder_name)
+        )
+        return len(results) == len(self._pairs()) and all(results)
+
+    def send_email(
+        self,
+        to_email: str,
+        subject: str,
+        body: str,
+        wait: bool = True,
+        account: Optional[str] = None,
+    ) -> bool:
+        """Enviar desde la cuenta indicada o, si no, desde la cuenta por defecto."""
+        manager = self.managers.get(account or self.default_account)
+        if not manager:
+            self.logger.error("No hay ninguna cuenta de correo configurada.")
+            return False
+        return manager.send_email(to_email, subject, body, wait)
+
+    def add_event_listener(self, callback: Callable[[Dict[str, Any]], None]):
+        for manager in self.managers.values():
+            manager.add_event_listener(callback)
+
+    def start_watching(self) -> bool:
+        """Escuchar con IMAP IDLE todas las carpetas configuradas de cada cuenta."""
+        watching = [
+            self.managers[name].start_watching(folder)
+            for name, folder in self._pairs()
+        ]
+        return all(watching)
+
+    def stop_watching(self):
+        for manager in self.managers.values():
+            manager.stop_watching()
+
+    def disconnect(self):
+        for manager in self.managers.values():
+            manager.disconnect()
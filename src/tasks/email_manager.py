@@ -1,19 +1,127 @@
 import os
-import smtplib
-import ssl
 import re
+import threading
 from email.message import EmailMessage
-from typing import List, Dict, Any, Optional
-from imap_tools import MailBox, AND
+from typing import List, Dict, Any, Callable, Iterable, Optional
 from src.utils.logger import Logger
+from src.utils.imap_pool import IMAPConnectionPool
+from src.utils.mail_cache import MailCache
+from src.utils.mail_parts import (
+    ATTACHMENT_CHUNK_SIZE,
+    ByteBudget,
+    DownloadBudgetExceeded,
+    stream_attachment,
+)
+from src.utils.mail_sync import LazyMailMessage, MailSync
+from src.utils.mail_query import MailQuery
+from src.utils.imap_idle import IdleWatcher
+from src.utils.smtp_queue import OutboundMailQueue, SendJob, SMTPSession
 
 
-class EmailManager:
-    def __init__(self, config: Dict[str, Any], logger: Optional[Logger] = None):
-        """Inicializa el EmailManager con la configuración proporcionada."""
+class MailCommandsMixin:
+    """Interpretación de los comandos de voz de correo.
+
+    La clase que lo use debe ofrecer get_unread_threads, count_unread_emails,
+    search_emails y send_email.
+    """
+
+    def handle_command(self, command: str) -> Optional[str]:
+        """Procesar comandos relacionados con correo."""
+        command = command.lower()
+        response = None
+
+        if "leer" in command and ("correo" in command or "email" in command):
+            if "no leídos" in command:
+                threads = self.get_unread_threads()
+                if threads:
+                    response = f"Tienes {self.count_unread_emails()} correos no leídos en {len(threads)} conversaciones. La más reciente es de {threads[0]['from']} con asunto: {threads[0]['subject']}."
+                else:
+                    response = "No tienes correos no leídos."
+            else:
+                response = "Función para leer todos los correos aún no implementada."
+
+        elif ("buscar" in command or "encuentra" in command) and (
+            "correo" in command or "email" in command
+        ):
+            try:
+                match = re.search(
+                    r"(?:buscar|encuentra) (?:correos?|emails?) (?:(de|sobre) )?(.+)",
+                    command,
+                )
+                if match and match.group(2).strip():
+                    search_term = match.group(2).strip()
+                    if match.group(1) == "de" and ":" not in search_term:
+                        query = f'from:"{search_term}"'
+                    else:
+                        query = search_term
+                    emails = self.search_emails(query)
+                    if emails:
+                        response = f"Encontré {len(emails)} correos relacionados con '{search_term}'. El más relevante es de {emails[0]['from']} con asunto: {emails[0]['subject']}."
+                    else:
+                        response = (
+                            f"No encontré correos relacionados con '{search_term}'."
+                        )
+                else:
+                    response = "Por favor, especifica qué quieres buscar en el correo."
+            except Exception as e:
+                self.logger.error(
+                    f"Error procesando comando de búsqueda de correo: {e}"
+                )
+                response = "Hubo un error al intentar buscar el correo."
+
+        elif ("enviar" in command or "mandar" in command) and (
+            "correo" in command or "email" in command
+        ):
+            try:
+                to_match = re.search(r" a ([\w\.-]+@[\w\.-]+)", command)
+                subject_match = re.search(r" asunto (.+?)(?: cuerpo |$)", command)
+                body_match = re.search(r" cuerpo (.+)", command)
+
+                if to_match and subject_match and body_match:
+                    to_email = to_match.group(1)
+                    subject = subject_match.group(1).strip()
+                    body = body_match.group(1).strip()
+
+                    self.logger.info(
+                        f"Intentando enviar correo a {to_email} con asunto '{subject}'"
+                    )
+                    if self.send_email(to_email, subject, body):
+                        response = f"Correo enviado a {to_email}."
+                    else:
+                        response = (
+                            "Hubo un problema al enviar el correo. Revisa los logs."
+                        )
+                else:
+                    response = "No pude entender todos los detalles para enviar el correo. Necesito destinatario, asunto y cuerpo."
+            except Exception as e:
+                self.logger.error(f"Error procesando comando de envío de correo: {e}")
+                response = "Hubo un error al intentar enviar el correo."
+
+        else:
+            pass
+
+        return response
+
+
+class EmailManager(MailCommandsMixin):
+    def __init__(
+        self,
+        config: Dict[str, Any],
+        logger: Optional[Logger] = None,
+        cache: Optional[MailCache] = None,
+    ):
+        """Inicializa el EmailManager con la configuración proporcionada.
+
+        cache permite compartir una misma caché local entre varias cuentas.
+        """
         self.config = config
         self.logger = logger if logger else Logger()
-        self.mailbox = None
+        self.pool: Optional[IMAPConnectionPool] = None
+        self._connect_lock = threading.Lock()
+        self.sync: Optional[MailSync] = None
+        self.watchers: Dict[str, IdleWatcher] = {}
+        self._event_listeners: List[Callable[[Dict[str, Any]], None]] = []
+        self.outbox: Optional[OutboundMailQueue] = None
 
         # Extraer configuración necesaria
         self.email = self.config.get("email")
@@ -38,227 +146,409 @@ class EmailManager:
                 "Configuración de correo incompleta. Faltan datos necesarios."
             )
 
+        self.cache = cache or MailCache(
+            self.config.get("cache_path", os.path.join("data", "mail_cache.db")),
+            logger=self.logger,
+        )
+
+        attachment_config = self.config.get("attachments", {})
+        self.download_dir = attachment_config.get(
+            "download_dir", os.path.join("data", "attachments")
+        )
+        self.download_chunk_size = attachment_config.get(
+            "chunk_size", ATTACHMENT_CHUNK_SIZE
+        )
+        self.download_budget = ByteBudget(
+            attachment_config.get("max_message_bytes", 40 * 1024 * 1024),
+            attachment_config.get("max_session_bytes", 400 * 1024 * 1024),
+        )
+
     def connect(self) -> bool:
-        """Conectar al servidor IMAP usando la configuración proporcionada."""
+        """Conectar al servidor IMAP usando la configuración proporcionada.
+
+        Es seguro llamarlo desde varios hilos: solo el primero abre el pool.
+        """
         if not self.email or not self.password or not self.imap_server:
             self.logger.error("Credenciales o servidor IMAP no configurados.")
             return False
-        try:
-            self.mailbox = MailBox(self.imap_server, self.imap_port)
-            self.mailbox.login(self.email, self.password, initial_folder="INBOX")
-            self.logger.info(
-                f"Conexión IMAP exitosa a {self.imap_server} para {self.email}"
-            )
-            return True
-        except Exception as e:
-            self.logger.error(
-                f"Error al conectar al servidor IMAP {self.imap_server}: {e}"
-            )
-            self.mailbox = None
-            return False
+        with self._connect_lock:
+            if self.pool:
+                return True
+            pool = None
+            try:
+                pool_config = self.config.get("imap_pool", {})
+                pool = IMAPConnectionPool(
+                    self.imap_server,
+                    self.imap_port,
+                    self.email,
+                    self.password,
+                    use_ssl=self.imap_ssl,
+                    max_size=pool_config.get("max_size", 2),
+                    max_idle=pool_config.get("max_idle", 300),
+                    keepalive_interval=pool_config.get("keepalive_interval", 60),
+                    logger=self.logger,
+                )
+                pool.warm_up()
+                pool.start_keepalive()
+                self.sync = MailSync(
+                    pool,
+                    self.cache,
+                    self.email,
+                    prefetch_bodies=self.config.get("index_bodies", False),
+                    logger=self.logger,
+                )
+                self.pool = pool
+                self.logger.info(
+                    f"Conexión IMAP exitosa a {self.imap_server} para {self.email}"
+                )
+                return True
+            except Exception as e:
+                self.logger.error(
+                    f"Error al conectar al servidor IMAP {self.imap_server}: {e}"
+                )
+                if pool:
+                    pool.close()
+                self.pool = None
+                return False
 
     def disconnect(self):
-        """Desconectar del servidor IMAP."""
-        if self.mailbox:
+        """Desconectar de los servidores IMAP y SMTP."""
+        self.stop_watching()
+        if self.outbox:
+            self.outbox.stop(timeout=30)
+        if self.pool:
             try:
-                self.mailbox.logout()
+                self.pool.close()
                 self.logger.info("Desconectado del servidor IMAP.")
             except Exception as e:
                 self.logger.error(f"Error al desconectar del servidor IMAP: {e}")
             finally:
-                self.mailbox = None
+                self.pool = None
+                self.sync = None
+
+    def add_event_listener(self, callback: Callable[[Dict[str, Any]], None]):
+        """Registrar un oyente para los eventos de correo nuevo (IMAP IDLE)."""
+        self._event_listeners.append(callback)
+        for watcher in self.watchers.values():
+            watcher.add_listener(callback)
+
+    def start_watching(self, folder: str = "INBOX") -> bool:
+        """Escuchar la carpeta con IMAP IDLE en segundo plano."""
+        if self.is_watching(folder):
+            return True
+        if not self.pool:
+            if not self.connect():
+                return False
+        watcher = IdleWatcher(
+            self.pool, self.sync, self.cache, folder=folder, logger=self.logger
+        )
+        for callback in self._event_listeners:
+            watcher.add_listener(callback)
+        watcher.start()
+        self.watchers[folder] = watcher
+        return True
+
+    def stop_watching(self):
+        """Detener todas las escuchas IMAP IDLE."""
+        for watcher in self.watchers.values():
+            watcher.stop()
+        self.watchers.clear()
+
+    def is_watching(self, folder: str = "INBOX") -> bool:
+        watcher = self.watchers.get(folder)
+        return bool(watcher and watcher.is_running)
+
+    def sync_folder(self, folder: str = "INBOX") -> bool:
+        """Traer a la caché local solo los correos nuevos de la carpeta."""
+        if not self.pool:
+            if not self.connect():
+                return False
+        try:
+            self.sync.sync_folder(folder)
+            return True
+        except Exception as e:
+            self.logger.error(f"Error al sincronizar {folder}: {e}")
+            return False
 
     def get_unread_emails(
-        self, folder: str = "INBOX", limit: Optional[int] = 10
+        self,
+        folder: str = "INBOX",
+        limit: Optional[int] = 10,
+        include_body: bool = True,
     ) -> List[Dict[str, Any]]:
-        """Obtener correos no leídos de una carpeta específica."""
-        if not self.mailbox:
-            if not self.connect():
-                return []
+        """Obtener correos no leídos de una carpeta específica.
+
+        Se responde desde la caché local tras una sincronización incremental;
+        los cuerpos se descargan solo si se piden y aún no están en caché. Con
+        include_body=False se devuelven resúmenes (LazyMailMessage) que bajan el
+        cuerpo únicamente al consultarlo. De los adjuntos solo se obtienen sus
+        metadatos (BODYSTRUCTURE); el contenido se descarga con
+        download_attachment.
+        """
+        # Con IDLE activo la caché ya está al día: no hace falta ir al servidor
+        if not self.is_watching(folder) and not self.sync_folder(folder):
+            self.logger.warning(f"Usando la caché local de {folder} sin sincronizar.")
 
         emails_data = []
         try:
-            self.mailbox.folder.set(folder)
-            messages = self.mailbox.fetch(AND(seen=False), limit=limit, reverse=True)
-            for msg in messages:
-                emails_data.append(
-                    {
-                        "uid": msg.uid,
-                        "subject": msg.subject,
-                        "from": msg.from_,
-                        "to": msg.to,
-                        "date": msg.date,
-                        "text": msg.text or msg.html,
-                        "attachments": [att.filename for att in msg.attachments],
-                    }
+            emails_data = self.cache.get_unread(self.email, folder, limit)
+            if include_body and self.sync:
+                emails_data = self.sync.load_bodies(
+                    folder, [msg["uid"] for msg in emails_data]
                 )
+            elif not include_body:
+                emails_data = [
+                    LazyMailMessage(msg, self._body_loader(folder))
+                    for msg in emails_data
+                ]
             self.logger.info(
                 f"Recuperados {len(emails_data)} correos no leídos de {folder}."
             )
         except Exception as e:
             self.logger.error(f"Error al obtener correos no leídos de {folder}: {e}")
-        finally:
-            pass
         return emails_data
 
+    def get_unread_threads(
+        self, folder: str = "INBOX", limit: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """Correos no leídos agrupados por conversación y sin copias repetidas.
+
+        La agrupación se mantiene en la caché al sincronizar, así que aquí solo
+        se consulta. Cada elemento trae thread_id, messages, duplicates,
+        subject, from, date y el último mensaje en latest.
+        """
+        if not self.is_watching(folder) and not self.sync_folder(folder):
+            self.logger.warning(f"Usando la caché local de {folder} sin sincronizar.")
+        try:
+            return self.cache.get_unread_threads(self.email, folder, limit)
+        except Exception as e:
+            self.logger.error(f"Error al agrupar los correos no leídos de {folder}: {e}")
+            return []
+
+    def _body_loader(self, folder: str):
+        def load(uid: str) -> Dict[str, Any]:
+            if not self.sync and not self.connect():
+                return {"text": None, "attachments": []}
+            loaded = self.sync.load_bodies(folder, [uid])
+            return loaded[0] if loaded else {"text": None, "attachments": []}
+
+        return load
+
+    def list_attachments(self, uid: str, folder: str = "INBOX") -> List[Dict[str, Any]]:
+        """Metadatos de los adjuntos de un correo (nombre, sección, tipo, tamaño).
+
+        Se obtienen de BODYSTRUCTURE sin descargar el contenido de los adjuntos.
+        """
+        if not self.sync and not self.connect():
+            return []
+        try:
+            loaded = self.sync.load_bodies(folder, [uid])
+        except Exception as e:
+            self.logger.error(f"Error al obtener los adjuntos del correo {uid}: {e}")
+            return []
+        return loaded[0]["attachment_parts"] if loaded else []
+
+    def download_attachment(
+        self,
+        uid: str,
+        attachment: Any = 0,
+        folder: str = "INBOX",
+        dest_dir: Optional[str] = None,
+    ) -> Optional[str]:
+        """Descargar un adjunto a disco por trozos. Devuelve la ruta del fichero.
+
+        attachment es el índice del adjunto o su nombre de fichero. La descarga
+        se rechaza si supera el presupuesto de bytes por mensaje o por sesión
+        (configuración attachments.max_message_bytes / max_session_bytes).
+        """
+        attachments = self.list_attachments(uid, folder)
+        if isinstance(attachment, int):
+            part = attachments[attachment] if attachment < len(attachments) else None
+        else:
+            part = next(
+                (item for item in attachments if item["filename"] == attachment), None
+            )
+        if not part:
+            self.logger.warning(f"El correo {uid} no tiene el adjunto '{attachment}'.")
+            return None
+
+        dest_dir = dest_dir or self.download_dir
+        os.makedirs(dest_dir, exist_ok=True)
+        path = os.path.join(dest_dir, os.path.basename(part["filename"]))
+        try:
+            written = self.pool.run(
+                folder,
+                lambda mailbox: stream_attachment(
+                    mailbox,
+                    uid,
+                    part,
+                    path,
+                    self.download_budget,
+                    f"{folder}/{uid}",
+                    self.download_chunk_size,
+                ),
+            )
+        except DownloadBudgetExceeded as e:
+            self.logger.warning(f"Descarga de '{part['filename']}' cancelada: {e}")
+            return None
+        except Exception as e:
+            self.logger.error(f"Error al descargar '{part['filename']}': {e}")
+            return None
+        self.logger.info(f"Adjunto '{part['filename']}' guardado en {path} ({written} bytes).")
+        return path
+
+    def count_unread_emails(self, folder: str = "INBOX") -> int:
+        """Número de correos no leídos según la escucha IDLE o la caché local."""
+        watcher = self.watchers.get(folder)
+        if watcher and watcher.unread_count is not None:
+            return watcher.unread_count
+        return self.cache.count_unread(self.email, folder)
+
     def search_emails(
-        self, query: str, folder: str = "INBOX", limit: Optional[int] = 20
+        self,
+        query: str,
+        folder: str = "INBOX",
+        limit: Optional[int] = 20,
+        use_server: bool = False,
     ) -> List[Dict[str, Any]]:
-        """Buscar correos por criterio (asunto, remitente, etc.)."""
-        if not self.mailbox:
-            if not self.connect():
-                return []
+        """Buscar correos por criterio (asunto, remitente, etc.).
 
+        La consulta admite filtros (from:, subject:, since:, before:,
+        has:attachment, unread). Por defecto se responde desde el índice local
+        de texto completo, ordenado por relevancia y sin distinguir acentos,
+        tras una sincronización incremental (innecesaria si IDLE está activo).
+        El índice solo tiene el cuerpo de los mensajes ya descargados (todos con
+        index_bodies); si la consulta tiene texto libre y hay cuerpos sin
+        descargar, los aciertos del servidor se añaden tras los locales.
+        Con use_server=True se resuelve con IMAP SEARCH en el servidor y solo se
+        transfieren los UIDs coincidentes.
+        """
         emails_data = []
         try:
-            self.mailbox.folder.set(folder)
-            criteria = f'(OR (FROM "{query}") (SUBJECT "{query}") (TEXT "{query}"))'
-            messages = self.mailbox.fetch(query, limit=limit, reverse=True)
-            for msg in messages:
-                emails_data.append(
-                    {
-                        "uid": msg.uid,
-                        "subject": msg.subject,
-                        "from": msg.from_,
-                        "to": msg.to,
-                        "date": msg.date,
-                        "text": msg.text or msg.html,
-                        "attachments": [att.filename for att in msg.attachments],
-                    }
+            mail_query = MailQuery.parse(query)
+            uids = None
+            if use_server and (self.pool or self.connect()):
+                try:
+                    uids = self.sync.search(folder, mail_query, limit)
+                except Exception as e:
+                    self.logger.warning(
+                        f"Búsqueda en el servidor fallida ({e}); usando la caché local."
+                    )
+            elif not use_server and not self.is_watching(folder):
+                self.sync_folder(folder)
+            if uids is not None:
+                emails_data = self.cache.get_messages(self.email, folder, uids)
+            else:
+                emails_data = self._search_cache(mail_query, folder, limit)
+                emails_data += self._search_unindexed(
+                    mail_query, folder, limit, emails_data
                 )
+            emails_data = [
+                LazyMailMessage(msg, self._body_loader(folder)) for msg in emails_data
+            ]
             self.logger.info(
                 f"Encontrados {len(emails_data)} correos para la búsqueda '{query}' en {folder}."
             )
         except Exception as e:
             self.logger.error(f"Error al buscar correos en {folder}: {e}")
-        finally:
-            pass
         return emails_data
 
-    def send_email(self, to_email: str, subject: str, body: str) -> bool:
-        """Enviar un correo electrónico usando la configuración SMTP."""
+    def _search_cache(
+        self, mail_query: MailQuery, folder: str, limit: Optional[int]
+    ) -> List[Dict[str, Any]]:
+        match = mail_query.to_fts()
+        if match and self.cache.fts_enabled:
+            where, params = mail_query.to_sql(include_text=False)
+            return self.cache.search_text(
+                self.email, folder, match, where, params, limit
+            )
+        where, params = mail_query.to_sql()
+        return self.cache.search(self.email, folder, where, params, limit)
+
+    def _search_unindexed(
+        self,
+        mail_query: MailQuery,
+        folder: str,
+        limit: Optional[int],
+        found: List[Dict[str, Any]],
+    ) -> List[Dict[str, Any]]:
+        """Aciertos del servidor (IMAP SEARCH TEXT) en cuerpos que no están indexados."""
+        if not mail_query.terms or (limit and len(found) >= limit):
+            return []
+        if not self.cache.count_unindexed(self.email, folder):
+            return []
+        if not (self.pool or self.connect()):
+            return []
+        try:
+            uids = self.sync.search(folder, mail_query)
+        except Exception as e:
+            self.logger.warning(f"Búsqueda en el servidor fallida ({e}); solo resultados locales.")
+            return []
+        known = {msg["uid"] for msg in found}
+        extra = [uid for uid in uids if uid not in known]
+        if limit:
+            extra = extra[: limit - len(found)]
+        return self.cache.get_messages(self.email, folder, extra)
+
+    def _get_outbox(self) -> Optional[OutboundMailQueue]:
+        """Crear bajo demanda la cola de salida con su sesión SMTP persistente."""
         if not all([self.email, self.password, self.smtp_server, self.smtp_port]):
             self.logger.error(
                 "Configuración SMTP incompleta. No se puede enviar correo."
             )
-            return False
+            return None
+        if self.outbox is None:
+            smtp_config = self.config.get("smtp_queue", {})
+            session = SMTPSession(
+                self.smtp_server,
+                self.smtp_port,
+                self.email,
+                self.password,
+                use_starttls=self.config.get("smtp_starttls", True),
+                max_messages=smtp_config.get("max_messages_per_session", 50),
+                logger=self.logger,
+            )
+            self.outbox = OutboundMailQueue(
+                session,
+                max_retries=smtp_config.get("max_retries", 3),
+                idle_timeout=smtp_config.get("idle_timeout", 60),
+                logger=self.logger,
+            )
+        return self.outbox
 
+    def _build_message(self, to_email: str, subject: str, body: str) -> EmailMessage:
         message = EmailMessage()
         message["From"] = self.email
         message["To"] = to_email
         message["Subject"] = subject
         message.set_content(body)
+        return message
 
-        context = ssl.create_default_context()
+    def send_email(
+        self, to_email: str, subject: str, body: str, wait: bool = True
+    ) -> bool:
+        """Enviar un correo electrónico usando la configuración SMTP.
 
-        try:
-            self.logger.info(
-                f"Conectando al servidor SMTP {self.smtp_server}:{self.smtp_port}"
-            )
-            with smtplib.SMTP(self.smtp_server, self.smtp_port) as server:
-                server.ehlo()
-                server.starttls(context=context)
-                server.ehlo()
-                self.logger.info(f"Iniciando sesión SMTP como {self.email}")
-                server.login(self.email, self.password)
-                self.logger.info(f"Enviando correo a {to_email}")
-                server.send_message(message)
-                self.logger.info("Correo enviado exitosamente.")
-                return True
-        except smtplib.SMTPAuthenticationError:
-            self.logger.error(
-                f"Error de autenticación SMTP para {self.email}. Verifica la contraseña o la configuración de 'apps menos seguras'."
-            )
-            return False
-        except smtplib.SMTPServerDisconnected:
-            self.logger.error(
-                f"Servidor SMTP {self.smtp_server} desconectado inesperadamente."
-            )
-            return False
-        except smtplib.SMTPConnectError as e:
-            self.logger.error(
-                f"Error al conectar al servidor SMTP {self.smtp_server}:{self.smtp_port}. {e}"
-            )
-            return False
-        except ConnectionRefusedError:
-            self.logger.error(
-                f"Conexión rechazada por el servidor SMTP {self.smtp_server}:{self.smtp_port}."
-            )
-            return False
-        except Exception as e:
-            self.logger.error(f"Error inesperado al enviar correo: {e}")
+        El mensaje pasa por la cola de salida; con wait=False se devuelve en
+        cuanto queda encolado.
+        """
+        outbox = self._get_outbox()
+        if not outbox:
             return False
+        self.logger.info(f"Enviando correo a {to_email}")
+        job = outbox.enqueue(self._build_message(to_email, subject, body))
+        return job.wait() if wait else True
 
-    def handle_command(self, command: str) -> Optional[str]:
-        """Procesar comandos relacionados con correo."""
-        command = command.lower()
-        response = None
+    def send_many(self, messages: Iterable[Dict[str, str]]) -> List[SendJob]:
+        """Encolar varios correos ({'to', 'subject', 'body'}) sin bloquear.
 
-        if "leer" in command and ("correo" in command or "email" in command):
-            if "no leídos" in command:
-                emails = self.get_unread_emails()
-                if emails:
-                    response = f"Tienes {len(emails)} correos no leídos. El más reciente es de {emails[0]['from']} con asunto: {emails[0]['subject']}."
-                else:
-                    response = "No tienes correos no leídos."
-            else:
-                response = "Función para leer todos los correos aún no implementada."
-
-        elif ("buscar" in command or "encuentra" in command) and (
-            "correo" in command or "email" in command
-        ):
-            try:
-                parts = re.split(
-                    r"buscar correo de |buscar correo sobre |buscar correo |buscar email de |buscar email sobre |buscar email ",
-                    command,
-                    maxsplit=1,
-                )
-                if len(parts) > 1 and parts[1]:
-                    search_term = parts[1].strip()
-                    emails = self.search_emails(search_term)
-                    if emails:
-                        response = f"Encontré {len(emails)} correos relacionados con '{search_term}'. El más reciente es de {emails[0]['from']} con asunto: {emails[0]['subject']}."
-                    else:
-                        response = (
-                            f"No encontré correos relacionados con '{search_term}'."
-                        )
-                else:
-                    response = "Por favor, especifica qué quieres buscar en el correo."
-            except Exception as e:
-                self.logger.error(
-                    f"Error procesando comando de búsqueda de correo: {e}"
-                )
-                response = "Hubo un error al intentar buscar el correo."
-
-        elif ("enviar" in command or "mandar" in command) and (
-            "correo" in command or "email" in command
-        ):
-            try:
-                to_match = re.search(r" a ([\w\.-]+@[\w\.-]+)", command)
-                subject_match = re.search(r" asunto (.+?)(?: cuerpo |$)", command)
-                body_match = re.search(r" cuerpo (.+)", command)
-
-                if to_match and subject_match and body_match:
-                    to_email = to_match.group(1)
-                    subject = subject_match.group(1).strip()
-                    body = body_match.group(1).strip()
-
-                    self.logger.info(
-                        f"Intentando enviar correo a {to_email} con asunto '{subject}'"
-                    )
-                    if self.send_email(to_email, subject, body):
-                        response = f"Correo enviado a {to_email}."
-                    else:
-                        response = (
-                            "Hubo un problema al enviar el correo. Revisa los logs."
-                        )
-                else:
-                    response = "No pude entender todos los detalles para enviar el correo. Necesito destinatario, asunto y cuerpo."
-            except Exception as e:
-                self.logger.error(f"Error procesando comando de envío de correo: {e}")
-                response = "Hubo un error al intentar enviar el correo."
-
-        else:
-            pass
-
-        return response
+        Se envían en segundo plano reutilizando la misma sesión SMTP; cada
+        SendJob permite consultar o esperar el resultado.
+        """
+        outbox = self._get_outbox()
+        if not outbox:
+            return []
+        return outbox.send_many(
+            self._build_message(msg["to"], msg["subject"], msg["body"])
+            for msg in messages
+        )
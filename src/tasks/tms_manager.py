@@ -1,19 +1,37 @@
 import os
+import re
 import json
-from typing import Dict, Any, List
-from selenium import webdriver
+from typing import Dict, Any, Iterable, Iterator, List, Optional
 from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
+from ..utils.browser import browser_settings, create_driver
+from ..utils.browser_broker import BrowserBroker
+from ..utils.browser_waits import SmartWait
+from ..utils.form_fill import fill_form
 from ..utils.logger import get_logger
+from ..utils.tms_journal import CONFIRMED, SUBMITTED, TMSJournal, trip_fingerprint
+from ..utils.tms_pool import ProgressCallback, TMSWorkerPool
+from ..utils.trip_import import DEFAULT_TRIP_MAPPING, TripImporter
 
 class TMSManager:
-    def __init__(self):
+    def __init__(
+        self, broker: Optional[BrowserBroker] = None, browser: Optional[Dict[str, Any]] = None
+    ):
         self.logger = get_logger(__name__)
+        # Con un broker se usa una pestaña del Chrome compartido
+        self.broker = broker
+        # Ajustes del navegador que prevalecen sobre tms_config.json
+        self.browser_overrides = browser or {}
+        # Chrome (o la pestaña del compartido) se abre con el primer uso
         self.driver = None
-        self.wait = None
+        self.waits = None
+        self.connected = False
+        # Reinicio del Chrome compartido en el que se inició sesión
+        self._generation = None
         self._load_config()
-        self._setup_driver()
+        # Viajes ya cargados, para que repetir una carga no los duplique
+        self.journal = TMSJournal(
+            self.config.get('journal_path', os.path.join('data', 'tms_journal.db')), logger=self.logger
+        )
         
     def _load_config(self):
         """Cargar configuración del TMS."""
@@ -33,21 +51,34 @@ class TMSManager:
     def _setup_driver(self):
         """Configurar el driver de Selenium para el TMS."""
         try:
-            options = webdriver.ChromeOptions()
-            options.add_argument('--user-data-dir=./tms_data')
-            self.driver = webdriver.Chrome(options=options)
-            self.wait = WebDriverWait(self.driver, 20)
+            if self.broker:
+                self.driver = self.broker.get_driver('tms')
+                self.waits = SmartWait(self.driver, max_timeout=20, logger=self.logger)
+                self.logger.info("Driver de TMS configurado en el navegador compartido")
+                return
+            settings = browser_settings(
+                {**self.config.get('browser', {}), **self.browser_overrides}, profile_dir='tms_data'
+            )
+            self.driver = create_driver(settings, logger=self.logger)
+            self.waits = SmartWait(self.driver, max_timeout=20, logger=self.logger)
             self.logger.info("Driver de TMS configurado correctamente")
         except Exception as e:
             self.logger.error(f"Error al configurar el driver de TMS: {e}")
     
     def connect(self) -> bool:
-        """Conectar al sistema TMS."""
+        """Conectar al sistema TMS, abriendo el navegador si aún no lo está."""
+        if not self.driver:
+            self._setup_driver()
+        if not self.driver:
+            return False
         try:
+            self.connected = False
+            if self.broker:
+                self._generation = self.broker.generation
             self.driver.get(self.config['url'])
             
             # Login
-            username_field = self.wait.until(EC.presence_of_element_located((By.ID, 'username')))
+            username_field = self.waits.until_present('login', '#username')
             password_field = self.driver.find_element(By.ID, 'password')
             
             username_field.send_keys(self.config['username'])
@@ -58,16 +89,39 @@ class TMSManager:
             login_button.click()
             
             # Esperar a que se cargue el dashboard
-            self.wait.until(EC.presence_of_element_located((By.ID, 'dashboard')))
+            self.waits.until_present('dashboard', '#dashboard')
+            self.connected = True
             self.logger.info("Conexión exitosa al sistema TMS")
             return True
         except Exception as e:
             self.logger.error(f"Error al conectar al sistema TMS: {e}")
             return False
     
+    def is_connected(self) -> bool:
+        """Sesión iniciada y, con el Chrome compartido, no perdida en un reinicio."""
+        if self.broker and self._generation != self.broker.generation:
+            return False
+        return self.connected
+    
     def load_trip(self, trip_data: Dict[str, Any]) -> bool:
-        """Cargar un viaje en el sistema TMS."""
-        if not self.driver:
+        """Cargar un viaje en el sistema TMS.
+        
+        Cada carga queda en el registro (TMSJournal): un viaje ya confirmado
+        no se vuelve a enviar y uno enviado sin confirmación no se reenvía
+        hasta revisarlo, porque el TMS pudo haberlo guardado.
+        """
+        fingerprint = self.journal.register(trip_data)
+        status = self.journal.status(fingerprint)
+        if status == CONFIRMED:
+            self.logger.info("Viaje ya cargado anteriormente, se omite")
+            return True
+        if status == SUBMITTED:
+            self.logger.warning(
+                f"Viaje {fingerprint[:10]} enviado sin confirmación en un intento anterior; revisarlo en el TMS"
+            )
+            return False
+        
+        if not self.is_connected():
             if not self.connect():
                 return False
                 
@@ -76,59 +130,199 @@ class TMSManager:
             self.driver.get(f"{self.config['url']}/trips/new")
             
             # Esperar a que se cargue el formulario
-            form = self.wait.until(EC.presence_of_element_located((By.ID, 'trip-form')))
+            form = self.waits.until_present('formulario', '#trip-form')
             
-            # Llenar campos del formulario
-            for field, value in trip_data.items():
-                try:
-                    input_field = form.find_element(By.NAME, field)
-                    input_field.send_keys(value)
-                except:
-                    self.logger.warning(f"No se encontró el campo {field}")
+            # Llenar campos del formulario en una sola llamada; el teclado solo
+            # para autocompletados y campos con máscara
+            missing = fill_form(
+                self.driver,
+                form,
+                trip_data,
+                keystroke_fields=self.config.get('keystroke_fields', []),
+                fast=self.config.get('fast_fill', True),
+                logger=self.logger,
+            )
+            for field in missing:
+                self.logger.warning(f"No se encontró el campo {field}")
             
-            # Enviar formulario
+            # Enviar formulario; desde aquí el viaje puede quedar guardado en el TMS
             submit_button = form.find_element(By.ID, 'submit-trip')
+            self.journal.mark_submitted(fingerprint)
             submit_button.click()
             
             # Esperar confirmación
-            self.wait.until(EC.presence_of_element_located((By.CLASS_NAME, 'success-message')))
+            self.waits.until_present('confirmacion', '.success-message')
+            self.journal.mark_confirmed(fingerprint)
             self.logger.info("Viaje cargado exitosamente")
             return True
         except Exception as e:
+            self.journal.record_error(fingerprint, str(e))
             self.logger.error(f"Error al cargar viaje: {e}")
             return False
     
+    def load_trips(
+        self,
+        trips: Iterable[Dict[str, Any]],
+        workers: Optional[int] = None,
+        progress_callback: Optional[ProgressCallback] = None,
+        total: Optional[int] = None,
+        batch: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """Cargar una serie de viajes con una sola sesión del TMS.
+        
+        trips puede ser un generador (p. ej. TripImporter.trips()): los viajes
+        se consumen a medida que se cargan. Devuelve {"loaded", "failed",
+        "skipped", "unconfirmed"}: los viajes no cargados en "failed", la
+        cantidad de viajes ya confirmados en el registro, que se omiten sin
+        abrir el TMS, y los enviados sin confirmación en una carga anterior,
+        que quedan para revisar.
+        
+        Con workers > 1 (por defecto la clave "workers" de tms_config.json)
+        los viajes se reparten entre varios navegadores con TMSWorkerPool.
+        progress_callback(hechos, total, viaje, cargado) se llama tras cada
+        viaje, también desde los hilos de los trabajadores.
+        """
+        skipped = {'skipped': 0, 'unconfirmed': []}
+        trips = self._unloaded(trips, batch, skipped)
+        workers = workers or self.config.get('workers', 1)
+        if workers > 1:
+            pool = TMSWorkerPool(
+                self._pool_worker,
+                workers=workers,
+                max_workers=self.config.get('max_workers', 4),
+                max_retries=self.config.get('max_retries', 2),
+                progress_callback=progress_callback,
+                logger=self.logger,
+            )
+            result = pool.run(trips, total=total)
+            # Los enviados sin confirmación en cargas anteriores, más los de esta
+            result['unconfirmed'] = skipped['unconfirmed'] + result['unconfirmed']
+            return {**result, 'skipped': skipped['skipped']}
+        
+        result = {'loaded': 0, 'failed': []}
+        if not self.is_connected() and not self.connect():
+            result['failed'] = list(trips)
+            return {**result, **skipped}
+        
+        done = 0
+        for trip in trips:
+            loaded = self.load_trip(trip)
+            if loaded:
+                result['loaded'] += 1
+            elif self.is_unconfirmed(trip):
+                # Se envió pero no llegó la confirmación: revisar, no reintentar
+                skipped['unconfirmed'].append(trip)
+            else:
+                result['failed'].append(trip)
+            done += 1
+            if progress_callback:
+                progress_callback(done, total, trip, loaded)
+        self.logger.info(
+            f"Carga masiva terminada: {result['loaded']} viajes cargados, {len(result['failed'])} fallidos"
+        )
+        return {**result, **skipped}
+    
+    def _unloaded(
+        self, trips: Iterable[Dict[str, Any]], batch: Optional[str], skipped: Dict[str, Any]
+    ) -> Iterator[Dict[str, Any]]:
+        """Registrar los viajes y dejar pasar solo los que faltan cargar."""
+        for trip in trips:
+            status = self.journal.status(self.journal.register(trip, batch))
+            if status == CONFIRMED:
+                skipped['skipped'] += 1
+            elif status == SUBMITTED:
+                skipped['unconfirmed'].append(trip)
+            else:
+                yield trip
+    
+    def is_unconfirmed(self, trip: Dict[str, Any]) -> bool:
+        """Viaje enviado al TMS sin que llegara la confirmación."""
+        return self.journal.status(trip_fingerprint(trip)) == SUBMITTED
+    
+    def _pool_worker(self, index: int) -> 'TMSManager':
+        # Cada trabajador usa su propio Chrome con un perfil temporal: Chrome no
+        # admite dos instancias sobre el mismo perfil
+        return TMSManager(browser={'profile_dir': None})
+    
+    def _trip_importer(self) -> TripImporter:
+        # El mapeo de tms_config.json amplía o reemplaza campos del predeterminado
+        mapping = {**DEFAULT_TRIP_MAPPING, **self.config.get('import_mapping', {})}
+        return TripImporter(mapping, sheet=self.config.get('import_sheet'), logger=self.logger)
+    
+    def import_trips(
+        self, template_path: str, progress_callback: Optional[ProgressCallback] = None
+    ) -> Dict[str, Any]:
+        """Validar una planilla CSV/XLSX de viajes y cargar sus filas válidas.
+        
+        La planilla se revisa completa antes de tocar el TMS; las filas con
+        errores se informan en "invalid" y no se cargan. Si una carga anterior
+        de la misma planilla se interrumpió, se retoma: los viajes ya
+        confirmados en el registro se omiten.
+        """
+        importer = self._trip_importer()
+        # Total para la barra de progreso, contado en la misma pasada: solo
+        # los viajes que faltan cargar
+        report = importer.validate(
+            template_path,
+            pending=lambda trip: self.journal.status(trip_fingerprint(trip))
+            not in (CONFIRMED, SUBMITTED),
+        )
+        remaining = report.pop('pending')
+        if not report['valid']:
+            return {**report, 'loaded': 0, 'failed': [], 'skipped': 0, 'unconfirmed': []}
+        result = self.load_trips(
+            importer.trips(template_path),
+            progress_callback=progress_callback,
+            total=remaining,
+            batch=os.path.basename(template_path),
+        )
+        return {**report, **result}
+    
     def extract_trip_data(self, template_path: str) -> Dict[str, Any]:
-        """Extraer datos de viaje desde una plantilla."""
+        """Extraer el primer viaje válido de una plantilla CSV/XLSX."""
         try:
-            # Aquí se implementaría la lógica para extraer datos de la plantilla
-            # Por ejemplo, usando pandas para archivos Excel o procesamiento de PDF
-            # Por ahora retornamos datos de ejemplo
-            return {
-                'origin': 'Ciudad A',
-                'destination': 'Ciudad B',
-                'date': '2024-03-15',
-                'driver': 'Juan Pérez',
-                'vehicle': 'ABC123'
-            }
+            return next(self._trip_importer().trips(template_path), {})
         except Exception as e:
             self.logger.error(f"Error al extraer datos de la plantilla: {e}")
             return {}
     
+    def disconnect(self):
+        """Cerrar el navegador (o la pestaña) del TMS."""
+        if self.driver:
+            try:
+                self.driver.quit()
+            except Exception as e:
+                self.logger.debug(f"Error al cerrar el driver de TMS: {e}")
+        self.driver = None
+        self.connected = False
+    
     def handle_command(self, command: str):
         """Procesar comandos relacionados con el TMS."""
+        original = command
         command = command.lower()
         
-        if "cargar viaje" in command:
-            # Extraer ruta de la plantilla del comando
-            template_path = command.split("desde")[-1].strip()
+        if "cargar viaje" in command or "importar viajes" in command:
+            # Extraer ruta de la plantilla del comando (sin cambiar mayúsculas)
+            template_path = re.split(r"\s+desde\s+", original, maxsplit=1, flags=re.I)[-1].strip()
             if os.path.exists(template_path):
-                trip_data = self.extract_trip_data(template_path)
-                if trip_data:
-                    if self.load_trip(trip_data):
-                        return "Viaje cargado exitosamente en el sistema TMS"
-                    return "No se pudo cargar el viaje en el sistema TMS"
-                return "No se pudieron extraer los datos del viaje"
+                try:
+                    result = self.import_trips(template_path)
+                except Exception as e:
+                    self.logger.error(f"Error al importar la planilla {template_path}: {e}")
+                    return f"No se pudo leer la planilla: {e}"
+                if not result['valid']:
+                    return "No se pudieron extraer los datos del viaje"
+                answer = f"Se cargaron {result['loaded']} de {result['valid']} viajes en el sistema TMS"
+                if result['skipped']:
+                    answer += f"; {result['skipped']} ya estaban cargados"
+                if result['unconfirmed']:
+                    answer += f"; {len(result['unconfirmed'])} quedaron sin confirmar y hay que revisarlos en el TMS"
+                if result['failed']:
+                    answer += f"; {len(result['failed'])} fallaron en el TMS"
+                if result['invalid']:
+                    rows = ", ".join(str(item['row']) for item in result['invalid'][:10])
+                    answer += f"; {len(result['invalid'])} filas con errores (filas {rows})"
+                return answer
             return "No se encontró el archivo de plantilla especificado"
             
         else:
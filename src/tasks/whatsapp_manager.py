@@ -1,112 +1,436 @@
+import json
 import os
-from typing import List, Dict, Any
-from selenium import webdriver
+import re
+import threading
+from typing import List, Dict, Any, Optional
 from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.common.keys import Keys
+from selenium.common.exceptions import TimeoutException, WebDriverException
+from ..utils.browser import browser_settings, create_driver, has_saved_session, mark_session
+from ..utils.browser_broker import BrowserBroker
+from ..utils.browser_waits import SmartWait
 from ..utils.logger import get_logger
+from ..utils.whatsapp_contacts import ChatDirectory, best_match
+from ..utils.whatsapp_scripts import (
+    CHAT_CELL_SELECTOR,
+    CHAT_TITLE_SELECTOR,
+    CHAT_TITLES_JS,
+    FIND_CHAT_JS,
+    MESSAGE_SELECTOR,
+    QR_CODE_SELECTOR,
+    SEARCH_BOX_SELECTOR,
+    MessageCapture,
+    extract_messages,
+)
+from ..utils.whatsapp_store import WhatsAppStore
+
+CHAT_LIST_SELECTOR = 'div[data-testid="chat-list"]'
+
+# "últimos 5 mensajes de Juan", "último mensaje de juan en whatsapp"
+LAST_MESSAGES_PATTERN = re.compile(
+    r"[úu]ltimos?\s+(?:(\d+)\s+)?mensajes?\s+de\s+(.+?)(?:\s+(?:en|de)\s+whatsapp)?$"
+)
 
 class WhatsAppManager:
-    def __init__(self):
+    def __init__(
+        self, config: Optional[Dict[str, Any]] = None, broker: Optional[BrowserBroker] = None
+    ):
         self.logger = get_logger(__name__)
+        self.config = config or {}
+        # Con un broker se usa una pestaña del Chrome compartido
+        self.broker = broker
         self.driver = None
-        self.wait = None
-        self._setup_driver()
+        self.waits = None
+        self.capture = None
+        self.connected = False
+        self.profile_dir = None
+        self.headless = False
+        # Chrome se arranca con el primer uso, no al iniciar el asistente
+        self.keepalive_interval = self.config.get('keepalive_interval', 60)
+        self._lock = threading.RLock()
+        self._stop_event = threading.Event()
+        self._keepalive_thread = None
+        # Contacto -> título del chat, para no repetir la búsqueda
+        self.contacts = ChatDirectory(logger=self.logger)
+        # Mensajes ya leídos del navegador, para no volver a recorrer los chats
+        self.store = WhatsAppStore(logger=self.logger)
         
     def _setup_driver(self):
-        """Configurar el driver de Selenium para WhatsApp Web."""
+        """Configurar el driver de Selenium para WhatsApp Web.
+        
+        Sin interfaz solo cuando en el perfil ya se inició sesión (ver
+        has_saved_session); mientras tanto hace falta escanear el código QR.
+        """
         try:
-            options = webdriver.ChromeOptions()
-            options.add_argument('--user-data-dir=./whatsapp_data')
-            self.driver = webdriver.Chrome(options=options)
-            self.wait = WebDriverWait(self.driver, 20)
+            if self.broker:
+                self.driver = self.broker.get_driver('whatsapp')
+                self.profile_dir = self.broker.settings['profile_dir']
+                self.headless = self.broker.settings['headless']
+                self.waits = SmartWait(self.driver, max_timeout=20, logger=self.logger)
+                self.logger.info("Driver de WhatsApp configurado en el navegador compartido")
+                return
+            browser_config = self.config.get('browser', {})
+            profile_dir = browser_config.get('profile_dir', 'whatsapp_data')
+            settings = browser_settings(
+                browser_config,
+                profile_dir=profile_dir,
+                headless=has_saved_session(profile_dir, 'whatsapp'),
+            )
+            self.profile_dir = profile_dir
+            self.headless = settings['headless']
+            self.driver = create_driver(settings, logger=self.logger)
+            self.waits = SmartWait(self.driver, max_timeout=20, logger=self.logger)
             self.logger.info("Driver de WhatsApp configurado correctamente")
         except Exception as e:
             self.logger.error(f"Error al configurar el driver de WhatsApp: {e}")
     
     def connect(self) -> bool:
-        """Conectar a WhatsApp Web."""
-        try:
-            self.driver.get('https://web.whatsapp.com')
-            # Esperar a que el usuario escanee el código QR
-            self.wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, 'div[data-testid="chat-list"]')))
-            self.logger.info("Conexión exitosa a WhatsApp Web")
-            return True
-        except Exception as e:
-            self.logger.error(f"Error al conectar a WhatsApp Web: {e}")
+        """Conectar a WhatsApp Web.
+        
+        Con el perfil guardado la sesión se recupera sin código QR; la primera
+        vez la espera dura lo que tarde el usuario en escanearlo.
+        """
+        with self._lock:
+            if not self.driver:
+                self._setup_driver()
+            if not self.driver:
+                return False
+            try:
+                self.connected = False
+                self.driver.get('https://web.whatsapp.com')
+                # Código QR o sesión ya iniciada (plazo fijo: depende de una persona)
+                screen = self.waits.until_present(
+                    'pantalla_inicial', f'{QR_CODE_SELECTOR}, {CHAT_LIST_SELECTOR}', adaptive=False
+                )
+                if screen.tag_name == 'canvas':
+                    # La sesión caducó o nunca se completó: hace falta el QR
+                    mark_session(self.profile_dir, 'whatsapp', active=False)
+                    if self.headless:
+                        return self._connect_with_window()
+                    self.logger.info("Código QR detectado. Escanéalo con tu teléfono.")
+                    self.waits.until_present('inicio_sesion', CHAT_LIST_SELECTOR, adaptive=False)
+                mark_session(self.profile_dir, 'whatsapp')
+                # Capturar en el navegador los mensajes que lleguen a partir de ahora
+                self.capture = MessageCapture(self.driver, logger=self.logger)
+                self.capture.install()
+                self.connected = True
+                self.logger.info("Conexión exitosa a WhatsApp Web")
+                return True
+            except Exception as e:
+                self.logger.error(f"Error al conectar a WhatsApp Web: {e}")
+                return False
+    
+    def _connect_with_window(self) -> bool:
+        """Reiniciar Chrome con interfaz para que se pueda escanear el código QR.
+        
+        Con el Chrome compartido se reinicia entero, con todas sus pestañas.
+        """
+        self.logger.warning("WhatsApp Web pide el código QR; reiniciando Chrome con interfaz")
+        self._restart_driver()
+        if not self.driver or self.headless:
+            # "headless": true en la configuración manda sobre el perfil
+            self.logger.error("No se puede mostrar el código QR con Chrome sin interfaz")
             return False
+        return self.connect()
     
-    def get_unread_messages(self) -> List[Dict[str, Any]]:
-        """Obtener mensajes no leídos."""
-        if not self.driver:
+    def _ensure_connected(self) -> bool:
+        """Arrancar Chrome y conectar en el primer uso; después, no hace nada."""
+        with self._lock:
+            if self.connected:
+                return True
             if not self.connect():
-                return []
-                
-        try:
-            # Encontrar chats no leídos
-            unread_chats = self.driver.find_elements(By.CSS_SELECTOR, 'span[data-testid="icon-unread"]')
-            messages = []
+                return False
+        self.start_keepalive()
+        return True
+    
+    def is_online(self) -> bool:
+        """Verificar que WhatsApp Web sigue cargado y con la sesión iniciada."""
+        with self._lock:
+            if not self.driver or not self.connected:
+                return False
+            try:
+                return bool(self.driver.find_elements(By.CSS_SELECTOR, CHAT_LIST_SELECTOR))
+            except WebDriverException:
+                return False
+    
+    def _restart_driver(self):
+        """Descartar el Chrome actual y abrir otro con el mismo perfil.
+        
+        Con el Chrome compartido no basta con cerrar la pestaña (las de otros
+        servicios lo mantienen vivo): el broker reinicia la sesión entera y
+        vuelve a crear todas las pestañas.
+        """
+        with self._lock:
+            if self.broker and self.driver:
+                self.capture = None
+                self.connected = False
+                try:
+                    self.broker.restart()
+                    self.headless = self.broker.settings['headless']
+                except Exception as e:
+                    self.logger.error(f"Error al reiniciar el navegador compartido: {e}")
+                    self.driver = None
+                return
+            if self.driver:
+                try:
+                    self.driver.quit()
+                except Exception as e:
+                    self.logger.debug(f"Error al cerrar el driver de WhatsApp: {e}")
+            self.driver = None
+            self.capture = None
+            self.connected = False
+            self._setup_driver()
+    
+    def reconnect(self) -> bool:
+        """Recuperar la sesión: recargar la página y, si el navegador no responde, reiniciarlo."""
+        with self._lock:
+            if self.connect():
+                return True
+            self._restart_driver()
+            return self.connect()
+    
+    def _keepalive_loop(self):
+        while not self._stop_event.wait(self.keepalive_interval):
+            # Si otra operación tiene el driver, la sesión está en uso
+            if not self._lock.acquire(blocking=False):
+                continue
+            try:
+                if not self.is_online():
+                    self.logger.warning("WhatsApp Web no responde, reconectando")
+                    if not self.reconnect():
+                        self.logger.error("No se pudo recuperar la sesión de WhatsApp Web")
+            finally:
+                self._lock.release()
+    
+    def start_keepalive(self):
+        """Iniciar el hilo que comprueba la sesión periódicamente y la recupera."""
+        if not self.keepalive_interval:
+            return
+        if self._keepalive_thread and self._keepalive_thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._keepalive_thread = threading.Thread(
+            target=self._keepalive_loop, name='whatsapp-keepalive', daemon=True
+        )
+        self._keepalive_thread.start()
+    
+    def disconnect(self):
+        """Detener la comprobación periódica y cerrar el navegador."""
+        self._stop_event.set()
+        if self._keepalive_thread:
+            self._keepalive_thread.join(timeout=5)
+            self._keepalive_thread = None
+        with self._lock:
+            if self.driver:
+                try:
+                    self.driver.quit()
+                except Exception as e:
+                    self.logger.debug(f"Error al cerrar el driver de WhatsApp: {e}")
+            self.driver = None
+            self.capture = None
+            self.connected = False
+    
+    def get_unread_messages(self) -> List[Dict[str, Any]]:
+        """Obtener mensajes no leídos.
+        
+        Devuelve diccionarios {id, chat, sender, text, timestamp}, que
+        también se guardan en el almacén local.
+        """
+        if not self._ensure_connected():
+            return []
+        
+        with self._lock:
+            try:
+                # Encontrar chats no leídos
+                unread_chats = self.driver.find_elements(By.CSS_SELECTOR, 'span[data-testid="icon-unread"]')
+                messages = []
             
-            for chat in unread_chats:
-                chat.click()
-                # Esperar a que se carguen los mensajes
-                self.wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, 'div[data-testid="msg-container"]')))
+                for chat in unread_chats:
+                    # El indicador muestra cuántos mensajes sin leer tiene el chat
+                    badge = chat.text.strip()
+                    unread_count = int(badge) if badge.isdigit() else 1
+                    chat.click()
+                    # Esperar a que se carguen los mensajes
+                    self.waits.until_present('mensajes', MESSAGE_SELECTOR)
                 
-                # Obtener mensajes
-                message_elements = self.driver.find_elements(By.CSS_SELECTOR, 'div[data-testid="msg-container"]')
-                for msg in message_elements:
-                    try:
-                        sender = msg.find_element(By.CSS_SELECTOR, 'span[data-testid="author"]').text
-                        text = msg.find_element(By.CSS_SELECTOR, 'span[data-testid="conversation-info"]').text
-                        messages.append({
-                            'sender': sender,
-                            'text': text
-                        })
-                    except:
-                        continue
+                    # Leer solo los últimos mensajes (los no leídos) en una sola llamada
+                    chat_messages = extract_messages(self.driver, limit=unread_count)
+                    title = self._current_chat()
+                    for message in chat_messages:
+                        message["chat"] = title
+                    messages.extend(chat_messages)
                         
-            return messages
-        except Exception as e:
-            self.logger.error(f"Error al obtener mensajes no leídos: {e}")
+                self.store.add_messages(messages)
+                return messages
+            except Exception as e:
+                self.logger.error(f"Error al obtener mensajes no leídos: {e}")
+                return []
+    
+    def get_new_messages(self) -> List[Dict[str, Any]]:
+        """Mensajes llegados al chat abierto desde la última llamada.
+        
+        Solo se transfiere el búfer del MutationObserver, no el historial.
+        """
+        if not self._ensure_connected():
             return []
+        
+        with self._lock:
+            try:
+                messages = self.capture.drain()
+                self.store.add_messages(messages)
+                return messages
+            except Exception as e:
+                self.logger.error(f"Error al leer mensajes nuevos: {e}")
+                return []
     
-    def send_message(self, contact: str, message: str) -> bool:
-        """Enviar mensaje a un contacto."""
-        if not self.driver:
-            if not self.connect():
-                return False
-                
+    def sync_messages(self):
+        """Guardar en el almacén solo lo nuevo del navegador.
+        
+        Se vacía el búfer del observador y se leen los chats con indicador de
+        no leídos; el resto del historial ya está en el almacén.
+        """
+        self.get_new_messages()
+        self.get_unread_messages()
+    
+    def get_chat_history(self, contact: str, count: int = 5) -> List[Dict[str, Any]]:
+        """Últimos count mensajes de un chat, en orden cronológico.
+        
+        Se responde desde el almacén local; el chat solo se abre en el
+        navegador si el almacén aún no tiene esos mensajes. Los mensajes
+        devueltos quedan marcados como comunicados.
+        """
+        self.sync_messages()
+        title = self.contacts.resolve(contact) or best_match(
+            contact, self.store.chats(), self.contacts.cutoff
+        )
+        messages = self.store.last_messages(title, count) if title else []
+        if len(messages) < count and self._ensure_connected():
+            with self._lock:
+                try:
+                    # Historial todavía no guardado: leerlo una vez del chat
+                    opened = (title and self._open_listed_chat(title)) or self._search_chat(
+                        title or contact
+                    )
+                    if opened:
+                        self.contacts.remember(contact, opened)
+                        self.store.add_messages(
+                            extract_messages(self.driver, limit=count), chat=opened
+                        )
+                        title = opened
+                        messages = self.store.last_messages(title, count)
+                except Exception as e:
+                    self.logger.error(f"Error al leer el historial de {contact}: {e}")
+        if title:
+            self.store.mark_read(title)
+        return messages
+    
+    def _current_chat(self) -> Optional[str]:
+        headers = self.driver.find_elements(By.CSS_SELECTOR, CHAT_TITLE_SELECTOR)
+        return headers[0].text if headers else None
+    
+    def _chat_is_open(self, title: str) -> bool:
+        return self._current_chat() == title
+    
+    def _open_listed_chat(self, title: str) -> Optional[str]:
+        """Abrir desde la lista un chat ya visible, sin usar el buscador."""
+        if self._chat_is_open(title):
+            return title
+        cell = self.driver.execute_script(FIND_CHAT_JS, CHAT_CELL_SELECTOR, title)
+        if not cell:
+            return None
+        cell.click()
         try:
-            # Buscar contacto
-            search_box = self.wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, 'div[data-testid="search"]')))
-            search_box.click()
-            search_box.send_keys(contact)
-            
-            # Seleccionar contacto
-            contact_element = self.wait.until(EC.presence_of_element_located((By.XPATH, f"//span[@title='{contact}']")))
-            contact_element.click()
+            self.waits.until_present('abrir_chat', CHAT_TITLE_SELECTOR, text=title, timeout=5)
+        except TimeoutException:
+            return None
+        return title
+    
+    def _search_chat(self, query: str) -> Optional[str]:
+        """Buscar el chat por nombre o teléfono y abrir el resultado más parecido."""
+        search_box = self.waits.until_present('buscador', SEARCH_BOX_SELECTOR)
+        search_box.click()
+        search_box.send_keys(Keys.CONTROL, 'a')
+        search_box.send_keys(Keys.BACKSPACE)
+        search_box.send_keys(query)
+        
+        def find_result(driver):
+            titles = json.loads(driver.execute_script(CHAT_TITLES_JS, CHAT_CELL_SELECTOR))
+            return best_match(query, titles, self.contacts.cutoff)
+        
+        try:
+            title = self.waits.until('resultados_busqueda', find_result)
+        except TimeoutException:
+            return None
+        return self._open_listed_chat(title)
+    
+    def send_message(self, contact: str, message: str) -> bool:
+        """Enviar mensaje a un contacto.
+        
+        El nombre o teléfono se resuelve primero con la caché de chats: si ya
+        se envió antes, el chat se abre desde la lista sin pasar por el
+        buscador. Las entradas que ya no llevan a ningún chat se invalidan.
+        """
+        if not self._ensure_connected():
+            return False
+        
+        with self._lock:
+            try:
+                title = self.contacts.resolve(contact)
+                opened = None
+                if title:
+                    opened = self._open_listed_chat(title) or self._search_chat(title)
+                    if not opened:
+                        self.contacts.invalidate(title)
+                if not opened:
+                    opened = self._search_chat(contact)
+                if not opened:
+                    self.logger.error(f"No se encontró el chat de {contact}")
+                    return False
+                self.contacts.remember(contact, opened)
             
-            # Enviar mensaje
-            message_box = self.wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, 'div[data-testid="conversation-compose-box-input"]')))
-            message_box.send_keys(message)
-            message_box.send_keys('\n')
+                # Enviar mensaje
+                message_box = self.waits.until_present('cuadro_mensaje', 'div[data-testid="conversation-compose-box-input"]')
+                message_box.send_keys(message)
+                message_box.send_keys('\n')
             
-            self.logger.info(f"Mensaje enviado a {contact}")
-            return True
-        except Exception as e:
-            self.logger.error(f"Error al enviar mensaje: {e}")
-            return False
+                self.logger.info(f"Mensaje enviado a {contact}")
+                return True
+            except Exception as e:
+                self.logger.error(f"Error al enviar mensaje: {e}")
+                return False
     
     def handle_command(self, command: str):
         """Procesar comandos relacionados con WhatsApp."""
         command = command.lower()
         
+        last_messages = LAST_MESSAGES_PATTERN.search(command)
+        
         if "mensajes no leídos" in command or "whatsapp no leídos" in command:
-            messages = self.get_unread_messages()
-            if messages:
-                return f"Tienes {len(messages)} mensajes no leídos en WhatsApp"
+            # El navegador solo aporta lo nuevo; el recuento sale del almacén y
+            # lo anunciado queda como leído para no repetirlo en la próxima consulta
+            self.sync_messages()
+            chats = self.store.take_unread()
+            unread = sum(chat['unread'] for chat in chats)
+            if unread:
+                return (
+                    f"Tienes {unread} mensajes no leídos en WhatsApp de {len(chats)} chats. "
+                    f"El más reciente es de {chats[0]['chat']}"
+                )
             return "No tienes mensajes no leídos en WhatsApp"
             
+        elif last_messages:
+            if last_messages.group(1):
+                count = int(last_messages.group(1))
+            else:
+                count = 5 if "mensajes" in last_messages.group(0) else 1
+            contact = last_messages.group(2).strip()
+            messages = self.get_chat_history(contact, count)
+            if not messages:
+                return f"No tengo mensajes de {contact} en WhatsApp"
+            chat = messages[-1]["chat"]
+            lines = "; ".join(f"{message['sender']}: {message['text']}" for message in messages)
+            return f"Últimos {len(messages)} mensajes de {chat}: {lines}"
+            
         elif "enviar mensaje" in command:
             # Extraer contacto y mensaje del comando
             parts = command.split("a")[-1].split("diciendo")
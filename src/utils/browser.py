@@ -0,0 +1,148 @@
+import os
+from typing import Any, Dict, Optional
+from selenium import webdriver
+from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.chrome.service import Service
+from webdriver_manager.chrome import ChromeDriverManager
+from src.utils.logger import Logger
+
+# Valores por defecto del bloque "browser" de cada servicio
+DEFAULT_BROWSER_CONFIG: Dict[str, Any] = {
+    "headless": True,
+    "tuned": True,
+    "block_images": True,
+    "block_fonts": True,
+    "page_load_strategy": "eager",
+    "disk_cache_mb": 64,
+    "window_size": "1366,900",
+    "profile_dir": None,
+    "arguments": [],
+}
+
+# Servicios de Chrome que el asistente no usa: extensiones, sincronización,
+# traducción, tareas en segundo plano y audio
+TUNING_ARGUMENTS = [
+    "--disable-extensions",
+    "--disable-component-extensions-with-background-pages",
+    "--disable-default-apps",
+    "--disable-sync",
+    "--disable-background-networking",
+    "--disable-features=Translate,OptimizationHints,MediaRouter,AutofillServerCommunication",
+    "--disable-notifications",
+    "--no-first-run",
+    "--no-default-browser-check",
+    "--mute-audio",
+    "--disable-dev-shm-usage",
+]
+
+# Fuentes web: los selectores no dependen de ellas y el texto se pinta con
+# las del sistema
+BLOCKED_FONT_URLS = ["*.woff", "*.woff2", "*.ttf", "*.otf", "*.eot"]
+
+
+def _session_marker(profile_dir: str, service: str) -> str:
+    return os.path.join(profile_dir, f".{service}_session")
+
+
+def has_saved_session(profile_dir: Optional[str], service: str = "whatsapp") -> bool:
+    """Indica si service completó un inicio de sesión con este perfil.
+
+    Que el directorio tenga archivos no basta: Chrome lo llena al arrancar,
+    aunque no se llegue a escanear el código QR. La marca la deja
+    mark_session() cuando el servicio ve la sesión iniciada.
+    """
+    return bool(profile_dir) and os.path.isfile(_session_marker(profile_dir, service))
+
+
+def mark_session(profile_dir: Optional[str], service: str = "whatsapp", active: bool = True):
+    """Guardar (o borrar, si la sesión caducó) la marca de sesión iniciada."""
+    if not profile_dir:
+        return
+    marker = _session_marker(profile_dir, service)
+    if active:
+        os.makedirs(profile_dir, exist_ok=True)
+        with open(marker, "w", encoding="utf-8"):
+            pass
+    elif os.path.exists(marker):
+        os.remove(marker)
+
+
+def browser_settings(
+    config: Optional[Dict[str, Any]] = None, **defaults: Any
+) -> Dict[str, Any]:
+    """Combinar DEFAULT_BROWSER_CONFIG, los valores propios del servicio y config."""
+    return {**DEFAULT_BROWSER_CONFIG, **defaults, **(config or {})}
+
+
+def build_chrome_options(settings: Dict[str, Any]) -> Options:
+    """Opciones de Chrome para un bloque "browser" ya combinado."""
+    options = Options()
+    options.page_load_strategy = settings["page_load_strategy"]
+    if settings["profile_dir"]:
+        options.add_argument(
+            f"--user-data-dir={os.path.abspath(settings['profile_dir'])}"
+        )
+    if settings["headless"]:
+        options.add_argument("--headless=new")
+        options.add_argument(f"--window-size={settings['window_size']}")
+    else:
+        options.add_argument("--start-maximized")
+    if settings["tuned"]:
+        for argument in TUNING_ARGUMENTS:
+            options.add_argument(argument)
+        cache_bytes = int(settings["disk_cache_mb"] * 1024 * 1024)
+        options.add_argument(f"--disk-cache-size={cache_bytes}")
+        options.add_argument(f"--media-cache-size={cache_bytes}")
+        if settings["block_images"]:
+            options.add_experimental_option(
+                "prefs", {"profile.managed_default_content_settings.images": 2}
+            )
+    for argument in settings["arguments"]:
+        options.add_argument(argument)
+    return options
+
+
+def apply_tab_tuning(driver, settings: Dict[str, Any]):
+    """Ajustes por pestaña que se aplican por CDP y no con argumentos.
+
+    En modo headless el agente de usuario dice "HeadlessChrome" y WhatsApp Web
+    lo rechaza, así que se sustituye por el de Chrome normal.
+    """
+    if settings["headless"]:
+        user_agent = driver.execute_cdp_cmd("Browser.getVersion", {})["userAgent"]
+        driver.execute_cdp_cmd(
+            "Network.setUserAgentOverride",
+            {"userAgent": user_agent.replace("HeadlessChrome", "Chrome")},
+        )
+    if settings["tuned"] and settings["block_fonts"]:
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": BLOCKED_FONT_URLS})
+
+
+def create_driver(
+    settings: Dict[str, Any],
+    use_driver_manager: bool = False,
+    logger: Optional[Logger] = None,
+) -> webdriver.Chrome:
+    """Arrancar Chrome con el bloque "browser" combinado por browser_settings().
+
+    Con use_driver_manager el chromedriver se descarga con webdriver-manager;
+    si no, lo resuelve Selenium Manager.
+    """
+    logger = logger if logger else Logger()
+    options = build_chrome_options(settings)
+    if use_driver_manager:
+        service = Service(ChromeDriverManager().install())
+    else:
+        service = Service()
+    driver = webdriver.Chrome(service=service, options=options)
+    try:
+        apply_tab_tuning(driver, settings)
+    except Exception as e:
+        logger.warning(f"No se pudieron aplicar los ajustes por CDP: {e}")
+    logger.info(
+        "Chrome iniciado "
+        f"({'sin interfaz' if settings['headless'] else 'con interfaz'}, "
+        f"{'optimizado' if settings['tuned'] else 'opciones por defecto'})"
+    )
+    return driver
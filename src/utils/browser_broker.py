@@ -0,0 +1,191 @@
+import threading
+from typing import Any, Dict, Optional
+from selenium import webdriver
+from selenium.webdriver.remote.command import Command
+from selenium.webdriver.remote.mobile import Mobile
+from selenium.webdriver.remote.switch_to import SwitchTo
+from src.utils.browser import (
+    apply_tab_tuning,
+    browser_settings,
+    create_driver,
+    has_saved_session,
+)
+from src.utils.browser_waits import SHARED_SCRIPT_TIMEOUT
+from src.utils.logger import Logger
+
+# Con varias pestañas, Chrome ralentiza los temporizadores y el renderizado de
+# las que no están al frente; los servicios deben seguir respondiendo igual
+BACKGROUND_TAB_ARGUMENTS = [
+    "--disable-background-timer-throttling",
+    "--disable-renderer-backgrounding",
+    "--disable-backgrounding-occluded-windows",
+]
+
+
+class BrowserBroker:
+    """Un único Chrome compartido por todos los servicios, con una pestaña cada uno.
+
+    get_driver(servicio) devuelve un driver de Selenium ligado a la pestaña del
+    servicio. Todos comparten la sesión de WebDriver; un cerrojo serializa los
+    comandos y, antes de cada uno, se activa la pestaña que corresponde, así
+    que los managers usan el driver como si fuera propio. quit() sobre ese
+    driver cierra solo su pestaña; Chrome se cierra con la última. Si Chrome
+    se cae, restart() lo vuelve a abrir con las mismas pestañas (vacías) y
+    los drivers ya entregados siguen sirviendo; generation cuenta los
+    reinicios para que cada servicio sepa que debe volver a entrar.
+
+    Configuración (bloque "browser" del asistente): las mismas claves que
+    src/utils/browser.py. Todas las pestañas comparten un perfil,
+    browser_data por defecto.
+    """
+
+    def __init__(
+        self,
+        config: Optional[Dict[str, Any]] = None,
+        use_driver_manager: bool = False,
+        logger: Optional[Logger] = None,
+    ):
+        self.config = config or {}
+        self.use_driver_manager = use_driver_manager
+        self.logger = logger if logger else Logger()
+        profile_dir = self.config.get("profile_dir", "browser_data")
+        self.settings = browser_settings(
+            self.config,
+            profile_dir=profile_dir,
+            # Hasta que WhatsApp inicie sesión hay que ver su código QR
+            headless=has_saved_session(profile_dir, "whatsapp"),
+        )
+        self.settings["arguments"] = (
+            list(self.settings["arguments"]) + BACKGROUND_TAB_ARGUMENTS
+        )
+        self.lock = threading.RLock()
+        self.driver = None
+        self.current_handle: Optional[str] = None
+        self.tabs: Dict[str, "TabDriver"] = {}
+        self.generation = 0
+
+    def _start(self):
+        if "headless" not in self.config:
+            # La sesión de WhatsApp pudo caducar desde el último arranque
+            self.settings["headless"] = has_saved_session(
+                self.settings["profile_dir"], "whatsapp"
+            )
+        self.driver = create_driver(
+            self.settings, use_driver_manager=self.use_driver_manager, logger=self.logger
+        )
+        self.current_handle = self.driver.current_window_handle
+        # Vale para toda la sesión; las esperas de SmartWait no lo cambian
+        self.driver.set_script_timeout(SHARED_SCRIPT_TIMEOUT)
+
+    def get_driver(self, service: str) -> "TabDriver":
+        """Driver de la pestaña de service; la crea (y arranca Chrome) si hace falta."""
+        with self.lock:
+            if service in self.tabs:
+                if self.driver is None:
+                    # Un reinicio anterior falló: las pestañas siguen registradas
+                    self.restart()
+                return self.tabs[service]
+            if self.driver is None:
+                # La primera pestaña es la que abre Chrome al arrancar y
+                # create_driver ya le aplicó los ajustes
+                self._start()
+                tab = TabDriver(self, service, self.current_handle)
+            else:
+                self.driver.switch_to.new_window("tab")
+                self.current_handle = self.driver.current_window_handle
+                tab = TabDriver(self, service, self.current_handle)
+                apply_tab_tuning(tab, self.settings)
+            self.tabs[service] = tab
+            self.logger.info(f"Pestaña de Chrome asignada a {service}")
+            return tab
+
+    def restart(self):
+        """Cerrar Chrome, volver a abrirlo y ligar cada pestaña a una nueva.
+
+        Los TabDriver se conservan: quien los tenga puede seguir usándolos,
+        pero sus páginas se pierden y cada servicio debe volver a cargarlas.
+        """
+        with self.lock:
+            if self.driver is not None:
+                try:
+                    self.driver.quit()
+                except Exception as e:
+                    self.logger.debug(f"Error al cerrar Chrome antes de reiniciarlo: {e}")
+                self.driver = None
+            self.generation += 1
+            if not self.tabs:
+                return
+            self._start()
+            for index, tab in enumerate(self.tabs.values()):
+                if index:
+                    self.driver.switch_to.new_window("tab")
+                    self.current_handle = self.driver.current_window_handle
+                tab._bind(self.current_handle)
+                if index:
+                    apply_tab_tuning(tab, self.settings)
+            self.logger.warning(
+                f"Chrome reiniciado con las pestañas de {', '.join(self.tabs)}"
+            )
+
+    def release(self, service: str):
+        """Cerrar la pestaña de service; con la última se cierra Chrome."""
+        with self.lock:
+            tab = self.tabs.pop(service, None)
+            if tab is None or self.driver is None:
+                return
+            if not self.tabs:
+                self.shutdown()
+                return
+            try:
+                self.driver.switch_to.window(tab.handle)
+                self.driver.close()
+            except Exception as e:
+                self.logger.warning(f"No se pudo cerrar la pestaña de {service}: {e}")
+            self.current_handle = None
+
+    def shutdown(self):
+        """Cerrar Chrome y todas las pestañas."""
+        with self.lock:
+            self.tabs.clear()
+            if self.driver is not None:
+                try:
+                    self.driver.quit()
+                except Exception as e:
+                    self.logger.warning(f"Error al cerrar Chrome: {e}")
+                self.driver = None
+                self.current_handle = None
+
+
+class TabDriver(webdriver.Chrome):
+    """Driver ligado a una pestaña del Chrome compartido de BrowserBroker.
+
+    Reutiliza la sesión de WebDriver del broker; cada comando, incluidos los
+    de los WebElement que devuelve, se ejecuta con el cerrojo tomado y con su
+    pestaña activa.
+    """
+
+    def __init__(self, broker: BrowserBroker, service: str, handle: str):
+        # No se llama al __init__ de Selenium: no se abre una sesión nueva
+        self.broker = broker
+        self.service_name = service
+        self._bind(handle)
+
+    def _bind(self, handle: str):
+        """Usar la sesión actual del broker y la pestaña handle."""
+        self.__dict__.update(self.broker.driver.__dict__)
+        self._switch_to = SwitchTo(self)
+        self._mobile = Mobile(self)
+        self.handle = handle
+
+    def execute(self, driver_command, params=None):
+        with self.broker.lock:
+            if self.broker.current_handle != self.handle:
+                super().execute(Command.SWITCH_TO_WINDOW, {"handle": self.handle})
+                self.broker.current_handle = self.handle
+            return super().execute(driver_command, params)
+
+    def close(self):
+        self.broker.release(self.service_name)
+
+    def quit(self):
+        self.broker.release(self.service_name)
@@ -0,0 +1,285 @@
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Optional
+from selenium.common.exceptions import TimeoutException, WebDriverException
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+from src.utils.logger import Logger
+
+# Espera dentro de la página: comprueba la condición al momento y después en
+# cada mutación del DOM, sin intervalo de sondeo. Devuelve el elemento (true
+# si se esperaba su ausencia) o null al vencer el plazo.
+WAIT_FOR_JS = r"""
+const [selector, text, absent, timeoutMs] = arguments;
+const done = arguments[arguments.length - 1];
+const check = () => {
+    const nodes = document.querySelectorAll(selector);
+    if (absent) {
+        return nodes.length === 0 ? true : null;
+    }
+    for (const node of nodes) {
+        if (text === null || node.innerText.trim() === text) {
+            return node;
+        }
+    }
+    return null;
+};
+const initial = check();
+if (initial) {
+    done(initial);
+    return;
+}
+let timer = null;
+const observer = new MutationObserver(() => {
+    const result = check();
+    if (result) {
+        observer.disconnect();
+        clearTimeout(timer);
+        done(result);
+    }
+});
+observer.observe(document.documentElement, {
+    childList: true, subtree: true, attributes: true, characterData: true,
+});
+timer = setTimeout(() => {
+    observer.disconnect();
+    done(null);
+}, timeoutMs);
+"""
+
+# Con BrowserBroker todas las pestañas comparten la sesión de WebDriver, que
+# atiende un comando cada vez: las esperas en la página se hacen en tramos de
+# a lo sumo WAIT_SLICE segundos para que las demás pestañas entren entre uno y
+# otro. El broker fija una vez el plazo de scripts de la sesión a
+# SHARED_SCRIPT_TIMEOUT, suficiente para cualquier tramo.
+WAIT_SLICE = 1.0
+SHARED_SCRIPT_TIMEOUT = WAIT_SLICE + 2
+
+# Límites superiores (ms) de los intervalos del histograma; el último es "más"
+HISTOGRAM_BUCKETS_MS = (50, 100, 250, 500, 1000, 2000, 5000, 10000, 20000)
+
+
+class SmartWait:
+    """Esperas por eventos del DOM con plazos que se ajustan a cada paso.
+
+    until_present()/until_absent() esperan dentro de la página con un
+    MutationObserver vía execute_async_script, así que responden en cuanto
+    cambia el DOM y no tras el siguiente sondeo de 0,5 s (con BrowserBroker,
+    en tramos de WAIT_SLICE para no bloquear a las otras pestañas). Si la
+    página navega a mitad de la espera, se sigue sondeando cada 50 ms hasta
+    el mismo plazo.
+
+    Cada espera lleva un nombre de paso ("login", "formulario"...). Con al
+    menos min_samples mediciones, el plazo de ese paso pasa a ser factor
+    veces su percentil 95 reciente, entre min_timeout y max_timeout, de modo
+    que un fallo se detecta sin agotar los 20 s. Los plazos vencidos cuentan
+    como mediciones para que el plazo crezca si se quedó corto. El argumento
+    timeout de cada espera es un tope para ese paso; con adaptive=False se usa
+    tal cual (p. ej., mientras una persona escanea el código QR).
+    histograms() y report() muestran en qué pasos se va el tiempo.
+    """
+
+    def __init__(
+        self,
+        driver,
+        max_timeout: float = 20,
+        min_timeout: float = 2,
+        factor: float = 3.0,
+        window: int = 50,
+        min_samples: int = 5,
+        logger: Optional[Logger] = None,
+    ):
+        self.driver = driver
+        self.max_timeout = max_timeout
+        self.min_timeout = min_timeout
+        self.factor = factor
+        self.window = window
+        self.min_samples = min_samples
+        self.logger = logger if logger else Logger()
+        self._lock = threading.Lock()
+        self._samples: Dict[str, Deque[float]] = {}
+        self._stats: Dict[str, Dict[str, Any]] = {}
+
+    def timeout_for(self, step: str) -> float:
+        """Plazo actual del paso, aprendido de sus latencias recientes."""
+        with self._lock:
+            samples = sorted(self._samples.get(step, ()))
+        if len(samples) < self.min_samples:
+            return self.max_timeout
+        p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+        return min(self.max_timeout, max(self.min_timeout, p95 * self.factor))
+
+    def _timeout(self, step: str, timeout: Optional[float], adaptive: bool) -> float:
+        limit = timeout if timeout is not None else self.max_timeout
+        return min(limit, self.timeout_for(step)) if adaptive else limit
+
+    def _record(self, step: str, elapsed: float, timed_out: bool):
+        with self._lock:
+            self._samples.setdefault(step, deque(maxlen=self.window)).append(elapsed)
+            stats = self._stats.setdefault(
+                step,
+                {
+                    "count": 0,
+                    "timeouts": 0,
+                    "total": 0.0,
+                    "buckets": [0] * (len(HISTOGRAM_BUCKETS_MS) + 1),
+                },
+            )
+            stats["count"] += 1
+            stats["timeouts"] += int(timed_out)
+            stats["total"] += elapsed
+            elapsed_ms = elapsed * 1000
+            index = next(
+                (
+                    i
+                    for i, limit in enumerate(HISTOGRAM_BUCKETS_MS)
+                    if elapsed_ms <= limit
+                ),
+                len(HISTOGRAM_BUCKETS_MS),
+            )
+            stats["buckets"][index] += 1
+
+    def _wait_in_page(
+        self, selector: str, text: Optional[str], absent: bool, timeout: float
+    ):
+        if getattr(self.driver, "broker", None) is None:
+            # El plazo del script debe superar al de la propia espera
+            self.driver.set_script_timeout(timeout + 2)
+            return self.driver.execute_async_script(
+                WAIT_FOR_JS, selector, text, absent, int(timeout * 1000)
+            )
+        # Sesión compartida: tramos cortos, sin retener el cerrojo del broker
+        # más de WAIT_SLICE; un cambio entre tramos lo ve la comprobación
+        # inicial del siguiente
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = max(0.0, deadline - time.monotonic())
+            result = self.driver.execute_async_script(
+                WAIT_FOR_JS,
+                selector,
+                text,
+                absent,
+                int(min(WAIT_SLICE, remaining) * 1000),
+            )
+            if result or remaining <= WAIT_SLICE:
+                return result
+            # Ceder el turno a los hilos de las otras pestañas
+            time.sleep(0)
+
+    def _check(self, selector: str, text: Optional[str], absent: bool):
+        elements = self.driver.find_elements(By.CSS_SELECTOR, selector)
+        if absent:
+            return not elements
+        for element in elements:
+            if text is None or element.text.strip() == text:
+                return element
+        return None
+
+    def _wait_for(
+        self,
+        step: str,
+        selector: str,
+        text: Optional[str],
+        absent: bool,
+        timeout: Optional[float],
+        adaptive: bool,
+    ):
+        timeout = self._timeout(step, timeout, adaptive)
+        start = time.monotonic()
+        try:
+            result = self._wait_in_page(selector, text, absent, timeout)
+        except TimeoutException:
+            result = None
+        except WebDriverException as e:
+            # La página navegó durante la espera: sondear el tiempo restante
+            self.logger.debug(f"Paso '{step}': espera por sondeo ({e.msg})")
+            remaining = max(0.0, timeout - (time.monotonic() - start))
+            try:
+                result = WebDriverWait(self.driver, remaining, poll_frequency=0.05).until(
+                    lambda driver: self._check(selector, text, absent)
+                )
+            except TimeoutException:
+                result = None
+        elapsed = time.monotonic() - start
+        self._record(step, elapsed, timed_out=not result)
+        if not result:
+            raise TimeoutException(
+                f"Paso '{step}': {selector} no {'desapareció' if absent else 'apareció'}"
+                f" en {timeout:.1f} s"
+            )
+        return result
+
+    def until_present(
+        self,
+        step: str,
+        selector: str,
+        text: Optional[str] = None,
+        timeout: Optional[float] = None,
+        adaptive: bool = True,
+    ):
+        """Esperar un elemento (con ese texto, si se indica) y devolverlo."""
+        return self._wait_for(step, selector, text, False, timeout, adaptive)
+
+    def until_absent(
+        self,
+        step: str,
+        selector: str,
+        timeout: Optional[float] = None,
+        adaptive: bool = True,
+    ) -> bool:
+        return self._wait_for(step, selector, None, True, timeout, adaptive)
+
+    def until(
+        self,
+        step: str,
+        condition: Callable[[Any], Any],
+        timeout: Optional[float] = None,
+        adaptive: bool = True,
+        poll: float = 0.05,
+    ):
+        """Espera genérica por sondeo para condiciones que no son un selector."""
+        timeout = self._timeout(step, timeout, adaptive)
+        start = time.monotonic()
+        try:
+            result = WebDriverWait(self.driver, timeout, poll_frequency=poll).until(
+                condition
+            )
+        except TimeoutException:
+            self._record(step, time.monotonic() - start, timed_out=True)
+            raise
+        self._record(step, time.monotonic() - start, timed_out=False)
+        return result
+
+    def histograms(self) -> Dict[str, Dict[str, Any]]:
+        """Por paso: número de esperas, vencidas, media, plazo actual e histograma."""
+        labels = [f"<={limit}ms" for limit in HISTOGRAM_BUCKETS_MS] + [
+            f">{HISTOGRAM_BUCKETS_MS[-1]}ms"
+        ]
+        with self._lock:
+            stats = {step: dict(values) for step, values in self._stats.items()}
+        return {
+            step: {
+                "count": values["count"],
+                "timeouts": values["timeouts"],
+                "mean": values["total"] / values["count"],
+                "timeout": self.timeout_for(step),
+                "buckets": dict(zip(labels, values["buckets"])),
+            }
+            for step, values in stats.items()
+        }
+
+    def report(self) -> str:
+        """Resumen legible de histograms(), un paso por línea."""
+        lines = []
+        for step, values in sorted(
+            self.histograms().items(), key=lambda item: -item[1]["mean"] * item[1]["count"]
+        ):
+            buckets = " ".join(
+                f"{label}:{count}" for label, count in values["buckets"].items() if count
+            )
+            lines.append(
+                f"{step}: {values['count']} esperas, media {values['mean'] * 1000:.0f} ms,"
+                f" vencidas {values['timeouts']}, plazo {values['timeout']:.1f} s [{buckets}]"
+            )
+        return "\n".join(lines)
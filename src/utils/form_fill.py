@@ -0,0 +1,98 @@
+from typing import Any, Dict, Iterable, List, Optional
+from selenium.webdriver.common.by import By
+from src.utils.logger import Logger
+
+# Rellena todos los campos de un formulario en una sola llamada. Usa el setter
+# nativo de value (las aplicaciones React/Vue ignoran la asignación directa) y
+# lanza input y change como lo haría el teclado. Devuelve los campos que no
+# existen y los que necesitan pulsaciones reales: autocompletados, campos con
+# máscara y los que el formulario reescribió al asignarles el valor.
+FILL_FORM_JS = r"""
+const [form, values, keystrokeFields] = arguments;
+const missing = [], keystrokes = [];
+const forced = new Set(keystrokeFields);
+const needsKeys = (el) =>
+    forced.has(el.name) ||
+    el.getAttribute("role") === "combobox" ||
+    el.hasAttribute("aria-autocomplete") ||
+    el.hasAttribute("list") ||
+    el.hasAttribute("data-mask") ||
+    el.hasAttribute("data-inputmask") ||
+    /\b(mask|autocomplete|typeahead)/i.test(el.className);
+const setValue = (el, value) => {
+    const proto = el instanceof HTMLTextAreaElement ? HTMLTextAreaElement.prototype
+        : el instanceof HTMLSelectElement ? HTMLSelectElement.prototype
+        : HTMLInputElement.prototype;
+    Object.getOwnPropertyDescriptor(proto, "value").set.call(el, value);
+};
+const fire = (el) => {
+    el.dispatchEvent(new Event("input", {bubbles: true}));
+    el.dispatchEvent(new Event("change", {bubbles: true}));
+};
+for (const [name, value] of Object.entries(values)) {
+    const el = form.querySelector(`[name="${CSS.escape(name)}"]`);
+    if (!el) {
+        missing.push(name);
+        continue;
+    }
+    if (needsKeys(el)) {
+        keystrokes.push(name);
+        continue;
+    }
+    if (el.type === "checkbox") {
+        el.checked = ["1", "true", "si", "sí", "x", "yes"].includes(value.toLowerCase());
+        fire(el);
+        continue;
+    }
+    if (el.type === "radio") {
+        const option = form.querySelector(
+            `[name="${CSS.escape(name)}"][value="${CSS.escape(value)}"]`);
+        if (option) {
+            option.checked = true;
+            fire(option);
+        } else {
+            missing.push(name);
+        }
+        continue;
+    }
+    setValue(el, value);
+    fire(el);
+    if (el.value !== value) {
+        keystrokes.push(name);
+    }
+}
+return {missing: missing, keystrokes: keystrokes};
+"""
+
+
+def fill_form(
+    driver,
+    form,
+    values: Dict[str, Any],
+    keystroke_fields: Iterable[str] = (),
+    fast: bool = True,
+    logger: Optional[Logger] = None,
+) -> List[str]:
+    """Rellenar los campos de form (por atributo name); devuelve los que no existen.
+
+    Con fast se asignan todos los valores con un solo execute_script y
+    send_keys queda solo para los campos que necesitan teclado (ver
+    FILL_FORM_JS) y los de keystroke_fields. Sin fast, cada campo se busca
+    y se escribe con send_keys, como antes: varias llamadas por campo.
+    """
+    logger = logger if logger else Logger()
+    values = {name: str(value) for name, value in values.items()}
+    if fast:
+        result = driver.execute_script(FILL_FORM_JS, form, values, list(keystroke_fields))
+        missing, typed = result["missing"], result["keystrokes"]
+    else:
+        missing, typed = [], list(values)
+    for name in typed:
+        try:
+            field = form.find_element(By.NAME, name)
+            field.clear()
+            field.send_keys(values[name])
+        except Exception as e:
+            logger.debug(f"No se pudo escribir el campo {name}: {e}")
+            missing.append(name)
+    return missing
@@ -0,0 +1,173 @@
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+from src.utils.imap_pool import IMAPConnectionPool, PooledConnection
+from src.utils.mail_cache import MailCache
+from src.utils.mail_sync import MailSync
+from src.utils.logger import Logger
+
+# RFC 2177: reemitir IDLE al menos cada 29 minutos para no ser desconectado
+RE_IDLE_INTERVAL = 29 * 60
+
+
+class IdleWatcher:
+    """Escucha IMAP IDLE en un hilo propio y publica eventos de correo nuevo.
+
+    Usa una conexión dedicada (fuera del pool) que permanece en IDLE; cuando el
+    servidor anuncia cambios se ejecuta una sincronización incremental, se
+    actualiza el contador de no leídos en memoria y se notifica a los oyentes
+    con diccionarios de evento:
+
+        {"type": "new_mail", "account": ..., "folder": ..., "uid": ..., "from": ..., "subject": ...}
+        {"type": "unread_changed", "account": ..., "folder": ..., "unread": ...}
+    """
+
+    def __init__(
+        self,
+        pool: IMAPConnectionPool,
+        sync: MailSync,
+        cache: MailCache,
+        folder: str = "INBOX",
+        poll_interval: float = 5,
+        reconnect_delay: float = 5,
+        max_reconnect_delay: float = 300,
+        logger: Optional[Logger] = None,
+    ):
+        self.pool = pool
+        self.sync = sync
+        self.cache = cache
+        self.folder = folder
+        self.poll_interval = poll_interval
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        self.logger = logger if logger else Logger()
+
+        self.unread_count: Optional[int] = None
+        self.last_event_at: Optional[float] = None
+        self._listeners: List[Callable[[Dict[str, Any]], None]] = []
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._conn: Optional[PooledConnection] = None
+        self._notified_uid: Optional[int] = None
+
+    def add_listener(self, callback: Callable[[Dict[str, Any]], None]):
+        """Registrar una función que recibirá los eventos de correo."""
+        self._listeners.append(callback)
+
+    def _emit(self, event: Dict[str, Any]):
+        self.last_event_at = time.time()
+        for callback in list(self._listeners):
+            try:
+                callback(event)
+            except Exception as e:
+                self.logger.error(f"Error en oyente de eventos de correo: {e}")
+
+    @property
+    def is_running(self) -> bool:
+        return bool(self._thread and self._thread.is_alive())
+
+    def start(self):
+        """Iniciar el hilo de escucha si no está ya en marcha."""
+        if self.is_running:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(
+            target=self._run, name=f"imap-idle-{self.folder}", daemon=True
+        )
+        self._thread.start()
+        self.logger.info(f"Escucha IMAP IDLE iniciada en {self.folder}.")
+
+    def stop(self, timeout: Optional[float] = None):
+        """Detener la escucha y cerrar la conexión dedicada."""
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(
+                timeout if timeout is not None else self.poll_interval + 5
+            )
+        self._thread = None
+        self.logger.info(f"Escucha IMAP IDLE detenida en {self.folder}.")
+
+    def _run(self):
+        delay = self.reconnect_delay
+        while not self._stop_event.is_set():
+            try:
+                self._conn = self.pool.open_connection()
+                self._conn.select(self.folder)
+                # Sincronizar lo que llegó mientras no se escuchaba
+                self._handle_changes()
+                delay = self.reconnect_delay
+                while not self._stop_event.is_set():
+                    if self._idle_once():
+                        self._handle_changes()
+            except Exception as e:
+                if self._stop_event.is_set():
+                    break
+                self.logger.warning(
+                    f"Conexión IDLE perdida ({e}). Reconectando en {delay:.0f} s..."
+                )
+                self._stop_event.wait(delay)
+                delay = min(delay * 2, self.max_reconnect_delay)
+            finally:
+                if self._conn:
+                    self._conn.close()
+                    self._conn = None
+
+    def _idle_once(self) -> bool:
+        """Mantener un ciclo IDLE de hasta 29 minutos. Devuelve True si hubo cambios."""
+        idle = self._conn.mailbox.idle
+        responses: List[bytes] = []
+        started = time.monotonic()
+        idle.start()
+        try:
+            while not self._stop_event.is_set():
+                remaining = RE_IDLE_INTERVAL - (time.monotonic() - started)
+                if remaining <= 0:
+                    break
+                timeout = min(self.poll_interval, remaining)
+                poll_started = time.monotonic()
+                responses = idle.poll(timeout=timeout)
+                if responses:
+                    break
+                if time.monotonic() - poll_started < timeout / 2:
+                    # poll() vuelve al instante sin datos cuando el socket está cerrado
+                    raise ConnectionError("el servidor cerró la conexión IDLE")
+        finally:
+            idle.stop()
+        if any(b"BYE" in line for line in responses):
+            raise ConnectionError("el servidor terminó la sesión IDLE")
+        return bool(responses)
+
+    def _handle_changes(self):
+        account = self.sync.account
+        if self._notified_uid is None:
+            state = self.cache.get_folder_state(account, self.folder)
+            self._notified_uid = state[1] if state else None
+        self.sync.sync_folder(self.folder)
+        state = self.cache.get_folder_state(account, self.folder)
+        if self._notified_uid is None:
+            # En la primera sincronización todo el buzón es "nuevo": no notificarlo
+            self._notified_uid = state[1] if state else 0
+        for msg in self.cache.get_since(account, self.folder, self._notified_uid):
+            self._notified_uid = max(self._notified_uid, int(msg["uid"]))
+            self._emit(
+                {
+                    "type": "new_mail",
+                    "account": account,
+                    "folder": self.folder,
+                    "uid": msg["uid"],
+                    "from": msg["from"],
+                    "subject": msg["subject"],
+                    "date": msg["date"],
+                }
+            )
+        unread = self.cache.count_unread(account, self.folder)
+        if unread != self.unread_count:
+            self.unread_count = unread
+            self._emit(
+                {
+                    "type": "unread_changed",
+                    "account": account,
+                    "folder": self.folder,
+                    "unread": unread,
+                }
+            )
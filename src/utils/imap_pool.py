@@ -0,0 +1,240 @@
+import imaplib
+import socket
+import ssl
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional
+from imap_tools import MailBox, MailBoxUnencrypted
+from src.utils.logger import Logger
+
+# Errores que indican que la conexión IMAP se cayó y debe descartarse
+CONNECTION_ERRORS = (imaplib.IMAP4.abort, socket.error, ssl.SSLError, EOFError)
+
+
+class PooledConnection:
+    """Conexión IMAP autenticada con seguimiento de la carpeta seleccionada."""
+
+    def __init__(self, mailbox):
+        self.mailbox = mailbox
+        self.selected_folder: Optional[str] = None
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+
+    def select(self, folder: str):
+        """Seleccionar la carpeta solo si no es la que ya está activa."""
+        if self.selected_folder != folder:
+            self.mailbox.folder.set(folder)
+            self.selected_folder = folder
+
+    def noop(self):
+        """Enviar NOOP para mantener viva la sesión y recibir actualizaciones."""
+        self.mailbox.client.noop()
+
+    def idle_seconds(self) -> float:
+        return time.monotonic() - self.last_used
+
+    def close(self):
+        try:
+            self.mailbox.logout()
+        except Exception:
+            pass
+
+
+class IMAPConnectionPool:
+    """Pool de conexiones IMAP reutilizables entre comandos.
+
+    Mantiene sesiones ya autenticadas para evitar el handshake TLS y el LOGIN
+    en cada comando, verifica su estado con NOOP, reconecta cuando el servidor
+    cierra la conexión y descarta las que llevan demasiado tiempo inactivas.
+    """
+
+    def __init__(
+        self,
+        server: str,
+        port: int,
+        email: str,
+        password: str,
+        use_ssl: bool = True,
+        max_size: int = 2,
+        max_idle: float = 300,
+        keepalive_interval: float = 60,
+        timeout: Optional[float] = 30,
+        logger: Optional[Logger] = None,
+    ):
+        self.server = server
+        self.port = port
+        self.email = email
+        self.password = password
+        self.use_ssl = use_ssl
+        self.max_size = max_size
+        self.max_idle = max_idle
+        self.keepalive_interval = keepalive_interval
+        self.timeout = timeout
+        self.logger = logger if logger else Logger()
+
+        self._idle: List[PooledConnection] = []
+        self._in_use = 0
+        self._lock = threading.Condition()
+        self._closed = False
+        self._keepalive_thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+        self.stats: Dict[str, int] = {"created": 0, "reused": 0, "evicted": 0}
+
+    def _open(self) -> PooledConnection:
+        """Abrir y autenticar una nueva conexión IMAP."""
+        if self.use_ssl:
+            mailbox = MailBox(self.server, self.port, timeout=self.timeout)
+        else:
+            mailbox = MailBoxUnencrypted(self.server, self.port, timeout=self.timeout)
+        mailbox.login(self.email, self.password, initial_folder=None)
+        self._count("created")
+        self.logger.debug(f"Nueva conexión IMAP abierta a {self.server}")
+        return PooledConnection(mailbox)
+
+    def _count(self, stat: str):
+        # Los trabajadores de varias cuentas y el keepalive actualizan a la vez
+        with self._lock:
+            self.stats[stat] += 1
+
+    def _is_healthy(self, conn: PooledConnection) -> bool:
+        """Comprobar la conexión con NOOP si lleva tiempo sin usarse."""
+        if conn.idle_seconds() < self.keepalive_interval:
+            return True
+        try:
+            conn.noop()
+            return True
+        except Exception as e:
+            self.logger.debug(f"Conexión IMAP inactiva descartada: {e}")
+            return False
+
+    def _checkout(self) -> PooledConnection:
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("El pool de conexiones IMAP está cerrado")
+            while not self._idle and self._in_use >= self.max_size:
+                self._lock.wait()
+            conn = self._idle.pop() if self._idle else None
+            self._in_use += 1
+
+        try:
+            if conn is not None:
+                if conn.idle_seconds() > self.max_idle or not self._is_healthy(conn):
+                    conn.close()
+                    self._count("evicted")
+                    conn = None
+                else:
+                    self._count("reused")
+            if conn is None:
+                conn = self._open()
+            return conn
+        except Exception:
+            with self._lock:
+                self._in_use -= 1
+                self._lock.notify()
+            raise
+
+    def _checkin(
+        self, conn: PooledConnection, broken: bool = False, touch: bool = True
+    ):
+        with self._lock:
+            self._in_use -= 1
+            if broken or self._closed:
+                conn.close()
+            else:
+                if touch:
+                    conn.last_used = time.monotonic()
+                self._idle.append(conn)
+            self._lock.notify()
+
+    @contextmanager
+    def connection(self, folder: Optional[str] = None):
+        """Prestar una conexión del pool con la carpeta indicada seleccionada."""
+        conn = self._checkout()
+        broken = False
+        try:
+            if folder:
+                try:
+                    conn.select(folder)
+                except CONNECTION_ERRORS:
+                    # La sesión se cayó mientras estaba en el pool: reconectar una vez
+                    conn.close()
+                    self._count("evicted")
+                    conn = self._open()
+                    conn.select(folder)
+        except Exception:
+            # Cualquier fallo al preparar la conexión (p. ej. LOGIN rechazado al
+            # reconectar) la deja cerrada o a medias: no vuelve al pool
+            self._checkin(conn, broken=True)
+            raise
+        try:
+            yield conn.mailbox
+        except CONNECTION_ERRORS:
+            broken = True
+            raise
+        finally:
+            self._checkin(conn, broken=broken)
+
+    def run(self, folder: Optional[str], operation: Callable[[Any], Any]) -> Any:
+        """Ejecutar una operación sobre el buzón reintentando una vez si se cae la conexión."""
+        try:
+            with self.connection(folder) as mailbox:
+                return operation(mailbox)
+        except CONNECTION_ERRORS as e:
+            self.logger.warning(f"Conexión IMAP perdida ({e}). Reintentando...")
+            with self.connection(folder) as mailbox:
+                return operation(mailbox)
+
+    def open_connection(self) -> PooledConnection:
+        """Abrir una conexión dedicada fuera del pool (p. ej. para IMAP IDLE)."""
+        return self._open()
+
+    def warm_up(self) -> bool:
+        """Abrir una conexión por adelantado para validar credenciales."""
+        with self.connection():
+            pass
+        return True
+
+    def _keepalive_loop(self):
+        while not self._stop_event.wait(self.keepalive_interval):
+            with self._lock:
+                idle = list(self._idle)
+                self._idle.clear()
+                self._in_use += len(idle)
+            for conn in idle:
+                expired = conn.idle_seconds() > self.max_idle
+                if expired:
+                    self._count("evicted")
+                    self.logger.debug("Conexión IMAP inactiva expirada")
+                    self._checkin(conn, broken=True)
+                    continue
+                try:
+                    conn.noop()
+                except Exception:
+                    self._count("evicted")
+                    self._checkin(conn, broken=True)
+                    continue
+                # NOOP no cuenta como uso: conservar la marca de inactividad
+                self._checkin(conn, touch=False)
+
+    def start_keepalive(self):
+        """Iniciar el hilo que envía NOOP periódicos y expulsa conexiones inactivas."""
+        if self._keepalive_thread and self._keepalive_thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._keepalive_thread = threading.Thread(
+            target=self._keepalive_loop, name="imap-keepalive", daemon=True
+        )
+        self._keepalive_thread.start()
+
+    def close(self):
+        """Cerrar todas las conexiones inactivas y detener el keepalive."""
+        self._stop_event.set()
+        with self._lock:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+            self._lock.notify_all()
+        for conn in idle:
+            conn.close()
+        self.logger.info("Pool de conexiones IMAP cerrado.")
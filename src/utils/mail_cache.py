@@ -0,0 +1,733 @@
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from src.utils.logger import Logger
+from src.utils.mail_parts import html_to_text
+from src.utils.mail_threads import content_hash, is_reply, normalize_subject
+
+# id es la clave del índice de texto completo: el rowid implícito de una
+# tabla con clave primaria compuesta puede cambiar con un VACUUM
+MESSAGES_TABLE = """
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY,
+    account TEXT NOT NULL,
+    folder TEXT NOT NULL,
+    uid INTEGER NOT NULL,
+    message_id TEXT,
+    subject TEXT,
+    sender TEXT,
+    recipients TEXT,
+    date TEXT,
+    seen INTEGER NOT NULL DEFAULT 0,
+    size INTEGER,
+    text TEXT,
+    html TEXT,
+    attachments TEXT,
+    body_loaded INTEGER NOT NULL DEFAULT 0,
+    has_attachments INTEGER NOT NULL DEFAULT 0,
+    attachment_parts TEXT,
+    in_reply_to TEXT,
+    refs TEXT,
+    thread_id TEXT,
+    content_hash TEXT,
+    duplicate_of INTEGER,
+    body_text TEXT,
+    UNIQUE (account, folder, uid)
+);
+"""
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS folders (
+    account TEXT NOT NULL,
+    folder TEXT NOT NULL,
+    uidvalidity INTEGER NOT NULL,
+    last_uid INTEGER NOT NULL DEFAULT 0,
+    synced_at TEXT,
+    PRIMARY KEY (account, folder)
+);
+""" + MESSAGES_TABLE + """
+CREATE INDEX IF NOT EXISTS idx_messages_unread
+    ON messages (account, folder, seen, date);
+CREATE TABLE IF NOT EXISTS thread_refs (
+    account TEXT NOT NULL,
+    ref TEXT NOT NULL,
+    thread_id TEXT NOT NULL,
+    PRIMARY KEY (account, ref)
+);
+"""
+
+# Índices sobre columnas que las bases de datos antiguas reciben por migración
+INDEXES = """
+CREATE INDEX IF NOT EXISTS idx_messages_thread
+    ON messages (account, thread_id);
+CREATE INDEX IF NOT EXISTS idx_messages_content_hash
+    ON messages (account, folder, content_hash);
+CREATE INDEX IF NOT EXISTS idx_thread_refs_thread
+    ON thread_refs (account, thread_id);
+"""
+
+# Índice de texto completo sobre la tabla messages, mantenido con triggers.
+# body_text es el texto plano del cuerpo o, si solo tiene HTML, el texto
+# extraído de este. remove_diacritics hace que "envio" encuentre "envío".
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE messages_fts USING fts5(
+    subject, sender, body_text,
+    content='messages', content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER messages_fts_insert AFTER INSERT ON messages BEGIN
+    INSERT INTO messages_fts (rowid, subject, sender, body_text)
+    VALUES (new.id, new.subject, new.sender, new.body_text);
+END;
+CREATE TRIGGER messages_fts_delete AFTER DELETE ON messages BEGIN
+    INSERT INTO messages_fts (messages_fts, rowid, subject, sender, body_text)
+    VALUES ('delete', old.id, old.subject, old.sender, old.body_text);
+END;
+CREATE TRIGGER messages_fts_update AFTER UPDATE OF subject, sender, body_text ON messages
+BEGIN
+    INSERT INTO messages_fts (messages_fts, rowid, subject, sender, body_text)
+    VALUES ('delete', old.id, old.subject, old.sender, old.body_text);
+    INSERT INTO messages_fts (rowid, subject, sender, body_text)
+    VALUES (new.id, new.subject, new.sender, new.body_text);
+END;
+"""
+FTS_OBJECTS = (
+    ("TRIGGER", "messages_fts_insert"),
+    ("TRIGGER", "messages_fts_delete"),
+    ("TRIGGER", "messages_fts_update"),
+    ("TABLE", "messages_fts"),
+)
+# Peso de cada columna del índice en el ranking bm25 (asunto > remitente > cuerpo)
+FTS_WEIGHTS = (5.0, 3.0, 1.0)
+
+# Columnas añadidas después de la primera versión del esquema
+MIGRATIONS = {
+    "messages": {
+        "has_attachments": "INTEGER NOT NULL DEFAULT 0",
+        "attachment_parts": "TEXT",
+        "in_reply_to": "TEXT",
+        "refs": "TEXT",
+        "thread_id": "TEXT",
+        "content_hash": "TEXT",
+        "duplicate_of": "INTEGER",
+        "body_text": "TEXT",
+    },
+}
+
+# PRAGMA user_version de la caché. 1: clave id explícita e índice sobre body_text;
+# 2: huellas de contenido por Message-ID o, sin él, con asunto, fecha y tamaño
+SCHEMA_VERSION = 2
+
+
+class MailCache:
+    """Caché local de correo en SQLite.
+
+    Guarda por cuenta y carpeta el UIDVALIDITY y el UID más alto sincronizado,
+    junto con las cabeceras de cada mensaje. Los cuerpos se guardan solo cuando
+    se solicitan.
+
+    Al guardar cabeceras se asigna a cada mensaje su conversación (thread_id) a
+    partir de Message-ID, In-Reply-To y References, y las copias repetidas de
+    un mismo correo se marcan con duplicate_of para ocultarlas en las consultas.
+    """
+
+    def __init__(
+        self,
+        db_path: str = os.path.join("data", "mail_cache.db"),
+        logger: Optional[Logger] = None,
+    ):
+        self.db_path = db_path
+        self.logger = logger if logger else Logger()
+        if os.path.dirname(db_path):
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self._lock = threading.RLock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+        self._migrate()
+        self._upgrade()
+        self.conn.executescript(INDEXES)
+        self.fts_enabled = self._setup_fts()
+
+    def _migrate(self):
+        """Añadir a bases de datos existentes las columnas que les falten."""
+        with self._lock, self.conn:
+            for table, columns in MIGRATIONS.items():
+                existing = {
+                    row["name"]
+                    for row in self.conn.execute(f"PRAGMA table_info({table})")
+                }
+                for column, definition in columns.items():
+                    if column not in existing:
+                        self.conn.execute(
+                            f"ALTER TABLE {table} ADD COLUMN {column} {definition}"
+                        )
+
+    def _upgrade(self):
+        """Pasar las cachés antiguas al esquema actual (ver SCHEMA_VERSION).
+
+        Antes de la versión 1 se indexaba el rowid implícito y solo el cuerpo
+        en texto plano: se reconstruye messages con la columna id, se calcula
+        body_text de los cuerpos ya guardados y el índice se vuelve a crear.
+        Antes de la 2 las huellas de contenido confundían correos distintos:
+        se recalculan y se vuelven a marcar las copias.
+        """
+        with self._lock:
+            version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+            if version >= SCHEMA_VERSION:
+                return
+            columns = [
+                row["name"] for row in self.conn.execute("PRAGMA table_info(messages)")
+            ]
+            self.conn.execute("BEGIN")
+            try:
+                if version < 1:
+                    self._upgrade_ids(columns)
+                if version < 2:
+                    self._rehash()
+                self.conn.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+                self.conn.commit()
+            except Exception:
+                self.conn.rollback()
+                raise
+            # Los índices de la tabla anterior se borraron con ella
+            self.conn.executescript(SCHEMA)
+
+    def _upgrade_ids(self, columns: List[str]):
+        for kind, name in FTS_OBJECTS:
+            self.conn.execute(f"DROP {kind} IF EXISTS {name}")
+        if "id" not in columns:
+            copied = ", ".join(columns)
+            self.conn.execute("ALTER TABLE messages RENAME TO messages_old")
+            self.conn.execute(MESSAGES_TABLE)
+            self.conn.execute(
+                f"INSERT INTO messages ({copied}) SELECT {copied} FROM messages_old"
+            )
+            self.conn.execute("DROP TABLE messages_old")
+        rows = self.conn.execute(
+            "SELECT id, text, html FROM messages WHERE body_loaded=1"
+        ).fetchall()
+        self.conn.executemany(
+            "UPDATE messages SET body_text=? WHERE id=?",
+            [(self._body_text(row["text"], row["html"]), row["id"]) for row in rows],
+        )
+
+    def _rehash(self):
+        rows = self.conn.execute(
+            "SELECT id, message_id, sender, subject, date, size FROM messages"
+        ).fetchall()
+        self.conn.executemany(
+            "UPDATE messages SET content_hash=? WHERE id=?",
+            [
+                (
+                    content_hash(
+                        {
+                            "message_id": row["message_id"],
+                            "from": row["sender"],
+                            "subject": row["subject"],
+                            "date": datetime.fromisoformat(row["date"])
+                            if row["date"]
+                            else None,
+                            "size": row["size"],
+                        }
+                    ),
+                    row["id"],
+                )
+                for row in rows
+            ],
+        )
+        self.conn.execute(
+            """
+            UPDATE messages SET duplicate_of = (
+                SELECT NULLIF(MIN(o.uid), messages.uid) FROM messages o
+                WHERE o.account=messages.account AND o.folder=messages.folder
+                  AND o.content_hash=messages.content_hash
+            )
+            """
+        )
+
+    @staticmethod
+    def _body_text(text: Optional[str], html: Optional[str]) -> str:
+        """Texto del cuerpo para el índice: el plano o, si no hay, el del HTML."""
+        return text if text and text.strip() else html_to_text(html)
+
+    def _setup_fts(self) -> bool:
+        """Crear el índice de texto completo si SQLite tiene FTS5."""
+        with self._lock:
+            exists = self.conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE name='messages_fts'"
+            ).fetchone()
+            if exists:
+                return True
+            try:
+                self.conn.executescript(FTS_SCHEMA)
+                # Indexar los mensajes guardados antes de existir el índice
+                with self.conn:
+                    self.conn.execute(
+                        "INSERT INTO messages_fts (messages_fts) VALUES ('rebuild')"
+                    )
+                return True
+            except sqlite3.OperationalError as e:
+                self.logger.warning(
+                    f"FTS5 no disponible en SQLite ({e}); la búsqueda local usará LIKE."
+                )
+                return False
+
+    def rebuild_index(self):
+        """Reconstruir el índice de texto completo desde la tabla messages."""
+        if self.fts_enabled:
+            with self._lock, self.conn:
+                self.conn.execute(
+                    "INSERT INTO messages_fts (messages_fts) VALUES ('rebuild')"
+                )
+
+    def get_folder_state(
+        self, account: str, folder: str
+    ) -> Optional[Tuple[int, int]]:
+        """Devolver (uidvalidity, last_uid) de la carpeta o None si nunca se sincronizó."""
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT uidvalidity, last_uid FROM folders WHERE account=? AND folder=?",
+                (account, folder),
+            ).fetchone()
+        return (row["uidvalidity"], row["last_uid"]) if row else None
+
+    def reset_folder(self, account: str, folder: str, uidvalidity: int):
+        """Vaciar la carpeta en caché cuando cambia el UIDVALIDITY del servidor."""
+        with self._lock, self.conn:
+            self.conn.execute(
+                "DELETE FROM messages WHERE account=? AND folder=?", (account, folder)
+            )
+            self._drop_orphan_refs(account)
+            self.conn.execute(
+                "INSERT OR REPLACE INTO folders (account, folder, uidvalidity, last_uid)"
+                " VALUES (?, ?, ?, 0)",
+                (account, folder, uidvalidity),
+            )
+
+    def _drop_orphan_refs(self, account: str):
+        """Borrar de thread_refs las conversaciones que ya no tienen mensajes."""
+        self.conn.execute(
+            "DELETE FROM thread_refs WHERE account=? AND thread_id NOT IN"
+            " (SELECT thread_id FROM messages WHERE account=? AND thread_id IS NOT NULL)",
+            (account, account),
+        )
+
+    def set_last_uid(self, account: str, folder: str, last_uid: int):
+        with self._lock, self.conn:
+            self.conn.execute(
+                "UPDATE folders SET last_uid=?, synced_at=? WHERE account=? AND folder=?",
+                (last_uid, datetime.now().isoformat(), account, folder),
+            )
+
+    def upsert_headers(
+        self, account: str, folder: str, records: Iterable[Dict[str, Any]]
+    ) -> int:
+        """Guardar las cabeceras de mensajes nuevos sin tocar cuerpos ya descargados.
+
+        Los mensajes nuevos se asignan a su conversación y se marcan como copia
+        si ya hay en la carpeta otro mensaje con la misma huella de contenido.
+        """
+        records = list(records)
+        with self._lock, self.conn:
+            existing = self._existing_uids(
+                account, folder, [record["uid"] for record in records]
+            )
+            for record in records:
+                uid = int(record["uid"])
+                if uid in existing:
+                    self.conn.execute(
+                        "UPDATE messages SET seen=? WHERE account=? AND folder=? AND uid=?",
+                        (1 if record.get("seen") else 0, account, folder, uid),
+                    )
+                    continue
+                references = record.get("references") or []
+                fingerprint = content_hash(record)
+                original = None
+                if fingerprint:
+                    original = self.conn.execute(
+                        "SELECT uid, thread_id FROM messages"
+                        " WHERE account=? AND folder=? AND content_hash=?"
+                        " ORDER BY uid LIMIT 1",
+                        (account, folder, fingerprint),
+                    ).fetchone()
+                self.conn.execute(
+                    """
+                    INSERT INTO messages (account, folder, uid, message_id, subject,
+                                          sender, recipients, date, seen, size,
+                                          has_attachments, in_reply_to, refs,
+                                          thread_id, content_hash, duplicate_of)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    """,
+                    (
+                        account,
+                        folder,
+                        uid,
+                        record.get("message_id"),
+                        record.get("subject"),
+                        record.get("from"),
+                        ", ".join(record.get("to") or ()),
+                        record["date"].isoformat() if record.get("date") else None,
+                        1 if record.get("seen") else 0,
+                        record.get("size"),
+                        1 if record.get("has_attachments") else 0,
+                        record.get("in_reply_to"),
+                        " ".join(references),
+                        self._assign_thread(
+                            account,
+                            folder,
+                            record,
+                            original["thread_id"] if original else None,
+                        ),
+                        fingerprint,
+                        original["uid"] if original else None,
+                    ),
+                )
+        return len(records)
+
+    def _existing_uids(self, account: str, folder: str, uids: List[Any]) -> set:
+        uids = [int(uid) for uid in uids]
+        if not uids:
+            return set()
+        placeholders = ",".join("?" for _ in uids)
+        return {
+            row["uid"]
+            for row in self.conn.execute(
+                f"SELECT uid FROM messages WHERE account=? AND folder=? AND uid IN ({placeholders})",
+                [account, folder, *uids],
+            )
+        }
+
+    def _assign_thread(
+        self,
+        account: str,
+        folder: str,
+        record: Dict[str, Any],
+        original_thread: Optional[str] = None,
+    ) -> str:
+        """Calcular la conversación de un mensaje nuevo de forma incremental.
+
+        thread_refs asocia cada Message-ID visto (propio o citado en
+        References/In-Reply-To) con su conversación. Si el mensaje enlaza
+        conversaciones distintas (p. ej. llegó antes el hijo que el padre), se
+        fusionan. Las respuestas sin referencias se agrupan por asunto y las
+        copias repetidas se unen a la conversación de su original.
+        """
+        own = record.get("message_id") or None
+        refs = [own, *(record.get("references") or ()), record.get("in_reply_to")]
+        refs = list(dict.fromkeys(ref for ref in refs if ref))
+        subject_ref = f"subject:{normalize_subject(record.get('subject'))}"
+
+        found = {original_thread} if original_thread else set()
+        if refs:
+            placeholders = ",".join("?" for _ in refs)
+            found |= {
+                row["thread_id"]
+                for row in self.conn.execute(
+                    "SELECT thread_id FROM thread_refs"
+                    f" WHERE account=? AND ref IN ({placeholders})",
+                    [account, *refs],
+                )
+            }
+        if not found and is_reply(record.get("subject")):
+            row = self.conn.execute(
+                "SELECT thread_id FROM thread_refs WHERE account=? AND ref=?",
+                (account, subject_ref),
+            ).fetchone()
+            if row:
+                found.add(row["thread_id"])
+
+        if found:
+            thread_id = min(found)
+            merged = [other for other in found if other != thread_id]
+            if merged:
+                placeholders = ",".join("?" for _ in merged)
+                for table in ("messages", "thread_refs"):
+                    self.conn.execute(
+                        f"UPDATE {table} SET thread_id=?"
+                        f" WHERE account=? AND thread_id IN ({placeholders})",
+                        [thread_id, account, *merged],
+                    )
+        else:
+            thread_id = own or f"{folder}:{record['uid']}"
+
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO thread_refs (account, ref, thread_id) VALUES (?, ?, ?)",
+            [(account, ref, thread_id) for ref in [*refs, subject_ref]],
+        )
+        return thread_id
+
+    def update_unseen(self, account: str, folder: str, unseen_uids: Iterable[int]):
+        """Sincronizar la marca de leído con la lista de UIDs no leídos del servidor."""
+        unseen = [int(uid) for uid in unseen_uids]
+        with self._lock, self.conn:
+            self.conn.execute(
+                "UPDATE messages SET seen=1 WHERE account=? AND folder=?",
+                (account, folder),
+            )
+            self.conn.executemany(
+                "UPDATE messages SET seen=0 WHERE account=? AND folder=? AND uid=?",
+                [(account, folder, uid) for uid in unseen],
+            )
+
+    def prune(self, account: str, folder: str, existing_uids: Iterable[int]):
+        """Eliminar de la caché los mensajes que ya no existen en el servidor."""
+        existing = {int(uid) for uid in existing_uids}
+        with self._lock, self.conn:
+            cached = [
+                row["uid"]
+                for row in self.conn.execute(
+                    "SELECT uid FROM messages WHERE account=? AND folder=?",
+                    (account, folder),
+                )
+            ]
+            self.conn.executemany(
+                "DELETE FROM messages WHERE account=? AND folder=? AND uid=?",
+                [(account, folder, uid) for uid in cached if uid not in existing],
+            )
+            self._drop_orphan_refs(account)
+            # Si se borró el original de un grupo de copias, otra pasa a serlo
+            self.conn.execute(
+                """
+                UPDATE messages SET duplicate_of = (
+                    SELECT NULLIF(MIN(o.uid), messages.uid) FROM messages o
+                    WHERE o.account=messages.account AND o.folder=messages.folder
+                      AND o.content_hash=messages.content_hash
+                )
+                WHERE account=? AND folder=? AND duplicate_of IS NOT NULL
+                """,
+                (account, folder),
+            )
+
+    def count_messages(self, account: str, folder: str) -> int:
+        with self._lock:
+            return self.conn.execute(
+                "SELECT COUNT(*) FROM messages WHERE account=? AND folder=?",
+                (account, folder),
+            ).fetchone()[0]
+
+    def count_unindexed(self, account: str, folder: str) -> int:
+        """Mensajes cuyo cuerpo aún no se descargó y, por tanto, no está indexado."""
+        with self._lock:
+            return self.conn.execute(
+                "SELECT COUNT(*) FROM messages WHERE account=? AND folder=? AND body_loaded=0",
+                (account, folder),
+            ).fetchone()[0]
+
+    def count_unread(self, account: str, folder: str) -> int:
+        with self._lock:
+            return self.conn.execute(
+                "SELECT COUNT(*) FROM messages WHERE account=? AND folder=? AND seen=0"
+                " AND duplicate_of IS NULL",
+                (account, folder),
+            ).fetchone()[0]
+
+    def store_body(
+        self,
+        account: str,
+        folder: str,
+        uid: int,
+        text: str,
+        html: str,
+        attachments: List[str],
+        parts: Optional[List[Dict[str, Any]]] = None,
+    ):
+        """Guardar el cuerpo de un mensaje.
+
+        parts son los metadatos de adjuntos obtenidos de BODYSTRUCTURE (sección,
+        tipo y tamaño), necesarios para descargarlos después bajo demanda.
+        """
+        with self._lock, self.conn:
+            self.conn.execute(
+                """
+                UPDATE messages SET text=?, html=?, body_text=?, attachments=?,
+                                    body_loaded=1, has_attachments=?, attachment_parts=?
+                WHERE account=? AND folder=? AND uid=?
+                """,
+                (
+                    text,
+                    html,
+                    self._body_text(text, html),
+                    json.dumps(attachments),
+                    1 if attachments else 0,
+                    json.dumps(parts) if parts is not None else None,
+                    account,
+                    folder,
+                    int(uid),
+                ),
+            )
+
+    def get_unread(
+        self, account: str, folder: str, limit: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """Devolver los mensajes no leídos más recientes primero."""
+        query = (
+            "SELECT * FROM messages WHERE account=? AND folder=? AND seen=0"
+            " AND duplicate_of IS NULL ORDER BY uid DESC"
+        )
+        params: List[Any] = [account, folder]
+        if limit:
+            query += " LIMIT ?"
+            params.append(limit)
+        with self._lock:
+            rows = self.conn.execute(query, params).fetchall()
+        return [self._row_to_dict(row) for row in rows]
+
+    def get_unread_threads(
+        self, account: str, folder: str, limit: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """Agrupar los no leídos por conversación, la más reciente primero.
+
+        Cada conversación incluye su último mensaje, cuántos mensajes distintos
+        tiene sin leer y cuántas copias repetidas se ocultaron.
+        """
+        query = """
+            SELECT COALESCE(thread_id, folder || ':' || uid) AS thread,
+                   SUM(duplicate_of IS NULL) AS messages,
+                   SUM(duplicate_of IS NOT NULL) AS duplicates,
+                   MAX(CASE WHEN duplicate_of IS NULL THEN uid END) AS last_uid
+            FROM messages
+            WHERE account=? AND folder=? AND seen=0
+            GROUP BY thread
+            HAVING messages > 0
+            ORDER BY last_uid DESC
+        """
+        params: List[Any] = [account, folder]
+        if limit:
+            query += " LIMIT ?"
+            params.append(limit)
+        with self._lock:
+            groups = self.conn.execute(query, params).fetchall()
+        latest = {
+            msg["uid"]: msg
+            for msg in self.get_messages(
+                account, folder, [group["last_uid"] for group in groups]
+            )
+        }
+        threads = []
+        for group in groups:
+            msg = latest[str(group["last_uid"])]
+            threads.append(
+                {
+                    "thread_id": group["thread"],
+                    "messages": group["messages"],
+                    "duplicates": group["duplicates"],
+                    "subject": msg["subject"],
+                    "from": msg["from"],
+                    "date": msg["date"],
+                    "latest": msg,
+                }
+            )
+        return threads
+
+    def get_since(
+        self, account: str, folder: str, uid: int
+    ) -> List[Dict[str, Any]]:
+        """Devolver los mensajes con UID mayor al indicado, en orden de llegada."""
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT * FROM messages WHERE account=? AND folder=? AND uid>?"
+                " AND duplicate_of IS NULL ORDER BY uid",
+                (account, folder, int(uid)),
+            ).fetchall()
+        return [self._row_to_dict(row) for row in rows]
+
+    def get_messages(
+        self, account: str, folder: str, uids: Iterable[int]
+    ) -> List[Dict[str, Any]]:
+        uids = [int(uid) for uid in uids]
+        if not uids:
+            return []
+        placeholders = ",".join("?" for _ in uids)
+        with self._lock:
+            rows = self.conn.execute(
+                f"SELECT * FROM messages WHERE account=? AND folder=? AND uid IN ({placeholders})"
+                " ORDER BY uid DESC",
+                [account, folder, *uids],
+            ).fetchall()
+        return [self._row_to_dict(row) for row in rows]
+
+    def search(
+        self,
+        account: str,
+        folder: str,
+        where: str,
+        params: List[Any],
+        limit: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        """Buscar en la caché con una cláusula WHERE (ver MailQuery.to_sql)."""
+        query = (
+            f"SELECT * FROM messages WHERE account=? AND folder=? AND ({where})"
+            " AND duplicate_of IS NULL ORDER BY uid DESC"
+        )
+        params = [account, folder, *params]
+        if limit:
+            query += " LIMIT ?"
+            params.append(limit)
+        with self._lock:
+            rows = self.conn.execute(query, params).fetchall()
+        return [self._row_to_dict(row) for row in rows]
+
+    def search_text(
+        self,
+        account: str,
+        folder: str,
+        match: str,
+        where: str = "1=1",
+        params: Optional[List[Any]] = None,
+        limit: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        """Buscar en el índice de texto completo, ordenando por relevancia (bm25).
+
+        match es una expresión FTS5 (ver MailQuery.to_fts); where y params
+        añaden filtros SQL sobre la tabla messages. Cada resultado lleva su
+        puntuación bm25 en "score" (menor es más relevante); todas las cuentas
+        comparten el índice, así que las puntuaciones son comparables.
+        """
+        weights = ", ".join(str(weight) for weight in FTS_WEIGHTS)
+        query = (
+            f"SELECT m.*, bm25(messages_fts, {weights}) AS score"
+            " FROM messages_fts JOIN messages m ON m.id = messages_fts.rowid"
+            f" WHERE messages_fts MATCH ? AND m.account=? AND m.folder=? AND ({where})"
+            " AND m.duplicate_of IS NULL"
+            " ORDER BY score, m.uid DESC"
+        )
+        query_params: List[Any] = [match, account, folder, *(params or [])]
+        if limit:
+            query += " LIMIT ?"
+            query_params.append(limit)
+        with self._lock:
+            rows = self.conn.execute(query, query_params).fetchall()
+        return [self._row_to_dict(row) for row in rows]
+
+    @staticmethod
+    def _row_to_dict(row: sqlite3.Row) -> Dict[str, Any]:
+        return {
+            "uid": str(row["uid"]),
+            "account": row["account"],
+            "folder": row["folder"],
+            "thread_id": row["thread_id"],
+            "message_id": row["message_id"],
+            "subject": row["subject"],
+            "from": row["sender"],
+            "to": tuple(filter(None, (row["recipients"] or "").split(", "))),
+            "date": datetime.fromisoformat(row["date"]) if row["date"] else None,
+            "seen": bool(row["seen"]),
+            "size": row["size"],
+            "text": row["text"] or row["html"],
+            "attachments": json.loads(row["attachments"]) if row["attachments"] else [],
+            "attachment_parts": (
+                json.loads(row["attachment_parts"]) if row["attachment_parts"] else []
+            ),
+            "has_attachments": bool(row["has_attachments"]),
+            "body_loaded": bool(row["body_loaded"]),
+            "score": row["score"] if "score" in row.keys() else None,
+        }
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
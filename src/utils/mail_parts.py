@@ -0,0 +1,414 @@
+import base64
+import binascii
+import os
+import re
+import threading
+from email.header import decode_header, make_header
+from html.parser import HTMLParser
+from email.utils import collapse_rfc2231_value, decode_rfc2231
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from imap_tools.errors import MailboxFetchError
+from imap_tools.utils import check_command_status
+
+# Tamaño de cada trozo al descargar un adjunto con fetch parcial
+ATTACHMENT_CHUNK_SIZE = 256 * 1024
+
+FETCH_TOKEN_PATTERN = re.compile(
+    rb'\(|\)|"(?:[^"\\]|\\.)*"|[^\s()\[\]"]+(?:\[[^\]]*\])?(?:<\d+>)?'
+)
+LITERAL_SUFFIX_PATTERN = re.compile(rb"\{\d+\}$")
+BODY_TEXT_TYPES = ("text/plain", "text/html")
+
+
+class DownloadBudgetExceeded(Exception):
+    """La descarga superaría el presupuesto de bytes por mensaje o por sesión."""
+
+
+def _tokenize_fetch(items: Iterable[Any]) -> List[Tuple[str, Any]]:
+    """Convertir la respuesta cruda de imaplib en tokens (tipo, valor).
+
+    imaplib entrega los literales {n} como tuplas (cabecera, datos); los datos
+    se conservan como un token "lit" en la posición que ocupaba el literal.
+    """
+    tokens: List[Tuple[str, Any]] = []
+
+    def scan(data: bytes):
+        for token in FETCH_TOKEN_PATTERN.findall(data):
+            if token in (b"(", b")"):
+                tokens.append((token.decode(), None))
+            elif token.startswith(b'"'):
+                value = re.sub(rb"\\(.)", rb"\1", token[1:-1])
+                tokens.append(("str", value.decode("utf-8", "replace")))
+            else:
+                tokens.append(("atom", token.decode("utf-8", "replace")))
+
+    for item in items:
+        if item is None:
+            continue
+        if isinstance(item, tuple):
+            scan(LITERAL_SUFFIX_PATTERN.sub(b"", item[0].rstrip()))
+            tokens.append(("lit", item[1]))
+        else:
+            scan(item)
+    return tokens
+
+
+def _parse_list(tokens: List[Tuple[str, Any]], position: int) -> Tuple[list, int]:
+    values: list = []
+    while position < len(tokens):
+        kind, value = tokens[position]
+        position += 1
+        if kind == "(":
+            nested, position = _parse_list(tokens, position)
+            values.append(nested)
+        elif kind == ")":
+            return values, position
+        elif kind == "atom":
+            if value.upper() == "NIL":
+                values.append(None)
+            elif value.isdigit():
+                values.append(int(value))
+            else:
+                values.append(value)
+        else:
+            values.append(value)
+    return values, position
+
+
+def parse_fetch_response(items: Iterable[Any]) -> List[Dict[str, Any]]:
+    """Interpretar una respuesta FETCH con varios elementos por mensaje.
+
+    Devuelve un diccionario por mensaje con los nombres de elemento en
+    mayúsculas como claves, por ejemplo {"UID": 12, "BODYSTRUCTURE": [...],
+    "BODY[1]": b"..."}. Los literales se devuelven como bytes.
+    """
+    tokens = _tokenize_fetch(items)
+    messages: List[Dict[str, Any]] = []
+    position = 0
+    while position < len(tokens):
+        kind, _ = tokens[position]
+        position += 1
+        if kind != "(":
+            # Número de secuencia y palabra FETCH previos a la lista
+            continue
+        values, position = _parse_list(tokens, position)
+        messages.append(
+            {
+                str(values[i]).upper(): values[i + 1]
+                for i in range(0, len(values) - 1, 2)
+            }
+        )
+    return messages
+
+
+def _text(value: Any) -> str:
+    if isinstance(value, bytes):
+        return value.decode("utf-8", "replace")
+    return value if isinstance(value, str) else ""
+
+
+def _param_dict(values: Any) -> Dict[str, str]:
+    if not isinstance(values, list):
+        return {}
+    return {
+        _text(values[i]).lower(): _text(values[i + 1])
+        for i in range(0, len(values) - 1, 2)
+    }
+
+
+def _decode_filename(params: Dict[str, str]) -> Optional[str]:
+    if params.get("filename*"):
+        # RFC 2231: charset'idioma'valor-con-escapes-%
+        return collapse_rfc2231_value(decode_rfc2231(params["filename*"]))
+    value = params.get("filename") or params.get("name")
+    if not value:
+        return None
+    try:
+        return str(make_header(decode_header(value)))
+    except Exception:
+        return value
+
+
+def _disposition(extension: List[Any]) -> Tuple[Optional[str], Dict[str, str]]:
+    """Buscar el campo de disposición entre los datos de extensión.
+
+    Su posición depende del tipo de la parte (text/*, message/rfc822 u otro),
+    así que se localiza por su forma: ("ATTACHMENT" ("FILENAME" "x.pdf")).
+    """
+    for value in extension:
+        if (
+            isinstance(value, list)
+            and len(value) == 2
+            and isinstance(value[0], str)
+            and (value[1] is None or isinstance(value[1], list))
+        ):
+            return value[0].lower(), _param_dict(value[1])
+    return None, {}
+
+
+def body_parts(structure: list, section: str = "") -> List[Dict[str, Any]]:
+    """Aplanar un BODYSTRUCTURE en la lista de partes hoja del mensaje.
+
+    Cada parte incluye el número de sección IMAP con el que puede descargarse
+    (BODY[section]), su tipo, codificación y tamaño codificado, sin necesidad de
+    haber descargado su contenido.
+    """
+    if structure and isinstance(structure[0], list):
+        parts: List[Dict[str, Any]] = []
+        index = 0
+        while index < len(structure) and isinstance(structure[index], list):
+            child = f"{section}.{index + 1}" if section else str(index + 1)
+            parts.extend(body_parts(structure[index], child))
+            index += 1
+        return parts
+
+    content_type = f"{_text(structure[0])}/{_text(structure[1])}".lower()
+    params = _param_dict(structure[2])
+    disposition, disposition_params = _disposition(structure[7:])
+    filename = _decode_filename(disposition_params) or _decode_filename(params)
+    is_attachment = (
+        disposition == "attachment"
+        or bool(filename)
+        or content_type not in BODY_TEXT_TYPES
+    )
+    return [
+        {
+            "section": section or "1",
+            "content_type": content_type,
+            "charset": params.get("charset"),
+            "encoding": _text(structure[5]).lower() or "7bit",
+            "size": structure[6] if isinstance(structure[6], int) else 0,
+            "filename": filename,
+            "is_attachment": is_attachment,
+        }
+    ]
+
+
+def attachment_parts(parts: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Metadatos de los adjuntos: nombre, sección, tipo y tamaño."""
+    return [
+        {
+            "filename": part["filename"] or f"adjunto_{part['section']}",
+            "section": part["section"],
+            "content_type": part["content_type"],
+            "encoding": part["encoding"],
+            "size": part["size"],
+        }
+        for part in parts
+        if part["is_attachment"]
+    ]
+
+
+def text_parts(parts: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    return [part for part in parts if not part["is_attachment"]]
+
+
+def fetch_structures(mailbox, uids: List[str]) -> Dict[str, List[Dict[str, Any]]]:
+    """Obtener las partes de cada mensaje con UID FETCH BODYSTRUCTURE.
+
+    Los mensajes cuyo BODYSTRUCTURE no pueda interpretarse no aparecen en el
+    resultado.
+    """
+    result = mailbox.client.uid("FETCH", ",".join(uids), "(UID BODYSTRUCTURE)")
+    check_command_status(result, MailboxFetchError)
+    structures: Dict[str, List[Dict[str, Any]]] = {}
+    for item in parse_fetch_response(result[1]):
+        try:
+            structures[str(item["UID"])] = body_parts(item["BODYSTRUCTURE"])
+        except (KeyError, IndexError, TypeError):
+            continue
+    return structures
+
+
+def fetch_sections(
+    mailbox, uids: List[str], sections: Iterable[str]
+) -> Dict[str, Dict[str, bytes]]:
+    """Descargar solo las secciones indicadas de cada mensaje (sin marcarlo leído)."""
+    spec = " ".join(f"BODY.PEEK[{section}]" for section in sections)
+    result = mailbox.client.uid("FETCH", ",".join(uids), f"(UID {spec})")
+    check_command_status(result, MailboxFetchError)
+    bodies: Dict[str, Dict[str, bytes]] = {}
+    for item in parse_fetch_response(result[1]):
+        if "UID" not in item:
+            continue
+        bodies[str(item["UID"])] = {
+            key[5:-1]: value if isinstance(value, bytes) else b""
+            for key, value in item.items()
+            if key.startswith("BODY[")
+        }
+    return bodies
+
+
+def decode_part(data: bytes, encoding: str, charset: Optional[str]) -> str:
+    """Decodificar el contenido de una parte de texto según su Content-Transfer-Encoding."""
+    if encoding == "base64":
+        data = base64.b64decode(data)
+    elif encoding == "quoted-printable":
+        data = binascii.a2b_qp(data)
+    try:
+        return data.decode(charset or "utf-8", "replace")
+    except LookupError:
+        return data.decode("utf-8", "replace")
+
+
+class _HTMLText(HTMLParser):
+    """Texto visible de un documento HTML, sin scripts ni estilos."""
+
+    SKIPPED_TAGS = ("script", "style", "head", "title")
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.chunks: List[str] = []
+        self._skipping = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIPPED_TAGS:
+            self._skipping += 1
+        # Separar el texto de bloques contiguos (<td>a</td><td>b</td>)
+        self.chunks.append(" ")
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIPPED_TAGS and self._skipping:
+            self._skipping -= 1
+        self.chunks.append(" ")
+
+    def handle_data(self, data):
+        if not self._skipping:
+            self.chunks.append(data)
+
+
+def html_to_text(html: Optional[str]) -> str:
+    """Extraer el texto de un cuerpo HTML para indexarlo."""
+    if not html:
+        return ""
+    parser = _HTMLText()
+    try:
+        parser.feed(html)
+        parser.close()
+    except Exception:
+        # HTML demasiado roto: quitar las etiquetas sin interpretarlo
+        return " ".join(re.sub(r"<[^>]*>", " ", html).split())
+    return " ".join("".join(parser.chunks).split())
+
+
+class _StreamDecoder:
+    """Decodificación incremental de base64 o quoted-printable por trozos."""
+
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        self._pending = b""
+
+    def feed(self, data: bytes) -> bytes:
+        if self.encoding == "base64":
+            self._pending += re.sub(rb"\s+", b"", data)
+            usable = len(self._pending) // 4 * 4
+            chunk, self._pending = self._pending[:usable], self._pending[usable:]
+            return base64.b64decode(chunk)
+        if self.encoding == "quoted-printable":
+            # Una secuencia =XX o un salto suave pueden quedar partidos entre trozos
+            self._pending += data
+            end = self._pending.rfind(b"\n") + 1
+            chunk, self._pending = self._pending[:end], self._pending[end:]
+            return binascii.a2b_qp(chunk)
+        return data
+
+    def finish(self) -> bytes:
+        pending, self._pending = self._pending, b""
+        if self.encoding == "base64" and pending:
+            return base64.b64decode(pending + b"=" * (-len(pending) % 4))
+        if self.encoding == "quoted-printable":
+            return binascii.a2b_qp(pending)
+        return pending
+
+
+class ByteBudget:
+    """Límite de bytes descargados por mensaje y por sesión.
+
+    Los importes se cargan a medida que llegan los trozos; check permite
+    rechazar una descarga antes de empezarla a partir del tamaño declarado en
+    BODYSTRUCTURE.
+    """
+
+    def __init__(self, max_message_bytes: int, max_session_bytes: int):
+        self.max_message_bytes = max_message_bytes
+        self.max_session_bytes = max_session_bytes
+        self.session_bytes = 0
+        self._message_bytes: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def remaining(self, key: str) -> int:
+        with self._lock:
+            return min(
+                self.max_message_bytes - self._message_bytes.get(key, 0),
+                self.max_session_bytes - self.session_bytes,
+            )
+
+    def check(self, key: str, size: int):
+        remaining = self.remaining(key)
+        if size > remaining:
+            raise DownloadBudgetExceeded(
+                f"La descarga de {size} bytes supera el presupuesto restante "
+                f"({max(remaining, 0)} bytes)."
+            )
+
+    def charge(self, key: str, size: int):
+        self.check(key, size)
+        with self._lock:
+            self._message_bytes[key] = self._message_bytes.get(key, 0) + size
+            self.session_bytes += size
+
+    def reset(self):
+        with self._lock:
+            self._message_bytes.clear()
+            self.session_bytes = 0
+
+
+def stream_attachment(
+    mailbox,
+    uid: str,
+    part: Dict[str, Any],
+    path: str,
+    budget: ByteBudget,
+    budget_key: str,
+    chunk_size: int = ATTACHMENT_CHUNK_SIZE,
+) -> int:
+    """Descargar un adjunto directamente a disco con fetch parciales.
+
+    Pide la sección en trozos BODY.PEEK[section]<offset.chunk_size>, los
+    decodifica de forma incremental y los escribe en path, de modo que el
+    adjunto nunca está completo en memoria. Se escribe primero en un fichero
+    .part que solo se renombra al terminar. Devuelve los bytes escritos.
+    """
+    budget.check(budget_key, part["size"])
+    section = part["section"]
+    label = f"BODY[{section}]<"
+    decoder = _StreamDecoder(part["encoding"])
+    temp_path = path + ".part"
+    written = 0
+    offset = 0
+    try:
+        with open(temp_path, "wb") as output:
+            while True:
+                result = mailbox.client.uid(
+                    "FETCH", str(uid), f"(BODY.PEEK[{section}]<{offset}.{chunk_size}>)"
+                )
+                check_command_status(result, MailboxFetchError)
+                data = b""
+                for item in parse_fetch_response(result[1]):
+                    for key, value in item.items():
+                        if key.startswith(label) and isinstance(value, bytes):
+                            data = value
+                if not data:
+                    break
+                budget.charge(budget_key, len(data))
+                written += output.write(decoder.feed(data))
+                offset += len(data)
+                if len(data) < chunk_size:
+                    break
+            written += output.write(decoder.finish())
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return written
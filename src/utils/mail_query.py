@@ -0,0 +1,163 @@
+import re
+from datetime import date, datetime
+from typing import Any, List, Optional, Tuple
+
+# Nombres de mes de IMAP (RFC 3501), independientes del locale del sistema
+IMAP_MONTHS = (
+    "Jan", "Feb", "Mar", "Apr", "May", "Jun",
+    "Jul", "Aug", "Sep", "Oct", "Nov", "Dec",
+)
+DATE_FORMATS = ("%Y-%m-%d", "%d/%m/%Y", "%d-%m-%Y")
+TOKEN_PATTERN = re.compile(r'(\w+):("[^"]*"|\S+)|"([^"]*)"|(\S+)')
+
+
+def imap_quote(value: str) -> str:
+    """Citar una cadena para un criterio IMAP SEARCH."""
+    return '"' + value.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def imap_date(value: date) -> str:
+    return f"{value.day}-{IMAP_MONTHS[value.month - 1]}-{value.year}"
+
+
+def fts_phrase(value: str) -> str:
+    """Frase FTS5 con coincidencia por prefijo en la última palabra."""
+    return '"' + value.replace('"', '""') + '"*'
+
+
+def parse_date(value: str) -> date:
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, date_format).date()
+        except ValueError:
+            continue
+    raise ValueError(f"Fecha no válida en la búsqueda: {value}")
+
+
+class MailQuery:
+    """Consulta de correo con un lenguaje sencillo de filtros.
+
+    Sintaxis admitida (los filtros se combinan con AND):
+        from:juan subject:"carta porte" since:2024-03-01 before:15/03/2024
+        has:attachment unread texto libre
+
+    La misma consulta se compila a criterios IMAP SEARCH para filtrar en el
+    servidor, o a FTS5/SQL para resolverla sobre la caché local.
+    """
+
+    def __init__(self):
+        self.senders: List[str] = []
+        self.subjects: List[str] = []
+        self.terms: List[str] = []
+        self.since: Optional[date] = None
+        self.before: Optional[date] = None
+        self.has_attachment = False
+        self.unread = False
+
+    @classmethod
+    def parse(cls, query: str) -> "MailQuery":
+        mail_query = cls()
+        for match in TOKEN_PATTERN.finditer(query or ""):
+            key, value, quoted, word = match.groups()
+            if key is not None:
+                key = key.lower()
+                value = value.strip('"')
+                if key == "from":
+                    mail_query.senders.append(value)
+                elif key == "subject":
+                    mail_query.subjects.append(value)
+                elif key == "since":
+                    mail_query.since = parse_date(value)
+                elif key == "before":
+                    mail_query.before = parse_date(value)
+                elif key == "has" and value.lower() in ("attachment", "adjunto"):
+                    mail_query.has_attachment = True
+                elif key == "is" and value.lower() in ("unread", "noleido"):
+                    mail_query.unread = True
+                else:
+                    # Filtro desconocido: tratarlo como texto libre
+                    mail_query.terms.append(match.group(0))
+            elif quoted is not None:
+                if quoted:
+                    mail_query.terms.append(quoted)
+            elif word.lower() in ("unread", "noleidos", "no-leidos"):
+                mail_query.unread = True
+            else:
+                mail_query.terms.append(word)
+        return mail_query
+
+    def is_empty(self) -> bool:
+        return not (
+            self.senders
+            or self.subjects
+            or self.terms
+            or self.since
+            or self.before
+            or self.has_attachment
+            or self.unread
+        )
+
+    @property
+    def charset(self) -> str:
+        """Juego de caracteres necesario para enviar los criterios al servidor."""
+        return "US-ASCII" if self.to_imap().isascii() else "UTF-8"
+
+    def to_imap(self) -> str:
+        """Compilar a criterios IMAP SEARCH."""
+        criteria = []
+        criteria += [f"FROM {imap_quote(value)}" for value in self.senders]
+        criteria += [f"SUBJECT {imap_quote(value)}" for value in self.subjects]
+        criteria += [f"TEXT {imap_quote(value)}" for value in self.terms]
+        if self.since:
+            criteria.append(f"SINCE {imap_date(self.since)}")
+        if self.before:
+            criteria.append(f"BEFORE {imap_date(self.before)}")
+        if self.has_attachment:
+            # IMAP no tiene un criterio estándar para adjuntos; los mensajes con
+            # adjuntos se envían como multipart/mixed
+            criteria.append(f'HEADER Content-Type {imap_quote("multipart/mixed")}')
+        if self.unread:
+            criteria.append("UNSEEN")
+        return " ".join(criteria) if criteria else "ALL"
+
+    def to_fts(self) -> Optional[str]:
+        """Compilar los filtros de texto a una expresión MATCH de FTS5.
+
+        Devuelve None si la consulta no tiene filtros de texto.
+        """
+        parts = [f"sender : {fts_phrase(value)}" for value in self.senders]
+        parts += [f"subject : {fts_phrase(value)}" for value in self.subjects]
+        parts += [fts_phrase(value) for value in self.terms]
+        return " AND ".join(parts) if parts else None
+
+    def to_sql(self, include_text: bool = True) -> Tuple[str, List[Any]]:
+        """Compilar a una cláusula WHERE sobre la tabla messages de MailCache.
+
+        Con include_text=False se omiten los filtros de texto, que entonces se
+        resuelven con el índice de texto completo (to_fts).
+        """
+        clauses: List[str] = []
+        params: List[Any] = []
+        if include_text:
+            for value in self.senders:
+                clauses.append("sender LIKE ?")
+                params.append(f"%{value}%")
+            for value in self.subjects:
+                clauses.append("subject LIKE ?")
+                params.append(f"%{value}%")
+            for value in self.terms:
+                clauses.append(
+                    "(subject LIKE ? OR sender LIKE ? OR text LIKE ? OR html LIKE ?)"
+                )
+                params += [f"%{value}%"] * 4
+        if self.since:
+            clauses.append("date(date) >= ?")
+            params.append(self.since.isoformat())
+        if self.before:
+            clauses.append("date(date) < ?")
+            params.append(self.before.isoformat())
+        if self.has_attachment:
+            clauses.append("has_attachments = 1")
+        if self.unread:
+            clauses.append("seen = 0")
+        return (" AND ".join(clauses) if clauses else "1=1"), params
@@ -0,0 +1,306 @@
+import re
+import threading
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from imap_tools import AND, MailMessage
+from imap_tools.errors import MailboxFetchError
+from imap_tools.utils import check_command_status, chunked_crop
+from src.utils.imap_pool import IMAPConnectionPool
+from src.utils.mail_cache import MailCache
+from src.utils.mail_parts import (
+    attachment_parts,
+    decode_part,
+    fetch_sections,
+    fetch_structures,
+    text_parts,
+)
+from src.utils.mail_query import MailQuery
+from src.utils.mail_threads import parse_message_ids
+from src.utils.logger import Logger
+
+# Tamaño de lote para UID FETCH al sincronizar cabeceras
+FETCH_BATCH_SIZE = 100
+
+# Campos de cabecera que bastan para resumir un correo sin descargar el cuerpo
+SUMMARY_FIELDS = (
+    "FROM",
+    "TO",
+    "SUBJECT",
+    "DATE",
+    "MESSAGE-ID",
+    "IN-REPLY-TO",
+    "REFERENCES",
+    "CONTENT-TYPE",
+)
+SUMMARY_PARTS = (
+    f"(UID FLAGS RFC822.SIZE BODY.PEEK[HEADER.FIELDS ({' '.join(SUMMARY_FIELDS)})])"
+)
+UNTAGGED_FETCH_PATTERN = re.compile(rb"^\d+ \(")
+
+
+def fetch_summaries(mailbox, uids: List[str]) -> Iterator[MailMessage]:
+    """Descargar solo las cabeceras de resumen de los UIDs indicados.
+
+    Usa BODY.PEEK, por lo que los mensajes no se marcan como leídos.
+    """
+    for batch in chunked_crop(uids, FETCH_BATCH_SIZE):
+        result = mailbox.client.uid("FETCH", ",".join(batch), SUMMARY_PARTS)
+        check_command_status(result, MailboxFetchError)
+        parts: List[Any] = []
+        for item in result[1]:
+            if item is None:
+                continue
+            if isinstance(item, tuple):
+                if parts:
+                    yield MailMessage(parts)
+                parts = [item]
+            elif parts and not UNTAGGED_FETCH_PATTERN.match(item):
+                # Resto de la respuesta tras el literal (p. ej. b' FLAGS ())')
+                parts.append(item)
+        if parts:
+            yield MailMessage(parts)
+
+
+def header_record(msg) -> Dict[str, Any]:
+    """Extraer los campos de cabecera de un MailMessage para la caché."""
+    message_id = msg.headers.get("message-id", ("",))[0].strip()
+    content_type = msg.headers.get("content-type", ("",))[0].lower()
+    in_reply_to = parse_message_ids(msg.headers.get("in-reply-to", ("",))[0])
+    return {
+        "uid": msg.uid,
+        "message_id": message_id,
+        "in_reply_to": in_reply_to[0] if in_reply_to else None,
+        "references": parse_message_ids(msg.headers.get("references", ("",))[0]),
+        "subject": msg.subject,
+        "from": msg.from_,
+        "to": msg.to,
+        "date": msg.date,
+        "seen": "\\Seen" in msg.flags,
+        "size": msg.size_rfc822,
+        "has_attachments": content_type.startswith("multipart/mixed"),
+    }
+
+
+class MailSync:
+    """Sincronización incremental por UID entre el servidor IMAP y la caché local.
+
+    Solo se descargan las cabeceras de los UIDs mayores al último sincronizado;
+    si el servidor cambia el UIDVALIDITY de la carpeta, la caché se reconstruye.
+    Con prefetch_bodies también se descargan los cuerpos de los mensajes nuevos
+    para que la búsqueda local de texto completo cubra su contenido.
+    """
+
+    def __init__(
+        self,
+        pool: IMAPConnectionPool,
+        cache: MailCache,
+        account: str,
+        prefetch_bodies: bool = False,
+        logger: Optional[Logger] = None,
+    ):
+        self.pool = pool
+        self.cache = cache
+        self.account = account
+        self.prefetch_bodies = prefetch_bodies
+        self.logger = logger if logger else Logger()
+        self._lock = threading.Lock()
+        # Un candado por carpeta: carpetas distintas pueden sincronizarse a la vez
+        self._folder_locks: Dict[str, threading.Lock] = {}
+
+    def sync_folder(self, folder: str = "INBOX") -> int:
+        """Traer los mensajes nuevos de la carpeta. Devuelve cuántos se añadieron."""
+        with self._lock:
+            folder_lock = self._folder_locks.setdefault(folder, threading.Lock())
+        with folder_lock:
+            return self.pool.run(folder, lambda mailbox: self._sync(mailbox, folder))
+
+    def _sync(self, mailbox, folder: str) -> int:
+        status = mailbox.folder.status(folder, ["UIDVALIDITY", "UIDNEXT", "MESSAGES"])
+        uidvalidity = status["UIDVALIDITY"]
+        state = self.cache.get_folder_state(self.account, folder)
+        if state is None or state[0] != uidvalidity:
+            if state is not None:
+                self.logger.warning(
+                    f"UIDVALIDITY de {folder} cambió; reconstruyendo la caché."
+                )
+            self.cache.reset_folder(self.account, folder, uidvalidity)
+            last_uid = 0
+        else:
+            last_uid = state[1]
+
+        added = 0
+        if status["UIDNEXT"] - 1 > last_uid:
+            # "N:*" siempre devuelve el último mensaje aunque su UID sea menor
+            new_uids = [
+                uid
+                for uid in mailbox.uids(AND(uid=f"{last_uid + 1}:*"))
+                if int(uid) > last_uid
+            ]
+            records = [
+                header_record(msg)
+                for msg in fetch_summaries(mailbox, new_uids)
+                if msg.uid
+            ]
+            added = self.cache.upsert_headers(self.account, folder, records)
+            if records:
+                last_uid = max(int(record["uid"]) for record in records)
+                if self.prefetch_bodies:
+                    self._fetch_bodies(
+                        mailbox, folder, [record["uid"] for record in records]
+                    )
+        self.cache.set_last_uid(self.account, folder, last_uid)
+
+        # Refrescar marcas de leído hechas desde otros clientes (solo UIDs)
+        self.cache.update_unseen(self.account, folder, mailbox.uids(AND(seen=False)))
+        if self.cache.count_messages(self.account, folder) > status["MESSAGES"]:
+            self.cache.prune(self.account, folder, mailbox.uids("ALL"))
+
+        if added:
+            self.logger.info(f"Sincronizados {added} correos nuevos de {folder}.")
+        return added
+
+    def search(
+        self, folder: str, mail_query: MailQuery, limit: Optional[int] = None
+    ) -> List[str]:
+        """Resolver la consulta con IMAP SEARCH. Devuelve UIDs, más recientes primero.
+
+        Antes se hace una sincronización incremental para que las cabeceras de
+        todos los UIDs coincidentes ya estén en la caché local.
+        """
+        self.sync_folder(folder)
+        uids = self.pool.run(
+            folder,
+            lambda mailbox: mailbox.uids(mail_query.to_imap(), mail_query.charset),
+        )
+        uids = sorted(uids, key=int, reverse=True)
+        return uids[:limit] if limit else uids
+
+    def load_bodies(self, folder: str, uids: Iterable[str]) -> List[Dict[str, Any]]:
+        """Descargar bajo demanda los cuerpos que aún no estén en la caché."""
+        uids = [str(uid) for uid in uids]
+        cached = self.cache.get_messages(self.account, folder, uids)
+        # Los cuerpos guardados antes de registrar attachment_parts se recargan
+        missing = [
+            msg["uid"]
+            for msg in cached
+            if not msg["body_loaded"]
+            or (msg["attachments"] and not msg["attachment_parts"])
+        ]
+        if missing:
+            self.pool.run(
+                folder, lambda mailbox: self._fetch_bodies(mailbox, folder, missing)
+            )
+            cached = self.cache.get_messages(self.account, folder, uids)
+        return cached
+
+    def _fetch_bodies(self, mailbox, folder: str, uids: List[str]):
+        """Descargar las partes de texto; de los adjuntos solo sus metadatos.
+
+        La estructura MIME se obtiene con BODYSTRUCTURE y después se piden
+        únicamente las secciones de texto, agrupando los mensajes que comparten
+        las mismas secciones en un solo UID FETCH.
+        """
+        for batch in chunked_crop(uids, FETCH_BATCH_SIZE):
+            structures = fetch_structures(mailbox, batch)
+            groups: Dict[Tuple[str, ...], List[str]] = {}
+            for uid, parts in structures.items():
+                sections = tuple(part["section"] for part in text_parts(parts))
+                groups.setdefault(sections, []).append(uid)
+            for sections, group in groups.items():
+                bodies = fetch_sections(mailbox, group, sections) if sections else {}
+                for uid in group:
+                    self._store_parts(folder, uid, structures[uid], bodies.get(uid, {}))
+            unparsed = [uid for uid in batch if uid not in structures]
+            if unparsed:
+                self._fetch_full_bodies(mailbox, folder, unparsed)
+
+    def _store_parts(
+        self,
+        folder: str,
+        uid: str,
+        parts: List[Dict[str, Any]],
+        bodies: Dict[str, bytes],
+    ):
+        decoded = {"text/plain": [], "text/html": []}
+        for part in text_parts(parts):
+            data = bodies.get(part["section"])
+            if data:
+                decoded[part["content_type"]].append(
+                    decode_part(data, part["encoding"], part["charset"])
+                )
+        attachments = attachment_parts(parts)
+        self.cache.store_body(
+            self.account,
+            folder,
+            uid,
+            "".join(decoded["text/plain"]),
+            "".join(decoded["text/html"]),
+            [attachment["filename"] for attachment in attachments],
+            attachments,
+        )
+
+    def _fetch_full_bodies(self, mailbox, folder: str, uids: List[str]):
+        """Descarga completa, para servidores con un BODYSTRUCTURE ilegible."""
+        for msg in mailbox.fetch(
+            AND(uid=",".join(uids)), mark_seen=False, bulk=FETCH_BATCH_SIZE
+        ):
+            self.cache.store_body(
+                self.account,
+                folder,
+                msg.uid,
+                msg.text,
+                msg.html,
+                [att.filename for att in msg.attachments],
+            )
+
+
+class LazyMailMessage:
+    """Resumen de correo que descarga el cuerpo y la lista de adjuntos al accederlos.
+
+    Se comporta como el diccionario que devuelve EmailManager.get_unread_emails,
+    de modo que el código existente puede usarlo sin cambios.
+    """
+
+    BODY_FIELDS = ("text", "attachments", "attachment_parts")
+
+    def __init__(
+        self, summary: Dict[str, Any], loader: Callable[[str], Dict[str, Any]]
+    ):
+        self._data = dict(summary)
+        self._loader = loader
+
+    def _ensure_body(self):
+        if not self._data.get("body_loaded"):
+            loaded = self._loader(self._data["uid"])
+            # Solo el cuerpo: las demás claves pueden haberse reetiquetado
+            self._data.update(
+                {key: loaded[key] for key in self.BODY_FIELDS if key in loaded}
+            )
+            if "body_loaded" in loaded:
+                self._data["body_loaded"] = loaded["body_loaded"]
+
+    def __getitem__(self, key: str) -> Any:
+        if key in self.BODY_FIELDS:
+            self._ensure_body()
+        return self._data[key]
+
+    def __setitem__(self, key: str, value: Any):
+        self._data[key] = value
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._data
+
+    def get(self, key: str, default: Any = None) -> Any:
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def keys(self):
+        return self._data.keys()
+
+    @property
+    def body_loaded(self) -> bool:
+        return bool(self._data.get("body_loaded"))
+
+    def __repr__(self):
+        return f"LazyMailMessage(uid={self._data.get('uid')}, subject={self._data.get('subject')!r})"
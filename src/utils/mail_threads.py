@@ -0,0 +1,57 @@
+import hashlib
+import re
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+# Prefijos de respuesta y reenvío habituales (también en español: RV, RE, RES)
+REPLY_PREFIX_PATTERN = re.compile(
+    r"^\s*((re|fw|fwd|rv|res|aw|tr)(\[\d+\])?\s*:\s*)+", re.IGNORECASE
+)
+MESSAGE_ID_PATTERN = re.compile(r"<[^<>\s]+>")
+
+
+def normalize_subject(subject: Optional[str]) -> str:
+    """Asunto sin prefijos Re:/Fwd:/RV:, en minúsculas y con espacios simples."""
+    subject = REPLY_PREFIX_PATTERN.sub("", subject or "")
+    return " ".join(subject.lower().split())
+
+
+def is_reply(subject: Optional[str]) -> bool:
+    return bool(REPLY_PREFIX_PATTERN.match(subject or ""))
+
+
+def parse_message_ids(value: Optional[str]) -> List[str]:
+    """Extraer los Message-ID (<...>) de una cabecera References o In-Reply-To."""
+    return MESSAGE_ID_PATTERN.findall(value or "")
+
+
+def content_hash(record: Dict[str, Any]) -> Optional[str]:
+    """Huella para detectar copias del mismo correo sin descargar el cuerpo.
+
+    Con Message-ID la huella sale solo de él: las copias que llegan por varios
+    alias lo comparten. Sin Message-ID combina remitente, asunto tal cual,
+    fecha completa y tamaño del mensaje (el cuerpo aún no se ha descargado),
+    para que "X" y "Re: X" o dos avisos del mismo minuto no se tomen por copias.
+    Devuelve None si no hay ningún dato con el que distinguir el mensaje.
+    """
+    message_id = (record.get("message_id") or "").strip()
+    if message_id:
+        key = "id\n" + message_id
+    else:
+        date = record.get("date")
+        stamp = ""
+        # imap_tools devuelve 1900-01-01 cuando falta la cabecera Date
+        if isinstance(date, datetime) and date.year > 1900:
+            if date.tzinfo is None:
+                date = date.replace(tzinfo=timezone.utc)
+            stamp = date.astimezone(timezone.utc).isoformat()
+        parts = [
+            (record.get("from") or "").strip().lower(),
+            (record.get("subject") or "").strip(),
+            stamp,
+            str(record.get("size") or ""),
+        ]
+        if not any(parts):
+            return None
+        key = "\n".join(["content"] + parts)
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()
@@ -0,0 +1,251 @@
+import queue
+import smtplib
+import socket
+import ssl
+import threading
+import time
+from email.message import EmailMessage
+from typing import Iterable, List, Optional
+from src.utils.logger import Logger
+
+# Errores tras los que tiene sentido reconectar y reintentar el envío
+TRANSIENT_ERRORS = (smtplib.SMTPServerDisconnected, socket.error, ssl.SSLError)
+# Errores definitivos: reintentar no cambia el resultado
+PERMANENT_ERRORS = (
+    smtplib.SMTPAuthenticationError,
+    smtplib.SMTPRecipientsRefused,
+    smtplib.SMTPSenderRefused,
+    smtplib.SMTPNotSupportedError,
+)
+
+
+def describe_smtp_error(error: Exception, server: str, port: int, email: str) -> str:
+    """Mensaje legible para un error de envío SMTP."""
+    if isinstance(error, smtplib.SMTPAuthenticationError):
+        return f"Error de autenticación SMTP para {email}. Verifica la contraseña o la configuración de 'apps menos seguras'."
+    if isinstance(error, smtplib.SMTPServerDisconnected):
+        return f"Servidor SMTP {server} desconectado inesperadamente."
+    if isinstance(error, smtplib.SMTPConnectError):
+        return f"Error al conectar al servidor SMTP {server}:{port}. {error}"
+    if isinstance(error, ConnectionRefusedError):
+        return f"Conexión rechazada por el servidor SMTP {server}:{port}."
+    return f"Error inesperado al enviar correo: {error}"
+
+
+class SMTPSession:
+    """Sesión SMTP autenticada que se reutiliza entre mensajes.
+
+    Se reconecta de forma transparente cuando el servidor responde 421 o cierra
+    la conexión, y renueva la sesión al alcanzar max_messages mensajes, límite
+    que muchos proveedores imponen por conexión.
+    """
+
+    def __init__(
+        self,
+        server: str,
+        port: int,
+        email: str,
+        password: str,
+        use_starttls: bool = True,
+        max_messages: int = 50,
+        timeout: float = 30,
+        logger: Optional[Logger] = None,
+    ):
+        self.server = server
+        self.port = port
+        self.email = email
+        self.password = password
+        self.use_starttls = use_starttls
+        self.max_messages = max_messages
+        self.timeout = timeout
+        self.logger = logger if logger else Logger()
+        self.smtp: Optional[smtplib.SMTP] = None
+        self.sent_in_session = 0
+        self.sessions_opened = 0
+
+    def open(self):
+        self.logger.info(f"Conectando al servidor SMTP {self.server}:{self.port}")
+        smtp = smtplib.SMTP(self.server, self.port, timeout=self.timeout)
+        try:
+            smtp.ehlo()
+            if self.use_starttls:
+                smtp.starttls(context=ssl.create_default_context())
+                smtp.ehlo()
+            if self.password:
+                self.logger.info(f"Iniciando sesión SMTP como {self.email}")
+                smtp.login(self.email, self.password)
+        except Exception:
+            smtp.close()
+            raise
+        self.smtp = smtp
+        self.sent_in_session = 0
+        self.sessions_opened += 1
+
+    def close(self):
+        if self.smtp:
+            try:
+                self.smtp.quit()
+            except Exception:
+                self.smtp.close()
+            self.smtp = None
+
+    def send(self, message: EmailMessage):
+        """Enviar un mensaje reutilizando la sesión; reconecta una vez si se cayó."""
+        if self.smtp and self.sent_in_session >= self.max_messages:
+            self.close()
+        if not self.smtp:
+            self.open()
+        try:
+            self.smtp.send_message(message)
+        except smtplib.SMTPResponseException as e:
+            if e.smtp_code != 421:
+                raise
+            self.logger.warning("El servidor SMTP cerró la sesión (421). Reconectando...")
+            self._reconnect_and_send(message)
+        except TRANSIENT_ERRORS as e:
+            self.logger.warning(f"Sesión SMTP perdida ({e}). Reconectando...")
+            self._reconnect_and_send(message)
+        self.sent_in_session += 1
+
+    def _reconnect_and_send(self, message: EmailMessage):
+        self.close()
+        self.open()
+        self.smtp.send_message(message)
+
+
+class SendJob:
+    """Resguardo de un envío encolado; permite esperar su resultado."""
+
+    PENDING, SENT, FAILED = "pending", "sent", "failed"
+
+    def __init__(self, message: EmailMessage):
+        self.message = message
+        self.status = self.PENDING
+        self.error: Optional[Exception] = None
+        self.attempts = 0
+        self._done = threading.Event()
+
+    def _finish(self, status: str, error: Optional[Exception] = None):
+        self.status = status
+        self.error = error
+        self._done.set()
+
+    @property
+    def done(self) -> bool:
+        return self._done.is_set()
+
+    @property
+    def succeeded(self) -> bool:
+        return self.status == self.SENT
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Esperar a que termine el envío. Devuelve True si se envió."""
+        self._done.wait(timeout)
+        return self.succeeded
+
+
+class OutboundMailQueue:
+    """Cola de correo saliente drenada por un hilo en segundo plano.
+
+    Los llamadores reciben un SendJob inmediatamente; el hilo envía los
+    mensajes por una única sesión SMTP persistente, reintenta los fallos
+    transitorios y cierra la sesión tras idle_timeout segundos sin trabajo.
+    """
+
+    def __init__(
+        self,
+        session: SMTPSession,
+        max_retries: int = 3,
+        retry_delay: float = 2,
+        idle_timeout: float = 60,
+        logger: Optional[Logger] = None,
+    ):
+        self.session = session
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.idle_timeout = idle_timeout
+        self.logger = logger if logger else Logger()
+        self._queue: "queue.Queue[Optional[SendJob]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def _ensure_worker(self):
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(
+                target=self._worker, name="smtp-outbox", daemon=True
+            )
+            self._thread.start()
+
+    def enqueue(self, message: EmailMessage) -> SendJob:
+        job = SendJob(message)
+        self._queue.put(job)
+        self._ensure_worker()
+        return job
+
+    def send_many(self, messages: Iterable[EmailMessage]) -> List[SendJob]:
+        return [self.enqueue(message) for message in messages]
+
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Esperar a que se vacíe la cola. Devuelve False si venció el tiempo."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if deadline is not None and time.monotonic() > deadline:
+                return False
+            time.sleep(0.05)
+        return True
+
+    def stop(self, timeout: Optional[float] = None):
+        """Enviar lo pendiente, detener el hilo y cerrar la sesión SMTP."""
+        if self._thread and self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join(timeout)
+        self._thread = None
+
+    def _worker(self):
+        while True:
+            try:
+                job = self._queue.get(timeout=self.idle_timeout)
+            except queue.Empty:
+                # Sin trabajo: liberar la conexión hasta el próximo envío
+                self.session.close()
+                continue
+            try:
+                if job is None:
+                    self.session.close()
+                    return
+                self._deliver(job)
+            finally:
+                self._queue.task_done()
+
+    def _deliver(self, job: SendJob):
+        recipient = job.message["To"]
+        while True:
+            job.attempts += 1
+            try:
+                self.session.send(job.message)
+                self.logger.info(f"Correo enviado a {recipient}.")
+                job._finish(SendJob.SENT)
+                return
+            except Exception as e:
+                self.session.close()
+                permanent = isinstance(e, PERMANENT_ERRORS)
+                if permanent or job.attempts > self.max_retries:
+                    self.logger.error(
+                        describe_smtp_error(
+                            e,
+                            self.session.server,
+                            self.session.port,
+                            self.session.email,
+                        )
+                    )
+                    job._finish(SendJob.FAILED, e)
+                    return
+                self.logger.warning(
+                    f"Fallo al enviar a {recipient} (intento {job.attempts}): {e}"
+                )
+                time.sleep(self.retry_delay * job.attempts)
@@ -0,0 +1,154 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from src.utils.logger import Logger
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tms_trips (
+    fingerprint TEXT PRIMARY KEY,
+    trip TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    batch TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    created_at TEXT NOT NULL,
+    submitted_at TEXT,
+    confirmed_at TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_tms_trips_status ON tms_trips (status, batch);
+"""
+
+PENDING, SUBMITTED, CONFIRMED = "pending", "submitted", "confirmed"
+
+
+def trip_fingerprint(trip: Dict[str, Any]) -> str:
+    """Huella estable de un viaje: no depende del orden de los campos ni de
+    los espacios sobrantes en los valores."""
+    canonical = {
+        str(field): " ".join(str(value).split())
+        for field, value in trip.items()
+        if value is not None
+    }
+    raw = json.dumps(canonical, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+class TMSJournal:
+    """Registro persistente de las cargas de viajes en el TMS, en SQLite.
+
+    Cada viaje se identifica por su huella y pasa por tres estados:
+    pending (registrado), submitted (se pulsó "guardar" pero aún no se vio
+    la confirmación) y confirmed (el TMS mostró el mensaje de éxito). Si una
+    carga masiva se interrumpe, al repetirla los viajes confirmed se saltan
+    sin tocar el navegador y los pending se cargan.
+
+    Los submitted son dudosos: el TMS pudo guardarlos antes de que se
+    cortara la carga. No se reenvían solos para no duplicar viajes; hay que
+    revisarlos en el TMS y marcarlos con mark_confirmed() o mark_pending().
+    """
+
+    def __init__(
+        self,
+        db_path: str = os.path.join("data", "tms_journal.db"),
+        logger: Optional[Logger] = None,
+    ):
+        self.db_path = db_path
+        self.logger = logger if logger else Logger()
+        if os.path.dirname(db_path):
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self._lock = threading.RLock()
+        # Los trabajadores de la carga en paralelo abren el mismo archivo
+        self.conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+
+    @staticmethod
+    def _now() -> str:
+        return datetime.now().isoformat(timespec="seconds")
+
+    def register(self, trip: Dict[str, Any], batch: Optional[str] = None) -> str:
+        """Registrar el viaje como pending si es nuevo; devuelve su huella."""
+        fingerprint = trip_fingerprint(trip)
+        with self._lock, self.conn:
+            self.conn.execute(
+                "INSERT OR IGNORE INTO tms_trips (fingerprint, trip, batch, created_at)"
+                " VALUES (?, ?, ?, ?)",
+                (fingerprint, json.dumps(trip, ensure_ascii=False), batch, self._now()),
+            )
+        return fingerprint
+
+    def status(self, fingerprint: str) -> Optional[str]:
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT status FROM tms_trips WHERE fingerprint=?", (fingerprint,)
+            ).fetchone()
+        return row["status"] if row else None
+
+    def mark_submitted(self, fingerprint: str):
+        with self._lock, self.conn:
+            self.conn.execute(
+                "UPDATE tms_trips SET status=?, attempts=attempts+1, submitted_at=?,"
+                " error=NULL WHERE fingerprint=?",
+                (SUBMITTED, self._now(), fingerprint),
+            )
+
+    def mark_confirmed(self, fingerprint: str):
+        with self._lock, self.conn:
+            self.conn.execute(
+                "UPDATE tms_trips SET status=?, confirmed_at=?, error=NULL"
+                " WHERE fingerprint=?",
+                (CONFIRMED, self._now(), fingerprint),
+            )
+
+    def mark_pending(self, fingerprint: str):
+        """Volver a cargar el viaje (p. ej. tras comprobar que no llegó al TMS)."""
+        with self._lock, self.conn:
+            self.conn.execute(
+                "UPDATE tms_trips SET status=? WHERE fingerprint=?",
+                (PENDING, fingerprint),
+            )
+
+    def record_error(self, fingerprint: str, error: str):
+        """Guardar el último error sin cambiar el estado."""
+        with self._lock, self.conn:
+            self.conn.execute(
+                "UPDATE tms_trips SET error=? WHERE fingerprint=?", (error, fingerprint)
+            )
+
+    def trips(
+        self, status: Optional[str] = None, batch: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """Entradas del registro {fingerprint, trip, status, attempts, error}."""
+        query = "SELECT * FROM tms_trips WHERE 1=1"
+        params: List[Any] = []
+        if status:
+            query += " AND status=?"
+            params.append(status)
+        if batch:
+            query += " AND batch=?"
+            params.append(batch)
+        with self._lock:
+            rows = self.conn.execute(query + " ORDER BY rowid", params).fetchall()
+        return [{**dict(row), "trip": json.loads(row["trip"])} for row in rows]
+
+    def summary(self, batch: Optional[str] = None) -> Dict[str, int]:
+        """Cantidad de viajes por estado."""
+        query = "SELECT status, COUNT(*) AS total FROM tms_trips"
+        params: List[Any] = []
+        if batch:
+            query += " WHERE batch=?"
+            params.append(batch)
+        with self._lock:
+            rows = self.conn.execute(query + " GROUP BY status", params).fetchall()
+        counts = {PENDING: 0, SUBMITTED: 0, CONFIRMED: 0}
+        counts.update({row["status"]: row["total"] for row in rows})
+        return counts
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
@@ -1,38 +1,86 @@
 import time
 from datetime import datetime
 from typing import Optional, Dict, Any, List
-from selenium import webdriver
 from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
-from webdriver_manager.chrome import ChromeDriverManager
+from src.utils.browser import browser_settings, create_driver
+from src.utils.browser_broker import BrowserBroker
+from src.utils.browser_waits import SmartWait
+from src.utils.form_fill import fill_form
 from src.utils.logger import Logger
 
+# Toda la tabla en una sola llamada: [encabezados, [celdas de cada fila]]. Los
+# encabezados son los th de la primera fila; las filas, las que tienen td.
+TABLE_DATA_JS = r"""
+const table = arguments[0];
+const text = (cell) => cell.innerText.trim();
+const rows = Array.from(table.rows);
+if (!rows.length) {
+    return null;
+}
+const headers = Array.from(rows[0].querySelectorAll("th"), text);
+const body = rows.slice(1).map((row) => Array.from(row.querySelectorAll("td"), text));
+return [headers, body];
+"""
+
+
+def read_table(driver, table) -> List[Dict[str, Any]]:
+    """Filas de una tabla HTML como diccionarios {encabezado: texto}.
+
+    Se lee con un solo execute_script en lugar de un find_elements por fila
+    y otro por celda, que con miles de filas tardaba minutos. Se mantiene lo
+    que hacía el recorrido anterior: las filas sin td dan {} y una tabla
+    vacía o una fila con más celdas que encabezados lanzan una excepción.
+    """
+    result = driver.execute_script(TABLE_DATA_JS, table)
+    if result is None:
+        raise ValueError("La tabla de resultados no tiene filas")
+    headers, rows = result
+    data = []
+    for cells in rows:
+        if len(cells) > len(headers):
+            raise IndexError(
+                f"Fila con {len(cells)} celdas y solo {len(headers)} encabezados"
+            )
+        data.append(dict(zip(headers, cells)))
+    return data
+
 
 class TMSManager:
-    def __init__(self):
+    def __init__(
+        self,
+        config: Optional[Dict[str, Any]] = None,
+        broker: Optional[BrowserBroker] = None,
+    ):
         self.logger = Logger()
+        self.config = config or {}
+        # Con un broker se usa una pestaña del Chrome compartido
+        self.broker = broker
         self.driver = None
         self.is_connected = False
-        self.wait = None
+        self.waits: Optional[SmartWait] = None
         self.setup_driver()
 
     def setup_driver(self):
-        """Configurar el driver de Chrome para Selenium."""
+        """Configurar el driver de Chrome para Selenium.
+
+        Las opciones salen del bloque "browser" de la configuración; por
+        defecto Chrome arranca sin interfaz y con el perfil tms_data.
+        """
         try:
-            chrome_options = Options()
-            # chrome_options.add_argument("--headless")  # Descomentar para modo sin interfaz
-            chrome_options.add_argument("--start-maximized")
-            chrome_options.add_argument("--disable-notifications")
-            chrome_options.add_argument("--disable-gpu")
-            chrome_options.add_argument("--no-sandbox")
-            chrome_options.add_argument("--disable-dev-shm-usage")
-
-            service = Service(ChromeDriverManager().install())
-            self.driver = webdriver.Chrome(service=service, options=chrome_options)
-            self.wait = WebDriverWait(self.driver, 30)
+            if self.broker:
+                self.driver = self.broker.get_driver("tms")
+                self.waits = SmartWait(self.driver, max_timeout=30, logger=self.logger)
+                self.logger.info("Driver de Chrome configurado en el navegador compartido")
+                return
+            settings = browser_settings(
+                self.config.get("browser"),
+                profile_dir="tms_data",
+                arguments=["--disable-gpu", "--no-sandbox"],
+            )
+            self.driver = create_driver(
+                settings, use_driver_manager=True, logger=self.logger
+            )
+            self.waits = SmartWait(self.driver, max_timeout=30, logger=self.logger)
             self.logger.info("Driver de Chrome configurado correctamente")
         except Exception as e:
             self.logger.error(f"Error al configurar el driver: {e}")
@@ -45,9 +93,7 @@ class TMSManager:
             self.driver.get(tms_url)
 
             # Esperar a que aparezca el formulario de login
-            username_field = self.wait.until(
-                EC.presence_of_element_located((By.NAME, "username"))
-            )
+            username_field = self.waits.until_present("login", "[name='username']")
             password_field = self.driver.find_element(By.NAME, "password")
 
             # Ingresar credenciales
@@ -61,11 +107,7 @@ class TMSManager:
             login_button.click()
 
             # Esperar a que se complete el login
-            self.wait.until(
-                EC.presence_of_element_located(
-                    (By.CSS_SELECTOR, "div[class*='dashboard']")
-                )
-            )
+            self.waits.until_present("dashboard", "div[class*='dashboard']")
 
             self.is_connected = True
             self.logger.info("Conectado al sistema TMS")
@@ -74,6 +116,21 @@ class TMSManager:
             self.logger.error(f"Error al conectar con TMS: {e}")
             return False
 
+    def _fill(self, form, values: Dict[str, Any]) -> List[str]:
+        """Rellenar el formulario en una sola llamada; devuelve los campos que faltan.
+
+        "keystroke_fields" lista campos que siempre se escriben con el teclado
+        y "fast_fill": false vuelve a escribir campo por campo.
+        """
+        return fill_form(
+            self.driver,
+            form,
+            values,
+            keystroke_fields=self.config.get("keystroke_fields", []),
+            fast=self.config.get("fast_fill", True),
+            logger=self.logger,
+        )
+
     def enter_data(self, data: Dict[str, Any]) -> bool:
         """Ingresar datos en el sistema TMS."""
         try:
@@ -85,31 +142,18 @@ class TMSManager:
             self.driver.get(f"{self.driver.current_url}/data-entry")
 
             # Esperar a que se cargue el formulario
-            form = self.wait.until(
-                EC.presence_of_element_located(
-                    (By.CSS_SELECTOR, "form[class*='data-entry']")
-                )
-            )
+            form = self.waits.until_present("formulario", "form[class*='data-entry']")
 
             # Ingresar datos en los campos correspondientes
-            for field, value in data.items():
-                try:
-                    input_field = form.find_element(By.NAME, field)
-                    input_field.clear()
-                    input_field.send_keys(str(value))
-                except:
-                    self.logger.warning(f"Campo {field} no encontrado, saltando...")
+            for field in self._fill(form, data):
+                self.logger.warning(f"Campo {field} no encontrado, saltando...")
 
             # Enviar formulario
             submit_button = form.find_element(By.CSS_SELECTOR, "button[type='submit']")
             submit_button.click()
 
             # Esperar confirmación
-            self.wait.until(
-                EC.presence_of_element_located(
-                    (By.CSS_SELECTOR, "div[class*='success-message']")
-                )
-            )
+            self.waits.until_present("confirmacion", "div[class*='success-message']")
 
             self.logger.info("Datos ingresados correctamente")
             return True
@@ -129,20 +173,9 @@ class TMSManager:
 
             # Aplicar filtros si se proporcionan
             if filters:
-                filter_form = self.wait.until(
-                    EC.presence_of_element_located(
-                        (By.CSS_SELECTOR, "form[class*='filter']")
-                    )
-                )
-                for field, value in filters.items():
-                    try:
-                        filter_field = filter_form.find_element(By.NAME, field)
-                        filter_field.clear()
-                        filter_field.send_keys(str(value))
-                    except:
-                        self.logger.warning(
-                            f"Filtro {field} no encontrado, saltando..."
-                        )
+                filter_form = self.waits.until_present("filtros", "form[class*='filter']")
+                for field in self._fill(filter_form, filters):
+                    self.logger.warning(f"Filtro {field} no encontrado, saltando...")
 
                 # Aplicar filtros
                 apply_button = filter_form.find_element(
@@ -151,23 +184,12 @@ class TMSManager:
                 apply_button.click()
 
             # Esperar a que se carguen los resultados
-            results_table = self.wait.until(
-                EC.presence_of_element_located(
-                    (By.CSS_SELECTOR, "table[class*='results']")
-                )
+            results_table = self.waits.until_present(
+                "resultados", "table[class*='results']"
             )
 
             # Extraer datos de la tabla
-            data = []
-            rows = results_table.find_elements(By.TAG_NAME, "tr")
-            headers = [th.text for th in rows[0].find_elements(By.TAG_NAME, "th")]
-
-            for row in rows[1:]:
-                cells = row.find_elements(By.TAG_NAME, "td")
-                row_data = {headers[i]: cell.text for i, cell in enumerate(cells)}
-                data.append(row_data)
-
-            return data
+            return read_table(self.driver, results_table)
         except Exception as e:
             self.logger.error(f"Error al obtener datos: {e}")
             return []
@@ -188,6 +210,8 @@ class TMSManager:
     def disconnect(self):
         """Desconectar del sistema TMS."""
         try:
+            if self.waits and self.waits.histograms():
+                self.logger.info(f"Tiempos de espera del TMS:\n{self.waits.report()}")
             if self.driver:
                 self.driver.quit()
             self.is_connected = False
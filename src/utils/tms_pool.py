@@ -0,0 +1,201 @@
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional
+from src.utils.logger import Logger
+
+# progress_callback(hechos, total, viaje, cargado); total es None si se desconoce
+ProgressCallback = Callable[[int, Optional[int], Dict[str, Any], bool], None]
+
+# Resultado de cada viaje; los dos últimos son también claves del resultado
+LOADED = "loaded"
+FAILED = "failed"
+UNCONFIRMED = "unconfirmed"
+
+
+class TMSWorkerPool:
+    """Carga de viajes en paralelo con varias sesiones del TMS.
+
+    Cada trabajador es un hilo con su propio navegador, creado por
+    loader_factory(índice), que inicia sesión una sola vez y toma viajes de
+    una cola compartida. El objeto que devuelve la fábrica debe ofrecer
+    connect() -> bool, load_trip(viaje) -> bool y disconnect(), como el
+    TMSManager de src/tasks, y puede ofrecer is_unconfirmed(viaje) -> bool.
+
+    - Reintentos: un viaje fallido se reintenta hasta max_retries veces en
+      el mismo trabajador, volviendo a iniciar sesión antes de cada intento.
+      Antes de cada intento se consulta is_unconfirmed(): un viaje que ya se
+      envió sin confirmación pudo quedar guardado en el TMS, así que no se
+      reintenta y se informa en "unconfirmed".
+    - Contrapresión: la cola admite queue_size viajes (por defecto dos por
+      trabajador); run() solo lee más viajes del iterable cuando hay sitio,
+      así que un generador sobre una planilla no se carga entero en memoria.
+    - Progreso: progress_callback se llama tras cada viaje desde el hilo del
+      trabajador; una GUI debe pasar la actualización a su propio hilo.
+
+    El número de trabajadores se limita a max_workers: cada uno es un Chrome
+    completo y el TMS puede limitar las sesiones por usuario.
+    """
+
+    def __init__(
+        self,
+        loader_factory: Callable[[int], Any],
+        workers: int = 4,
+        max_workers: int = 8,
+        max_retries: int = 2,
+        retry_delay: float = 2,
+        queue_size: Optional[int] = None,
+        progress_callback: Optional[ProgressCallback] = None,
+        logger: Optional[Logger] = None,
+    ):
+        self.loader_factory = loader_factory
+        self.workers = max(1, min(workers, max_workers))
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.queue_size = queue_size or 2 * self.workers
+        self.progress_callback = progress_callback
+        self.logger = logger if logger else Logger()
+        self._queue: "queue.Queue[Optional[Dict[str, Any]]]" = queue.Queue(
+            maxsize=self.queue_size
+        )
+        self._lock = threading.Lock()
+        self._alive = 0
+        self._total: Optional[int] = None
+        self._result: Dict[str, Any] = {}
+
+    def _report(self, index: int, trip: Dict[str, Any], status: str):
+        loaded = status == LOADED
+        with self._lock:
+            if loaded:
+                self._result["loaded"] += 1
+                self._result["per_worker"][index] += 1
+            else:
+                self._result[status].append(trip)
+            done = (
+                self._result["loaded"]
+                + len(self._result["failed"])
+                + len(self._result["unconfirmed"])
+            )
+        if self.progress_callback:
+            try:
+                self.progress_callback(done, self._total, trip, loaded)
+            except Exception as e:
+                self.logger.warning(f"Error en el aviso de progreso: {e}")
+
+    def _load(self, index: int, loader, trip: Dict[str, Any]) -> str:
+        is_unconfirmed = getattr(loader, "is_unconfirmed", None)
+        for attempt in range(1, self.max_retries + 2):
+            try:
+                if is_unconfirmed and is_unconfirmed(trip):
+                    return UNCONFIRMED
+                if loader.load_trip(trip):
+                    return LOADED
+            except Exception as e:
+                self.logger.warning(f"Trabajador TMS {index}: error al cargar viaje: {e}")
+            if attempt > self.max_retries:
+                break
+            self.logger.warning(
+                f"Trabajador TMS {index}: reintentando viaje (intento {attempt + 1})"
+            )
+            time.sleep(self.retry_delay * attempt)
+            # La sesión pudo expirar: volver a iniciarla antes de reintentar
+            loader.connect()
+        return FAILED
+
+    def _worker(self, index: int):
+        loader = None
+        try:
+            loader = self.loader_factory(index)
+            if not loader.connect():
+                self.logger.error(f"Trabajador TMS {index}: no se pudo iniciar sesión")
+                return
+            while True:
+                trip = self._queue.get()
+                try:
+                    if trip is None:
+                        return
+                    self._report(index, trip, self._load(index, loader, trip))
+                finally:
+                    self._queue.task_done()
+        except Exception as e:
+            self.logger.error(f"Trabajador TMS {index} detenido: {e}")
+        finally:
+            with self._lock:
+                self._alive -= 1
+            if loader is not None:
+                try:
+                    loader.disconnect()
+                except Exception as e:
+                    self.logger.debug(f"Error al cerrar el trabajador TMS {index}: {e}")
+
+    def _put(self, item: Optional[Dict[str, Any]]) -> bool:
+        """Encolar esperando sitio; False si ya no queda ningún trabajador."""
+        while True:
+            try:
+                self._queue.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                with self._lock:
+                    if not self._alive:
+                        return False
+
+    def run(
+        self, trips: Iterable[Dict[str, Any]], total: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """Cargar todos los viajes y esperar a que terminen los trabajadores.
+
+        Devuelve {"loaded", "failed", "unconfirmed", "per_worker", "elapsed"};
+        "failed" lleva los viajes no cargados, incluidos los que quedaron sin
+        trabajador, y "unconfirmed" los enviados sin confirmación.
+        """
+        if total is None and hasattr(trips, "__len__"):
+            total = len(trips)
+        self._total = total
+        self._result = {
+            "loaded": 0,
+            "failed": [],
+            "unconfirmed": [],
+            "per_worker": [0] * self.workers,
+        }
+        self._alive = self.workers
+        start = time.monotonic()
+        threads = [
+            threading.Thread(target=self._worker, args=(index,), name=f"tms-worker-{index}")
+            for index in range(self.workers)
+        ]
+        for thread in threads:
+            thread.start()
+
+        pending: List[Dict[str, Any]] = []
+        iterator = iter(trips)
+        for trip in iterator:
+            if not self._put(trip):
+                # Todos los trabajadores cayeron: el resto queda sin cargar
+                pending.append(trip)
+                pending.extend(iterator)
+                break
+        for _ in threads:
+            if not self._put(None):
+                break
+        for thread in threads:
+            thread.join()
+
+        # Viajes que quedaron en la cola al caer el último trabajador
+        while True:
+            try:
+                trip = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if trip is not None:
+                pending.append(trip)
+        for trip in pending:
+            self._report(-1, trip, FAILED)
+
+        self._result["elapsed"] = time.monotonic() - start
+        self.logger.info(
+            f"Carga en paralelo ({self.workers} trabajadores): "
+            f"{self._result['loaded']} viajes cargados, "
+            f"{len(self._result['failed'])} fallidos, "
+            f"{len(self._result['unconfirmed'])} sin confirmar en {self._result['elapsed']:.1f} s"
+        )
+        return self._result
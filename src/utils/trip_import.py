@@ -0,0 +1,238 @@
+import csv
+import os
+import re
+import unicodedata
+from datetime import date, datetime
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from openpyxl import load_workbook
+from src.utils.logger import Logger
+
+# Campo del formulario del TMS -> cómo se obtiene de la planilla.
+#   columns:  encabezados aceptados (sin distinguir mayúsculas ni acentos)
+#   required: la fila se rechaza si falta el valor
+#   type:     str, date, int o float
+#   pattern:  expresión regular que debe cumplir el valor ya convertido
+#   upper:    pasar a mayúsculas (patentes, códigos)
+#   default:  valor si la columna no existe o la celda está vacía
+DEFAULT_TRIP_MAPPING: Dict[str, Dict[str, Any]] = {
+    "origin": {"columns": ["origen", "origin", "desde"], "required": True},
+    "destination": {"columns": ["destino", "destination", "hasta"], "required": True},
+    "date": {
+        "columns": ["fecha", "fecha de carga", "date"],
+        "type": "date",
+        "required": True,
+    },
+    "driver": {"columns": ["conductor", "chofer", "driver"]},
+    "vehicle": {
+        "columns": ["patente", "vehiculo", "dominio", "vehicle"],
+        "pattern": r"^[A-Z0-9 -]{5,10}$",
+        "upper": True,
+    },
+}
+
+DATE_FORMATS = ("%Y-%m-%d", "%d/%m/%Y", "%d-%m-%Y", "%d/%m/%y", "%d.%m.%Y")
+CSV_EXTENSIONS = (".csv", ".txt")
+EXCEL_EXTENSIONS = (".xlsx", ".xlsm")
+
+
+def normalize_header(value: Any) -> str:
+    """Encabezado en minúsculas, sin acentos y con espacios simples."""
+    value = unicodedata.normalize("NFKD", str(value or "").casefold())
+    value = "".join(char for char in value if not unicodedata.combining(char))
+    return " ".join(value.replace("_", " ").split())
+
+
+def _iter_csv(path: str) -> Iterator[List[Any]]:
+    # utf-8-sig quita el BOM que añade Excel al exportar a CSV
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        sample = f.read(4096)
+        f.seek(0)
+        try:
+            dialect = csv.Sniffer().sniff(sample, delimiters=",;\t")
+        except csv.Error:
+            dialect = csv.excel
+        yield from csv.reader(f, dialect)
+
+
+def _iter_xlsx(path: str, sheet: Optional[str]) -> Iterator[Tuple[Any, ...]]:
+    # read_only recorre la hoja sin cargarla entera en memoria
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        worksheet = workbook[sheet] if sheet else workbook.active
+        yield from worksheet.iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+
+def iter_sheet_rows(path: str, sheet: Optional[str] = None) -> Iterator[Any]:
+    """Filas de una planilla CSV o XLSX, una a una y sin cargar el archivo entero."""
+    extension = os.path.splitext(path)[1].lower()
+    if extension in CSV_EXTENSIONS:
+        return _iter_csv(path)
+    if extension in EXCEL_EXTENSIONS:
+        return _iter_xlsx(path, sheet)
+    raise ValueError(f"Formato de planilla no admitido: {extension or path}")
+
+
+def _is_empty(value: Any) -> bool:
+    return value is None or (isinstance(value, str) and not value.strip())
+
+
+def convert_value(value: Any, kind: str) -> Any:
+    """Convertir una celda al tipo del campo; lanza ValueError si no se puede."""
+    if kind == "date":
+        if isinstance(value, datetime):
+            return value.date().isoformat()
+        if isinstance(value, date):
+            return value.isoformat()
+        text = str(value).strip()
+        for date_format in DATE_FORMATS:
+            try:
+                return datetime.strptime(text, date_format).date().isoformat()
+            except ValueError:
+                continue
+        raise ValueError(f"fecha no válida '{text}'")
+    if kind in ("int", "float"):
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            number = value
+        else:
+            text = str(value).strip().replace(" ", "")
+            # Formato español: 1.234,5
+            if "," in text:
+                text = text.replace(".", "").replace(",", ".")
+            try:
+                number = float(text)
+            except ValueError:
+                raise ValueError(f"número no válido '{value}'") from None
+        if kind == "int":
+            if number != int(number):
+                raise ValueError(f"se esperaba un entero y hay '{value}'")
+            return int(number)
+        return float(number)
+    if isinstance(value, float) and value.is_integer():
+        # Excel guarda los códigos numéricos como 1234.0
+        value = int(value)
+    return " ".join(str(value).split())
+
+
+class TripImporter:
+    """Importador de viajes desde planillas CSV o XLSX de los transportistas.
+
+    La planilla se lee fila a fila (openpyxl en modo read_only para XLSX) y
+    cada fila se convierte en un diccionario {campo del TMS: valor} según un
+    mapeo declarativo (ver DEFAULT_TRIP_MAPPING), que puede ampliarse o
+    sustituirse desde la clave "import_mapping" de tms_config.json.
+
+    validate() recorre el archivo completo antes de cargar nada y devuelve
+    las filas rechazadas con su motivo; trips() vuelve a recorrerlo y entrega
+    solo las filas válidas, de modo que la memoria no crece con el tamaño
+    de la planilla.
+    """
+
+    def __init__(
+        self,
+        mapping: Optional[Dict[str, Dict[str, Any]]] = None,
+        sheet: Optional[str] = None,
+        logger: Optional[Logger] = None,
+    ):
+        self.mapping = mapping or DEFAULT_TRIP_MAPPING
+        self.sheet = sheet
+        self.logger = logger if logger else Logger()
+        self._patterns = {
+            field: re.compile(spec["pattern"])
+            for field, spec in self.mapping.items()
+            if spec.get("pattern")
+        }
+
+    def _locate_columns(self, header: Iterable[Any]) -> Dict[str, int]:
+        """Índice de columna de cada campo; ValueError si falta una obligatoria."""
+        positions = {normalize_header(name): index for index, name in enumerate(header)}
+        columns, missing = {}, []
+        for field, spec in self.mapping.items():
+            aliases = [normalize_header(alias) for alias in spec.get("columns", [field])]
+            index = next((positions[a] for a in aliases if a in positions), None)
+            if index is not None:
+                columns[field] = index
+            elif spec.get("required") and "default" not in spec:
+                missing.append(f"{field} ({', '.join(spec.get('columns', [field]))})")
+        if missing:
+            raise ValueError(f"Faltan columnas en la planilla: {'; '.join(missing)}")
+        return columns
+
+    def convert_row(
+        self, row: Any, columns: Dict[str, int]
+    ) -> Tuple[Dict[str, Any], List[str]]:
+        """Convertir una fila en un viaje; devuelve (viaje, errores)."""
+        trip, errors = {}, []
+        for field, spec in self.mapping.items():
+            index = columns.get(field)
+            value = row[index] if index is not None and index < len(row) else None
+            if _is_empty(value):
+                if "default" in spec:
+                    trip[field] = spec["default"]
+                elif spec.get("required"):
+                    errors.append(f"falta {field}")
+                continue
+            try:
+                value = convert_value(value, spec.get("type", "str"))
+            except ValueError as e:
+                errors.append(f"{field}: {e}")
+                continue
+            if spec.get("upper") and isinstance(value, str):
+                value = value.upper()
+            pattern = self._patterns.get(field)
+            if pattern and not pattern.match(str(value)):
+                errors.append(f"{field}: formato no válido '{value}'")
+                continue
+            trip[field] = value
+        return trip, errors
+
+    def rows(self, path: str) -> Iterator[Tuple[int, Dict[str, Any], List[str]]]:
+        """(número de fila, viaje, errores) por cada fila no vacía de la planilla.
+
+        El encabezado es la primera fila con contenido; los números de fila
+        son los que ve el usuario en la planilla (empiezan en 1).
+        """
+        columns = None
+        for number, row in enumerate(iter_sheet_rows(path, self.sheet), start=1):
+            if all(_is_empty(value) for value in row):
+                continue
+            if columns is None:
+                columns = self._locate_columns(row)
+                continue
+            trip, errors = self.convert_row(row, columns)
+            yield number, trip, errors
+        if columns is None:
+            raise ValueError(f"La planilla {path} está vacía")
+
+    def validate(
+        self, path: str, pending: Optional[Callable[[Dict[str, Any]], bool]] = None
+    ) -> Dict[str, Any]:
+        """Revisar toda la planilla sin cargar nada.
+
+        Devuelve {"valid": n, "invalid": [{"row", "errors"}], "total": n}. Con
+        pending, en la misma pasada se cuentan en "pending" los viajes válidos
+        para los que pending(viaje) es verdadero.
+        """
+        valid, invalid, waiting = 0, [], 0
+        for number, trip, errors in self.rows(path):
+            if errors:
+                invalid.append({"row": number, "errors": errors})
+            else:
+                valid += 1
+                if pending and pending(trip):
+                    waiting += 1
+        self.logger.info(
+            f"Planilla {os.path.basename(path)}: {valid} viajes válidos,"
+            f" {len(invalid)} filas rechazadas"
+        )
+        report = {"valid": valid, "invalid": invalid, "total": valid + len(invalid)}
+        if pending:
+            report["pending"] = waiting
+        return report
+
+    def trips(self, path: str) -> Iterator[Dict[str, Any]]:
+        """Solo los viajes válidos, en el orden de la planilla."""
+        for _, trip, errors in self.rows(path):
+            if not errors:
+                yield trip
@@ -0,0 +1,186 @@
+import difflib
+import os
+import re
+import sqlite3
+import threading
+import unicodedata
+from datetime import datetime
+from typing import Iterable, List, Optional
+from src.utils.logger import Logger
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS chats (
+    key TEXT PRIMARY KEY,
+    title TEXT NOT NULL,
+    is_phone INTEGER NOT NULL DEFAULT 0,
+    resolved_at TEXT,
+    hits INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_chats_title ON chats (title);
+"""
+
+# Un contacto con al menos 7 dígitos y solo separadores se trata como teléfono
+PHONE_PATTERN = re.compile(r"^\+?[\d\s().-]{7,}$")
+# Diferencia mínima de similitud entre el mejor candidato y el segundo
+AMBIGUITY_MARGIN = 0.05
+
+
+def normalize_contact(value: str) -> str:
+    """Clave de búsqueda: dígitos para teléfonos; para nombres, minúsculas sin
+    acentos y con espacios simples."""
+    value = value.strip()
+    if PHONE_PATTERN.match(value):
+        return re.sub(r"\D", "", value)
+    value = unicodedata.normalize("NFKD", value.casefold())
+    value = "".join(char for char in value if not unicodedata.combining(char))
+    return " ".join(value.split())
+
+
+def best_match(
+    query: str, candidates: Iterable[str], cutoff: float = 0.8
+) -> Optional[str]:
+    """Candidato que mejor coincide con query, o None si no hay uno claro.
+
+    Se acepta una coincidencia exacta, la única cuyo nombre empieza por las
+    palabras de query ("juan" -> "Juan Pérez") o la de mayor similitud por
+    encima de cutoff con ventaja clara sobre la siguiente. Los números del
+    nombre deben coincidir: "Operador 13" nunca se resuelve a "Operador 1".
+    """
+    key = normalize_contact(query)
+    if not key:
+        return None
+    normalized = {}
+    for candidate in candidates:
+        normalized.setdefault(normalize_contact(candidate), candidate)
+    if key in normalized:
+        return normalized[key]
+
+    words = key.split()
+    prefixed = [
+        candidate
+        for name, candidate in normalized.items()
+        if len(name.split()) >= len(words)
+        and all(
+            part == word if word.isdigit() else part.startswith(word)
+            for word, part in zip(words, name.split())
+        )
+    ]
+    if prefixed:
+        return prefixed[0] if len(prefixed) == 1 else None
+
+    digits = re.findall(r"\d+", key)
+    scored = sorted(
+        (
+            (difflib.SequenceMatcher(None, key, name).ratio(), candidate)
+            for name, candidate in normalized.items()
+            if re.findall(r"\d+", name) == digits
+        ),
+        reverse=True,
+    )
+    if not scored or scored[0][0] < cutoff:
+        return None
+    if len(scored) > 1 and scored[0][0] - scored[1][0] < AMBIGUITY_MARGIN:
+        return None
+    return scored[0][1]
+
+
+class ChatDirectory:
+    """Caché persistente en SQLite de contacto -> título del chat de WhatsApp.
+
+    Guarda los nombres y teléfonos con los que se ha abierto cada chat para
+    localizarlo después en la lista sin pasar por el buscador. Los nombres
+    admiten coincidencia aproximada; los teléfonos solo exacta. Cuando un
+    título guardado ya no lleva al chat, invalidate() borra todas sus
+    entradas.
+    """
+
+    def __init__(
+        self,
+        db_path: str = os.path.join("data", "whatsapp.db"),
+        cutoff: float = 0.8,
+        logger: Optional[Logger] = None,
+    ):
+        self.db_path = db_path
+        self.cutoff = cutoff
+        self.logger = logger if logger else Logger()
+        if os.path.dirname(db_path):
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self._lock = threading.RLock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+
+    def resolve(self, contact: str) -> Optional[str]:
+        """Título del chat guardado para contact, exacto o aproximado."""
+        key = normalize_contact(contact)
+        if not key:
+            return None
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT title FROM chats WHERE key=?", (key,)
+            ).fetchone()
+            if row:
+                title = row["title"]
+            elif PHONE_PATTERN.match(contact.strip()):
+                return None
+            else:
+                names = [
+                    row["key"]
+                    for row in self.conn.execute(
+                        "SELECT key FROM chats WHERE is_phone=0"
+                    )
+                ]
+                match = best_match(key, names, self.cutoff)
+                if not match:
+                    return None
+                title = self.conn.execute(
+                    "SELECT title FROM chats WHERE key=?", (match,)
+                ).fetchone()["title"]
+                key = match
+            with self.conn:
+                self.conn.execute("UPDATE chats SET hits = hits + 1 WHERE key=?", (key,))
+        return title
+
+    def remember(self, contact: str, title: str):
+        """Guardar que contact abre el chat con ese título."""
+        key = normalize_contact(contact)
+        if not key:
+            return
+        with self._lock, self.conn:
+            self.conn.execute(
+                "INSERT INTO chats (key, title, is_phone, resolved_at) VALUES (?, ?, ?, ?)"
+                " ON CONFLICT(key) DO UPDATE SET title=excluded.title,"
+                " resolved_at=excluded.resolved_at",
+                (
+                    key,
+                    title,
+                    int(bool(PHONE_PATTERN.match(contact.strip()))),
+                    datetime.now().isoformat(timespec="seconds"),
+                ),
+            )
+
+    def invalidate(self, contact_or_title: str):
+        """Olvidar un contacto y todas las entradas que apuntan a su chat."""
+        key = normalize_contact(contact_or_title)
+        with self._lock, self.conn:
+            row = self.conn.execute(
+                "SELECT title FROM chats WHERE key=?", (key,)
+            ).fetchone()
+            titles = {contact_or_title} | ({row["title"]} if row else set())
+            self.conn.execute("DELETE FROM chats WHERE key=?", (key,))
+            self.conn.executemany(
+                "DELETE FROM chats WHERE title=?", [(title,) for title in titles]
+            )
+        self.logger.info(f"Entrada de chat invalidada: {contact_or_title}")
+
+    def titles(self) -> List[str]:
+        with self._lock:
+            return [
+                row["title"]
+                for row in self.conn.execute("SELECT DISTINCT title FROM chats")
+            ]
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
@@ -1,140 +1,337 @@
+import threading
 import time
 from datetime import datetime
-from typing import Optional, Dict, Any, List
-from selenium import webdriver
+from typing import Optional, Dict, Any, Iterable, List
+from selenium.common.exceptions import WebDriverException
 from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.common.keys import Keys
 from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
-from webdriver_manager.chrome import ChromeDriverManager
+from src.utils.browser import (
+    browser_settings,
+    create_driver,
+    has_saved_session,
+    mark_session,
+)
+from src.utils.browser_broker import BrowserBroker
+from src.utils.browser_waits import SmartWait
 from src.utils.logger import Logger
+from src.utils.whatsapp_scripts import (
+    AUTHOR_SELECTOR,
+    CHAT_CELL_SELECTOR,
+    CHAT_TITLE_SELECTOR,
+    QR_CODE_SELECTOR,
+    SEARCH_BOX_SELECTOR,
+    MessageCapture,
+    extract_messages,
+)
+from src.utils.whatsapp_queue import OutboundWhatsAppQueue, WhatsAppSendJob
+
+# Mensajes recibidos y su texto en el DOM de WhatsApp Web
+INCOMING_SELECTOR = "div[class*='message-in']"
+SELECTABLE_TEXT_SELECTOR = "span[class*='selectable-text']"
+COMPOSE_BOX_SELECTOR = "div[title='Type a message']"
+# Solo aparece con la sesión iniciada
+LOGGED_IN_SELECTOR = "div[title='Menu']"
 
 
 class WhatsAppManager:
-    def __init__(self):
+    def __init__(
+        self,
+        config: Optional[Dict[str, Any]] = None,
+        driver=None,
+        broker: Optional[BrowserBroker] = None,
+    ):
         self.logger = Logger()
-        self.driver = None
+        self.config = config or {}
+        self.url = self.config.get("url", "https://web.whatsapp.com")
+        self.chat_url = self.config.get(
+            "chat_url", "https://web.whatsapp.com/send?phone={phone}"
+        )
+        # Cambiar de chat desde el buscador en lugar de recargar la página
+        self.in_app_navigation = self.config.get("in_app_navigation", True)
+        self.search_timeout = self.config.get("search_timeout", 3)
+        self.navigation_counts = {"in_app": 0, "url": 0}
+        self.driver = driver
+        self.profile_dir: Optional[str] = None
+        self.headless = False
         self.is_connected = False
         self.last_message_time = None
-        self.wait = None
-        self.setup_driver()
+        self.waits: Optional[SmartWait] = None
+        self.capture: Optional[MessageCapture] = None
+        self.outbox: Optional[OutboundWhatsAppQueue] = None
+        # El hilo de la cola de salida y los lectores comparten el driver
+        self._driver_lock = threading.RLock()
+        self.current_chat: Optional[str] = None
+        # Con un broker se usa una pestaña del Chrome compartido
+        self.broker = broker
+        if driver is None:
+            self.setup_driver()
+        else:
+            self.waits = SmartWait(self.driver, max_timeout=30, logger=self.logger)
 
     def setup_driver(self):
-        """Configurar el driver de Chrome para Selenium."""
+        """Configurar el driver de Chrome para Selenium.
+
+        Las opciones salen del bloque "browser" de la configuración. Por
+        defecto se usa el perfil whatsapp_data y Chrome arranca sin interfaz
+        solo si en ese perfil ya se inició sesión (ver has_saved_session):
+        mientras tanto hay que ver el código QR.
+        """
         try:
-            chrome_options = Options()
-            # chrome_options.add_argument("--headless")  # Descomentar para modo sin interfaz
-            chrome_options.add_argument("--start-maximized")
-            chrome_options.add_argument("--disable-notifications")
-            chrome_options.add_argument("--disable-gpu")
-            chrome_options.add_argument("--no-sandbox")
-            chrome_options.add_argument("--disable-dev-shm-usage")
-
-            service = Service(ChromeDriverManager().install())
-            self.driver = webdriver.Chrome(service=service, options=chrome_options)
-            self.wait = WebDriverWait(self.driver, 30)
+            if self.broker:
+                self.driver = self.broker.get_driver("whatsapp")
+                self.profile_dir = self.broker.settings["profile_dir"]
+                self.headless = self.broker.settings["headless"]
+                self.waits = SmartWait(self.driver, max_timeout=30, logger=self.logger)
+                self.logger.info("Driver de Chrome configurado en el navegador compartido")
+                return
+            browser_config = self.config.get("browser", {})
+            profile_dir = browser_config.get("profile_dir", "whatsapp_data")
+            settings = browser_settings(
+                browser_config,
+                profile_dir=profile_dir,
+                headless=has_saved_session(profile_dir, "whatsapp"),
+                arguments=["--disable-gpu", "--no-sandbox"],
+            )
+            self.profile_dir = profile_dir
+            self.headless = settings["headless"]
+            self.driver = create_driver(
+                settings, use_driver_manager=True, logger=self.logger
+            )
+            self.waits = SmartWait(self.driver, max_timeout=30, logger=self.logger)
             self.logger.info("Driver de Chrome configurado correctamente")
         except Exception as e:
             self.logger.error(f"Error al configurar el driver: {e}")
             raise
 
     def connect(self) -> bool:
-        """Conectar con WhatsApp Web."""
+        """Conectar con WhatsApp Web.
+
+        Con la sesión guardada en el perfil no aparece el código QR y se entra
+        directamente; si aparece, se espera a que el usuario lo escanee.
+        """
         try:
-            self.driver.get("https://web.whatsapp.com")
-            # Esperar a que aparezca el código QR
-            qr_code = self.wait.until(
-                EC.presence_of_element_located(
-                    (By.CSS_SELECTOR, "canvas[aria-label='Scan me!']")
-                )
+            self.driver.get(self.url)
+            # Código QR o sesión ya iniciada; depende de una persona, así que
+            # el plazo no se ajusta
+            screen = self.waits.until_present(
+                "pantalla_inicial",
+                f"{QR_CODE_SELECTOR}, {LOGGED_IN_SELECTOR}",
+                adaptive=False,
             )
-            self.logger.info("Código QR detectado. Por favor, escanea con tu teléfono.")
+            if screen.tag_name == "canvas":
+                # La sesión caducó o nunca se completó: hace falta el QR
+                mark_session(self.profile_dir, "whatsapp", active=False)
+                if self.headless:
+                    return self._connect_with_window()
+                self.logger.info("Código QR detectado. Por favor, escanea con tu teléfono.")
 
-            # Esperar a que el usuario escanee el código QR
-            self.wait.until(
-                EC.presence_of_element_located((By.CSS_SELECTOR, "div[title='Menu']"))
-            )
+                # Esperar a que el usuario escanee el código QR
+                self.waits.until_present("inicio_sesion", LOGGED_IN_SELECTOR, adaptive=False)
 
+            mark_session(self.profile_dir, "whatsapp")
             self.is_connected = True
+            self.capture = MessageCapture(
+                self.driver,
+                INCOMING_SELECTOR,
+                AUTHOR_SELECTOR,
+                SELECTABLE_TEXT_SELECTOR,
+                logger=self.logger,
+            )
+            self.capture.install()
             self.logger.info("Conectado a WhatsApp Web")
             return True
         except Exception as e:
             self.logger.error(f"Error al conectar con WhatsApp: {e}")
             return False
 
-    def send_message(self, phone: str, message: str) -> bool:
-        """Enviar mensaje a un número de teléfono."""
+    def _connect_with_window(self) -> bool:
+        """Reiniciar Chrome con interfaz para que se pueda escanear el código QR."""
+        if self.broker:
+            # El Chrome compartido no puede cambiar de modo sin cerrar las
+            # demás pestañas; el próximo arranque ya tendrá interfaz
+            self.logger.error(
+                "WhatsApp Web pide el código QR y Chrome no tiene interfaz. "
+                "Reinicia el asistente para escanearlo."
+            )
+            return False
+        self.logger.warning(
+            "WhatsApp Web pide el código QR; reiniciando Chrome con interfaz."
+        )
         try:
+            self.driver.quit()
+        except Exception as e:
+            self.logger.debug(f"Error al cerrar el driver: {e}")
+        self.setup_driver()
+        if self.headless:
+            # "headless": true en la configuración manda sobre el perfil
+            self.logger.error(
+                "La configuración fuerza Chrome sin interfaz; no se puede mostrar el QR."
+            )
+            return False
+        return self.connect()
+
+    @staticmethod
+    def _normalize_phone(phone: str) -> str:
+        """Número con el prefijo + que espera la URL de los chats."""
+        phone = phone.strip()
+        return phone if phone.startswith("+") else "+" + phone
+
+    def open_chat(self, phone: str):
+        """Abrir el chat de un número; lanza una excepción si no carga.
+
+        Primero se intenta desde el buscador, dentro de la aplicación ya
+        cargada; la URL del chat queda como alternativa.
+        """
+        with self._driver_lock:
             if not self.is_connected:
                 if not self.connect():
-                    return False
+                    raise RuntimeError("No se pudo conectar con WhatsApp Web")
 
-            # Asegurarse de que el número tenga el formato correcto
-            if not phone.startswith("+"):
-                phone = "+" + phone
+            phone = self._normalize_phone(phone)
+            self.current_chat = None
+            if self.in_app_navigation and self._open_chat_in_app(phone):
+                self.navigation_counts["in_app"] += 1
+            else:
+                self._open_chat_by_url(phone)
+                self.navigation_counts["url"] += 1
+            self.current_chat = phone
 
-            # Abrir chat con el número
-            chat_url = f"https://web.whatsapp.com/send?phone={phone[1:]}"
-            self.driver.get(chat_url)
+    def _open_chat_in_app(self, phone: str) -> bool:
+        """Abrir el chat con el buscador de la aplicación ya cargada.
 
-            # Esperar a que se cargue el chat
-            message_box = self.wait.until(
-                EC.presence_of_element_located(
-                    (By.CSS_SELECTOR, "div[title='Type a message']")
+        No recarga WhatsApp Web ni repite su sincronización inicial. Solo se
+        acepta un resultado único; con ninguno o varios se devuelve False
+        para que se use la URL del chat.
+        """
+        try:
+            search_box = self.driver.find_element(By.CSS_SELECTOR, SEARCH_BOX_SELECTOR)
+            search_box.click()
+            search_box.send_keys(Keys.CONTROL, "a")
+            search_box.send_keys(Keys.BACKSPACE)
+            previous = self.driver.find_elements(By.CSS_SELECTOR, CHAT_CELL_SELECTOR)
+            search_box.send_keys(phone[1:])
+            # Esperar a que la lista se vuelva a pintar con los resultados
+            if previous:
+                self.waits.until(
+                    "busqueda", EC.staleness_of(previous[0]), timeout=self.search_timeout
                 )
+            cells = self.driver.find_elements(By.CSS_SELECTOR, CHAT_CELL_SELECTOR)
+            if len(cells) != 1:
+                return False
+
+            title = cells[0].find_element(By.CSS_SELECTOR, "span[title]").get_attribute(
+                "title"
+            )
+            cells[0].click()
+            # La cabecera confirma que se abrió el chat elegido
+            self.waits.until_present(
+                "cabecera_chat", CHAT_TITLE_SELECTOR, text=title, timeout=self.search_timeout
+            )
+            self.waits.until_present(
+                "cuadro_mensaje", COMPOSE_BOX_SELECTOR, timeout=self.search_timeout
             )
+            return True
+        except WebDriverException as e:
+            self.logger.debug(f"No se pudo abrir {phone} desde el buscador: {e}")
+            return False
+
+    def _open_chat_by_url(self, phone: str):
+        """Abrir el chat navegando a su URL; recarga toda la aplicación."""
+        self.driver.get(self.chat_url.format(phone=phone[1:]))
 
-            # Enviar el mensaje
+        # Esperar a que se cargue el chat
+        self.waits.until_present("chat_por_url", COMPOSE_BOX_SELECTOR)
+
+        # La navegación recargó la página: volver a instalar la captura
+        self.capture.install()
+
+    def type_message(self, phone: str, message: str):
+        """Escribir y enviar un mensaje en el chat de phone.
+
+        Si otro hilo cambió de chat entretanto, se vuelve a abrir el correcto.
+        """
+        with self._driver_lock:
+            phone = self._normalize_phone(phone)
+            if self.current_chat != phone:
+                self.open_chat(phone)
+            message_box = self.driver.find_element(
+                By.CSS_SELECTOR, COMPOSE_BOX_SELECTOR
+            )
             message_box.send_keys(message)
             send_button = self.driver.find_element(
                 By.CSS_SELECTOR, "span[data-icon='send']"
             )
             send_button.click()
-
             self.last_message_time = datetime.now()
-            self.logger.info(f"Mensaje enviado a {phone}")
-            return True
-        except Exception as e:
-            self.logger.error(f"Error al enviar mensaje: {e}")
-            return False
+
+    def _get_outbox(self) -> OutboundWhatsAppQueue:
+        """Crear bajo demanda la cola de salida y su hilo de envío."""
+        if self.outbox is None:
+            outbox_config = self.config.get("outbox", {})
+            self.outbox = OutboundWhatsAppQueue(
+                self,
+                messages_per_minute=outbox_config.get("messages_per_minute", 20),
+                max_retries=outbox_config.get("max_retries", 3),
+                retry_delay=outbox_config.get("retry_delay", 5),
+                batch_window=outbox_config.get("batch_window", 0.5),
+                logger=self.logger,
+            )
+        return self.outbox
+
+    def send_message(self, phone: str, message: str, wait: bool = True) -> bool:
+        """Enviar mensaje a un número de teléfono.
+
+        El mensaje pasa por la cola de salida; con wait=False se devuelve en
+        cuanto queda encolado.
+        """
+        self.logger.info(f"Encolando mensaje para {phone}")
+        job = self._get_outbox().enqueue(self._normalize_phone(phone), message)
+        return job.wait() if wait else True
+
+    def send_many(self, messages: Iterable[Dict[str, str]]) -> List[WhatsAppSendJob]:
+        """Encolar varios mensajes ({'phone', 'message'}) sin bloquear.
+
+        Los mensajes de un mismo número se envían abriendo su chat una sola
+        vez; cada WhatsAppSendJob permite consultar o esperar el resultado.
+        """
+        return self._get_outbox().send_many(
+            (self._normalize_phone(msg["phone"]), msg["message"]) for msg in messages
+        )
 
     def read_last_messages(self, phone: str, count: int = 5) -> List[str]:
         """Leer los últimos mensajes de un chat específico."""
         try:
-            if not self.is_connected:
-                if not self.connect():
-                    return []
+            with self._driver_lock:
+                self.open_chat(phone)
 
-            # Abrir chat con el número
-            chat_url = f"https://web.whatsapp.com/send?phone={phone[1:]}"
-            self.driver.get(chat_url)
-
-            # Esperar a que se cargue el chat
-            self.wait.until(
-                EC.presence_of_element_located(
-                    (By.CSS_SELECTOR, "div[title='Type a message']")
+                # Obtener solo los últimos mensajes en una sola llamada al navegador
+                messages = extract_messages(
+                    self.driver,
+                    INCOMING_SELECTOR,
+                    AUTHOR_SELECTOR,
+                    SELECTABLE_TEXT_SELECTOR,
+                    limit=count,
                 )
-            )
-
-            # Obtener los mensajes
-            messages = []
-            message_elements = self.driver.find_elements(
-                By.CSS_SELECTOR, "div[class*='message-in']"
-            )
+            return [message["text"] for message in messages]
+        except Exception as e:
+            self.logger.error(f"Error al leer mensajes: {e}")
+            return []
 
-            for element in message_elements[-count:]:
-                try:
-                    message_text = element.find_element(
-                        By.CSS_SELECTOR, "span[class*='selectable-text']"
-                    ).text
-                    messages.append(message_text)
-                except:
-                    continue
+    def read_new_messages(self) -> List[Dict[str, Any]]:
+        """Mensajes recibidos en el chat abierto desde la última lectura.
 
-            return messages
+        Se vacía el búfer del MutationObserver inyectado en la página, por lo
+        que el coste depende de los mensajes nuevos y no del historial.
+        """
+        try:
+            with self._driver_lock:
+                if not self.is_connected:
+                    if not self.connect():
+                        return []
+                return self.capture.drain()
         except Exception as e:
-            self.logger.error(f"Error al leer mensajes: {e}")
+            self.logger.error(f"Error al leer mensajes nuevos: {e}")
             return []
 
     def is_online(self) -> bool:
@@ -151,6 +348,11 @@ class WhatsAppManager:
     def disconnect(self):
         """Desconectar de WhatsApp Web."""
         try:
+            if self.outbox:
+                self.outbox.stop(timeout=30)
+                self.outbox = None
+            if self.waits and self.waits.histograms():
+                self.logger.info(f"Tiempos de espera de WhatsApp:\n{self.waits.report()}")
             if self.driver:
                 self.driver.quit()
             self.is_connected = False
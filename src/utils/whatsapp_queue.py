@@ -0,0 +1,185 @@
+import queue
+import threading
+import time
+from collections import OrderedDict
+from typing import Iterable, List, Optional, Tuple
+from src.utils.logger import Logger
+
+
+class WhatsAppSendJob:
+    """Resguardo de un mensaje de WhatsApp encolado; permite esperar su resultado."""
+
+    PENDING, SENT, FAILED = "pending", "sent", "failed"
+
+    def __init__(self, phone: str, message: str):
+        self.phone = phone
+        self.message = message
+        self.status = self.PENDING
+        self.error: Optional[Exception] = None
+        self.attempts = 0
+        self._done = threading.Event()
+
+    def _finish(self, status: str, error: Optional[Exception] = None):
+        self.status = status
+        self.error = error
+        self._done.set()
+
+    @property
+    def done(self) -> bool:
+        return self._done.is_set()
+
+    @property
+    def succeeded(self) -> bool:
+        return self.status == self.SENT
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Esperar a que termine el envío. Devuelve True si se envió."""
+        self._done.wait(timeout)
+        return self.succeeded
+
+
+class OutboundWhatsAppQueue:
+    """Cola de mensajes de WhatsApp drenada por un hilo en segundo plano.
+
+    Los llamadores reciben un WhatsAppSendJob inmediatamente. El hilo recoge
+    los mensajes que llegan dentro de batch_window segundos, los agrupa por
+    teléfono para abrir cada chat una sola vez, respeta un máximo de
+    messages_per_minute envíos y reintenta los fallos reabriendo el chat.
+
+    sender debe ofrecer open_chat(phone) y type_message(phone, text); ambos
+    lanzan una excepción si no pudieron completar la operación.
+    """
+
+    def __init__(
+        self,
+        sender,
+        messages_per_minute: float = 20,
+        max_retries: int = 3,
+        retry_delay: float = 5,
+        batch_window: float = 0.5,
+        logger: Optional[Logger] = None,
+    ):
+        self.sender = sender
+        self.min_interval = 60 / messages_per_minute if messages_per_minute else 0
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.batch_window = batch_window
+        self.logger = logger if logger else Logger()
+        self._queue: "queue.Queue[Optional[WhatsAppSendJob]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._last_send = 0.0
+        self.chats_opened = 0
+
+    def _ensure_worker(self):
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(
+                target=self._worker, name="whatsapp-outbox", daemon=True
+            )
+            self._thread.start()
+
+    def enqueue(self, phone: str, message: str) -> WhatsAppSendJob:
+        job = WhatsAppSendJob(phone, message)
+        self._queue.put(job)
+        self._ensure_worker()
+        return job
+
+    def send_many(self, messages: Iterable[Tuple[str, str]]) -> List[WhatsAppSendJob]:
+        """Encolar pares (teléfono, mensaje)."""
+        return [self.enqueue(phone, message) for phone, message in messages]
+
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Esperar a que se vacíe la cola. Devuelve False si venció el tiempo."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if deadline is not None and time.monotonic() > deadline:
+                return False
+            time.sleep(0.05)
+        return True
+
+    def stop(self, timeout: Optional[float] = None):
+        """Enviar lo pendiente y detener el hilo."""
+        if self._thread and self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join(timeout)
+        self._thread = None
+
+    def _collect(self, first: WhatsAppSendJob) -> Tuple[List[WhatsAppSendJob], bool]:
+        """Reunir los mensajes que llegan durante batch_window tras el primero.
+
+        Devuelve el lote y si se recibió la señal de parada.
+        """
+        batch = [first]
+        deadline = time.monotonic() + self.batch_window
+        while True:
+            remaining = deadline - time.monotonic()
+            try:
+                job = (
+                    self._queue.get(timeout=remaining)
+                    if remaining > 0
+                    else self._queue.get_nowait()
+                )
+            except queue.Empty:
+                return batch, False
+            if job is None:
+                return batch, True
+            batch.append(job)
+
+    def _worker(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                self._queue.task_done()
+                return
+            batch, stopping = self._collect(job)
+            try:
+                # Agrupar por teléfono conservando el orden de llegada de cada chat
+                by_phone: "OrderedDict[str, List[WhatsAppSendJob]]" = OrderedDict()
+                for item in batch:
+                    by_phone.setdefault(item.phone, []).append(item)
+                for phone, jobs in by_phone.items():
+                    self._deliver_chat(phone, jobs)
+            finally:
+                for _ in range(len(batch) + (1 if stopping else 0)):
+                    self._queue.task_done()
+            if stopping:
+                return
+
+    def _throttle(self):
+        wait = self._last_send + self.min_interval - time.monotonic()
+        if wait > 0:
+            time.sleep(wait)
+
+    def _deliver_chat(self, phone: str, jobs: List[WhatsAppSendJob]):
+        """Abrir el chat una vez y enviar todos sus mensajes en orden."""
+        chat_open = False
+        for job in jobs:
+            while True:
+                job.attempts += 1
+                try:
+                    if not chat_open:
+                        self.sender.open_chat(phone)
+                        self.chats_opened += 1
+                        chat_open = True
+                    self._throttle()
+                    self.sender.type_message(phone, job.message)
+                    self._last_send = time.monotonic()
+                    self.logger.info(f"Mensaje enviado a {phone}")
+                    job._finish(WhatsAppSendJob.SENT)
+                    break
+                except Exception as e:
+                    # El chat puede haber quedado en un estado desconocido
+                    chat_open = False
+                    if job.attempts > self.max_retries:
+                        self.logger.error(f"Error al enviar mensaje a {phone}: {e}")
+                        job._finish(WhatsAppSendJob.FAILED, e)
+                        break
+                    self.logger.warning(
+                        f"Fallo al enviar a {phone} (intento {job.attempts}): {e}"
+                    )
+                    time.sleep(self.retry_delay * job.attempts)
@@ -0,0 +1,298 @@
+import json
+from typing import Any, Dict, List, Optional
+from src.utils.logger import Logger
+
+# Scripts que se ejecutan en WhatsApp Web con execute_script. Cada find_element
+# o .text es una petición HTTP al WebDriver; estos scripts recorren el DOM
+# dentro del navegador y devuelven el resultado en una sola ida y vuelta.
+
+# Selectores del DOM de WhatsApp Web
+MESSAGE_SELECTOR = 'div[data-testid="msg-container"]'
+AUTHOR_SELECTOR = 'span[data-testid="author"]'
+TEXT_SELECTOR = 'span[data-testid="conversation-info"]'
+CONVERSATION_PANEL_SELECTOR = "#main"
+CHAT_TITLE_SELECTOR = '#main header [data-testid="conversation-info-header-chat-title"]'
+SEARCH_BOX_SELECTOR = 'div[data-testid="search"]'
+CHAT_CELL_SELECTOR = 'div[data-testid="cell-frame-container"]'
+QR_CODE_SELECTOR = "canvas[aria-label='Scan me!']"
+
+# Lee {id, sender, text, timestamp} de un contenedor de mensaje.
+# data-pre-plain-text tiene la forma "[10:32, 18/10/2026] Juan Pérez: " y sirve
+# para la hora y para el autor cuando el mensaje no muestra su nombre.
+MESSAGE_READER_JS = r"""
+function messageId(container) {
+    const idNode = container.closest("[data-id]") || container.querySelector("[data-id]");
+    return idNode ? idNode.getAttribute("data-id") : null;
+}
+function readMessage(container, authorSelector, textSelector) {
+    const textNode = container.querySelector(textSelector);
+    if (!textNode) {
+        return null;
+    }
+    const authorNode = container.querySelector(authorSelector);
+    const metaNode = container.querySelector("[data-pre-plain-text]");
+    const meta = metaNode ? metaNode.getAttribute("data-pre-plain-text") : "";
+    const match = meta.match(/^\[([^\]]+)\]\s*([^:]*):/);
+    return {
+        id: messageId(container),
+        sender: authorNode ? authorNode.innerText : (match ? match[2].trim() : ""),
+        text: textNode.innerText,
+        timestamp: match ? match[1] : null,
+    };
+}
+"""
+
+# Todos los mensajes del chat abierto, o solo los `limit` últimos
+EXTRACT_MESSAGES_JS = MESSAGE_READER_JS + r"""
+const [containerSelector, authorSelector, textSelector, limit] = arguments;
+let containers = Array.from(document.querySelectorAll(containerSelector));
+if (limit) {
+    containers = containers.slice(-limit);
+}
+const messages = [];
+for (const container of containers) {
+    const message = readMessage(container, authorSelector, textSelector);
+    if (message) {
+        messages.push(message);
+    }
+}
+return JSON.stringify(messages);
+"""
+
+# Celda de la lista de chats cuyo título coincide exactamente, o null si no
+# está pintada (la lista solo muestra los chats visibles)
+FIND_CHAT_JS = r"""
+const [cellSelector, title] = arguments;
+for (const cell of document.querySelectorAll(cellSelector)) {
+    const span = cell.querySelector("span[title]");
+    if (span && span.getAttribute("title") === title) {
+        return cell;
+    }
+}
+return null;
+"""
+
+# Títulos de los chats pintados en la lista, en orden
+CHAT_TITLES_JS = r"""
+const [cellSelector] = arguments;
+const titles = [];
+for (const cell of document.querySelectorAll(cellSelector)) {
+    const span = cell.querySelector("span[title]");
+    if (span) {
+        titles.push(span.getAttribute("title"));
+    }
+}
+return JSON.stringify(titles);
+"""
+
+# MutationObserver que guarda en un búfer los mensajes que se añaden al DOM.
+# Solo observa el panel de la conversación (#main); otro observador, sin
+# subtree, vigila el contenedor del panel para volver a engancharse cuando
+# WhatsApp lo sustituye al cambiar de chat. Al cambiar de chat, los mensajes
+# ya pintados se marcan como vistos sin pasar al búfer, de modo que solo se
+# capturan los que llegan después. Solo cuenta lo que se añade detrás del
+# último mensaje conocido: lo que aparece antes es historial cargado al
+# desplazarse hacia arriba y se marca como visto.
+INSTALL_CAPTURE_JS = MESSAGE_READER_JS + r"""
+const [containerSelector, authorSelector, textSelector, titleSelector, panelSelector, maxBuffer] = arguments;
+if (window.__assistantCapture) {
+    return false;
+}
+const capture = {buffer: [], seen: new Set(), title: null, known: 0, dropped: 0, panel: null};
+const currentTitle = () => {
+    const node = document.querySelector(titleSelector);
+    return node ? node.innerText : null;
+};
+const remember = (id) => {
+    capture.seen.add(id);
+    if (capture.seen.size > 20000) {
+        capture.seen.delete(capture.seen.values().next().value);
+    }
+};
+const baseline = () => {
+    capture.title = currentTitle();
+    capture.known = 0;
+    for (const container of capture.panel.querySelectorAll(containerSelector)) {
+        const id = messageId(container);
+        if (id) {
+            remember(id);
+            capture.known += 1;
+        }
+    }
+};
+// Último mensaje pintado que ya se conocía antes de esta tanda de mutaciones
+const lastKnown = () => {
+    const containers = capture.panel.querySelectorAll(containerSelector);
+    for (let i = containers.length - 1; i >= 0; i--) {
+        const id = messageId(containers[i]);
+        if (id && capture.seen.has(id)) {
+            return containers[i];
+        }
+    }
+    return null;
+};
+const isHistory = (anchor, wasEmpty, container) => {
+    if (!anchor) {
+        // Sin mensajes conocidos en pantalla solo es nuevo si el chat estaba vacío
+        return !wasEmpty;
+    }
+    return !(anchor.compareDocumentPosition(container) & Node.DOCUMENT_POSITION_FOLLOWING);
+};
+const addedMessages = (mutations) => {
+    const added = [];
+    const ids = new Set();
+    for (const mutation of mutations) {
+        for (const node of mutation.addedNodes) {
+            if (node.nodeType !== Node.ELEMENT_NODE) {
+                continue;
+            }
+            const containers = node.matches(containerSelector)
+                ? [node] : node.querySelectorAll(containerSelector);
+            for (const container of containers) {
+                const message = readMessage(container, authorSelector, textSelector);
+                if (!message || (message.id && (capture.seen.has(message.id) || ids.has(message.id)))) {
+                    continue;
+                }
+                if (message.id) {
+                    ids.add(message.id);
+                }
+                added.push([container, message]);
+            }
+        }
+    }
+    return added;
+};
+capture.observer = new MutationObserver((mutations) => {
+    if (currentTitle() !== capture.title) {
+        baseline();
+        return;
+    }
+    const added = addedMessages(mutations);
+    if (!added.length) {
+        return;
+    }
+    const anchor = lastKnown();
+    const wasEmpty = capture.known === 0;
+    for (const [container, message] of added) {
+        if (message.id) {
+            remember(message.id);
+            capture.known += 1;
+        }
+        if (isHistory(anchor, wasEmpty, container)) {
+            continue;
+        }
+        message.chat = capture.title;
+        capture.buffer.push(message);
+        if (capture.buffer.length > maxBuffer) {
+            capture.buffer.shift();
+            capture.dropped += 1;
+        }
+    }
+});
+// Engancharse al panel actual; sin chat abierto se espera a que aparezca
+capture.attach = () => {
+    const panel = document.querySelector(panelSelector);
+    if (panel === capture.panel) {
+        return;
+    }
+    capture.observer.disconnect();
+    capture.host.disconnect();
+    capture.panel = panel;
+    if (panel) {
+        baseline();
+        capture.observer.observe(panel, {childList: true, subtree: true});
+        capture.host.observe(panel.parentNode, {childList: true});
+    } else {
+        capture.host.observe(document.body, {childList: true, subtree: true});
+    }
+};
+capture.host = new MutationObserver(() => capture.attach());
+capture.attach();
+window.__assistantCapture = capture;
+return true;
+"""
+
+# Vaciar el búfer; devuelve null si la página se recargó y el observador se perdió
+DRAIN_CAPTURE_JS = r"""
+const capture = window.__assistantCapture;
+if (!capture) {
+    return null;
+}
+// Por si el panel se sustituyó junto con su contenedor
+capture.attach();
+const messages = capture.buffer;
+capture.buffer = [];
+const dropped = capture.dropped;
+capture.dropped = 0;
+return JSON.stringify({messages: messages, dropped: dropped});
+"""
+
+
+def extract_messages(
+    driver,
+    container_selector: str = MESSAGE_SELECTOR,
+    author_selector: str = AUTHOR_SELECTOR,
+    text_selector: str = TEXT_SELECTOR,
+    limit: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """Leer los mensajes del chat abierto con un solo execute_script.
+
+    Con limit solo se serializan los últimos `limit` mensajes.
+    """
+    raw = driver.execute_script(
+        EXTRACT_MESSAGES_JS, container_selector, author_selector, text_selector, limit
+    )
+    return json.loads(raw) if raw else []
+
+
+class MessageCapture:
+    """Captura incremental de mensajes nuevos mediante un MutationObserver.
+
+    El observador vive en la página y acumula los mensajes que WhatsApp Web
+    añade al DOM; drain() trae solo ese delta, así que leer lo nuevo cuesta
+    O(mensajes nuevos) y no O(historial). Si la página se recarga, el
+    observador se vuelve a instalar en el siguiente drain().
+    """
+
+    def __init__(
+        self,
+        driver,
+        container_selector: str = MESSAGE_SELECTOR,
+        author_selector: str = AUTHOR_SELECTOR,
+        text_selector: str = TEXT_SELECTOR,
+        title_selector: str = CHAT_TITLE_SELECTOR,
+        panel_selector: str = CONVERSATION_PANEL_SELECTOR,
+        max_buffer: int = 1000,
+        logger: Optional[Logger] = None,
+    ):
+        self.driver = driver
+        self.selectors = (container_selector, author_selector, text_selector)
+        self.title_selector = title_selector
+        self.panel_selector = panel_selector
+        self.max_buffer = max_buffer
+        self.logger = logger if logger else Logger()
+
+    def install(self) -> bool:
+        """Inyectar el observador. Devuelve False si ya estaba instalado."""
+        return bool(
+            self.driver.execute_script(
+                INSTALL_CAPTURE_JS,
+                *self.selectors,
+                self.title_selector,
+                self.panel_selector,
+                self.max_buffer,
+            )
+        )
+
+    def drain(self) -> List[Dict[str, Any]]:
+        """Devolver y descartar los mensajes capturados desde la última llamada."""
+        raw = self.driver.execute_script(DRAIN_CAPTURE_JS)
+        if raw is None:
+            self.install()
+            return []
+        data = json.loads(raw)
+        if data["dropped"]:
+            self.logger.warning(
+                f"Se descartaron {data['dropped']} mensajes por desbordamiento del búfer."
+            )
+        return data["messages"]
@@ -0,0 +1,191 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+from src.utils.logger import Logger
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS wa_messages (
+    id TEXT PRIMARY KEY,
+    chat TEXT NOT NULL,
+    sender TEXT,
+    text TEXT,
+    timestamp TEXT,
+    sent_at TEXT NOT NULL,
+    incoming INTEGER NOT NULL DEFAULT 1,
+    read INTEGER NOT NULL DEFAULT 0,
+    captured_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_wa_messages_chat
+    ON wa_messages (chat, sent_at);
+CREATE INDEX IF NOT EXISTS idx_wa_messages_unread
+    ON wa_messages (read, incoming, chat);
+"""
+
+# Formatos de la hora en data-pre-plain-text según el idioma del teléfono
+TIMESTAMP_FORMATS = (
+    "%H:%M, %d/%m/%Y",
+    "%d/%m/%Y, %H:%M",
+    "%I:%M %p, %m/%d/%Y",
+    "%I:%M %p, %d/%m/%Y",
+    "%H:%M, %m/%d/%Y",
+)
+
+
+def parse_timestamp(value: Optional[str]) -> Optional[datetime]:
+    """Convertir "10:32, 18/10/2026" (o variantes como "10:32 a. m.") en datetime."""
+    if not value:
+        return None
+    value = value.strip()
+    # "a. m." / "p. m." de la configuración en español; WhatsApp los separa
+    # de la hora con espacios de no separación, que strptime trata como espacio
+    value = re.sub(r"\b([ap])\.\s*m\.", r"\1m", value, flags=re.IGNORECASE).upper()
+    for fmt in TIMESTAMP_FORMATS:
+        try:
+            return datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+    return None
+
+
+def message_key(chat: str, message: Dict[str, Any]) -> str:
+    """Identificador estable: el data-id de WhatsApp o, si falta, una huella."""
+    if message.get("id"):
+        return message["id"]
+    raw = "\n".join(
+        [chat] + [message.get(field) or "" for field in ("timestamp", "sender", "text")]
+    )
+    return "sha1:" + hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+class WhatsAppStore:
+    """Almacén local de mensajes de WhatsApp en SQLite.
+
+    Cada mensaje leído del navegador se guarda una sola vez, identificado por
+    el data-id de WhatsApp Web (los que llegan repetidos se ignoran), con
+    índices por chat y fecha. Así las consultas de historial y de no leídos
+    se responden sin volver a recorrer la página; el navegador solo aporta lo
+    nuevo.
+
+    "No leído" significa aquí que el asistente todavía no lo ha comunicado:
+    los mensajes entrantes se guardan con read=0 hasta que se llama a
+    mark_read().
+    """
+
+    def __init__(
+        self,
+        db_path: str = os.path.join("data", "whatsapp.db"),
+        logger: Optional[Logger] = None,
+    ):
+        self.db_path = db_path
+        self.logger = logger if logger else Logger()
+        if os.path.dirname(db_path):
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self._lock = threading.RLock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+
+    def add_messages(
+        self, messages: Iterable[Dict[str, Any]], chat: Optional[str] = None
+    ) -> int:
+        """Guardar mensajes {id, chat, sender, text, timestamp}; devuelve los nuevos.
+
+        chat se usa para los mensajes que no traen la clave "chat".
+        """
+        now = datetime.now()
+        rows = []
+        for message in messages:
+            chat_name = message.get("chat") or chat
+            if not chat_name:
+                continue
+            sent_at = parse_timestamp(message.get("timestamp")) or now
+            key = message_key(chat_name, message)
+            rows.append(
+                (
+                    key,
+                    chat_name,
+                    message.get("sender"),
+                    message.get("text"),
+                    message.get("timestamp"),
+                    sent_at.isoformat(timespec="seconds"),
+                    # WhatsApp Web antepone "true_" al data-id de los enviados
+                    int(not key.startswith("true_")),
+                    now.isoformat(timespec="seconds"),
+                )
+            )
+        if not rows:
+            return 0
+        with self._lock, self.conn:
+            before = self.conn.total_changes
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO wa_messages (id, chat, sender, text, timestamp,"
+                " sent_at, incoming, captured_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            return self.conn.total_changes - before
+
+    def count_unread(self, chat: Optional[str] = None) -> int:
+        query = "SELECT COUNT(*) FROM wa_messages WHERE read=0 AND incoming=1"
+        params: List[Any] = []
+        if chat:
+            query += " AND chat=?"
+            params.append(chat)
+        with self._lock:
+            return self.conn.execute(query, params).fetchone()[0]
+
+    def unread_chats(self) -> List[Dict[str, Any]]:
+        """Chats con mensajes sin comunicar {chat, unread, latest}, el más reciente primero."""
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT chat, COUNT(*) AS unread, MAX(sent_at) AS latest"
+                " FROM wa_messages WHERE read=0 AND incoming=1"
+                " GROUP BY chat ORDER BY latest DESC"
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def take_unread(self) -> List[Dict[str, Any]]:
+        """unread_chats() y marcar esos mensajes como comunicados, de una vez.
+
+        Se hace bajo el mismo bloqueo para que un mensaje capturado entre la
+        consulta y la marca no se dé por leído sin haberse anunciado.
+        """
+        with self._lock, self.conn:
+            chats = self.unread_chats()
+            self.conn.execute("UPDATE wa_messages SET read=1 WHERE read=0")
+        return chats
+
+    def last_messages(self, chat: str, limit: int = 5) -> List[Dict[str, Any]]:
+        """Los últimos limit mensajes del chat, en orden cronológico."""
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT id, chat, sender, text, timestamp, sent_at, incoming, read"
+                " FROM wa_messages WHERE chat=? ORDER BY sent_at DESC, rowid DESC"
+                " LIMIT ?",
+                (chat, limit),
+            ).fetchall()
+        return [dict(row) for row in reversed(rows)]
+
+    def mark_read(self, chat: Optional[str] = None):
+        query = "UPDATE wa_messages SET read=1 WHERE read=0"
+        params: List[Any] = []
+        if chat:
+            query += " AND chat=?"
+            params.append(chat)
+        with self._lock, self.conn:
+            self.conn.execute(query, params)
+
+    def chats(self) -> List[str]:
+        with self._lock:
+            return [
+                row["chat"]
+                for row in self.conn.execute("SELECT DISTINCT chat FROM wa_messages")
+            ]
+
+    def close(self):
+        with self._lock:
+            self.conn.close()